@@ -0,0 +1 @@
+# backend/__init__.py
\ No newline at end of file
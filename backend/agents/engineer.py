@@ -6,28 +6,31 @@ from crewai import Agent
 # For now, we'll define it without a direct LLM, assuming the Crew/Flow handles
 # passing tasks to its tool.
 
-# Placeholder for the agent definition
-senior_engineer_agent = None
+# Agent template: built once and shared; every crew gets its own Agent from it
+SENIOR_ENGINEER_TEMPLATE = dict(
+    role='Senior Software Engineer',
+    goal='Take development tasks, implement them using the Aider tool, write high-quality code and tests, ensure test coverage targets are met, and report results.',
+    backstory=(
+        "You are a highly skilled Senior Software Engineer specialized in using AI tools for development. "
+        "You receive tasks from the Development Manager and utilize the Aider tool to write, modify, and test code efficiently. "
+        "You are meticulous about code quality, testing (aiming for 90%+ coverage), and following instructions precisely."
+    ),
+    verbose=True,
+    allow_delegation=False # This agent focuses on execution, not delegation
+)
 
-def get_senior_engineer_agent(aider_tool):
-    """Initializes and returns the Senior Software Engineer Agent."""
-    global senior_engineer_agent
-    if senior_engineer_agent is None:
-        senior_engineer_agent = Agent(
-            role='Senior Software Engineer',
-            goal='Take development tasks, implement them using the Aider tool, write high-quality code and tests, ensure test coverage targets are met, and report results.',
-            backstory=(
-                "You are a highly skilled Senior Software Engineer specialized in using AI tools for development. "
-                "You receive tasks from the Development Manager and utilize the Aider tool to write, modify, and test code efficiently. "
-                "You are meticulous about code quality, testing (aiming for 90%+ coverage), and following instructions precisely."
-            ),
-            tools=[aider_tool], # Assign the custom Aider tool
-            verbose=True,
-            allow_delegation=False # This agent focuses on execution, not delegation
-            # llm=... # Optional: Assign a simpler/faster LLM like Flash if needed for non-Aider communication
-        )
-        print("Senior Software Engineer Agent initialized.")
-    return senior_engineer_agent
+def create_senior_engineer_agent(aider_tool, llm=None):
+    """
+    Creates a new Senior Software Engineer Agent bound to the given Aider tool.
+    Args:
+        aider_tool: The (per-run) Aider tool instance the agent should use.
+        llm: Optional shared LLM client, e.g. a simpler/faster model like Flash
+            for non-Aider communication.
+    """
+    kwargs = dict(SENIOR_ENGINEER_TEMPLATE, tools=[aider_tool])
+    if llm is not None:
+        kwargs["llm"] = llm
+    return Agent(**kwargs)
 
 # Example usage (requires a dummy tool for testing)
 if __name__ == '__main__':
@@ -44,7 +47,7 @@ if __name__ == '__main__':
             return f"Simulated Aider output for: {argument}"
 
     dummy_tool = DummyAiderTool()
-    engineer = get_senior_engineer_agent(dummy_tool)
+    engineer = create_senior_engineer_agent(dummy_tool)
     print(f"Agent Role: {engineer.role}")
     # result = engineer.execute_task("Implement the '/hello' endpoint using the Aider tool.")
     # print(result) # Testing requires a Crew setup
\ No newline at end of file
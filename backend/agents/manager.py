@@ -1,35 +1,32 @@
 # backend/agents/manager.py
 from crewai import Agent
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI  # Needed for Crew LLM config
 
-# TODO: Configure LLM (e.g., Gemini 1.5 Pro) using environment variables
-# llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", google_api_key=os.getenv("GOOGLE_API_KEY"))
+# Agent template: built once and shared; every crew gets its own Agent from it
+DEVELOPMENT_MANAGER_TEMPLATE = dict(
+    role='Development Manager',
+    goal='Oversee the software development process from requirements to deployment, ensuring tasks are well-defined, assigned correctly to the Senior Software Engineer, and meet user requirements.',
+    backstory=(
+        "You are an experienced Development Manager, skilled in breaking down complex software requirements "
+        "into actionable, specific, and testable tasks for your Senior Software Engineer. You excel at communication, coordination, "
+        "reviewing the engineer's work, and ensuring the final product aligns perfectly with the user's needs and quality standards. "
+        "You always ensure the engineer has clear instructions and context."
+    ),
+    verbose=True,
+    allow_delegation=True,  # Allow delegation specifically to the engineer agent (handled in Crew definition)
+    # memory=True # Consider adding memory if needed for longer conversations
+)
 
-# Placeholder for the agent definition
-development_manager_agent = None
-
-def get_development_manager_agent():
-    """Initializes and returns the Development Manager Agent."""
-    global development_manager_agent
-    if development_manager_agent is None:
-        # LLM config will be picked up by CrewAI default mechanism using GEMINI_API_KEY env var
-        development_manager_agent = Agent(
-            role='Development Manager',
-            goal='Oversee the software development process from requirements to deployment, ensuring tasks are well-defined, assigned correctly to the Senior Software Engineer, and meet user requirements.',
-            backstory=(
-                "You are an experienced Development Manager, skilled in breaking down complex software requirements "
-                "into actionable, specific, and testable tasks for your Senior Software Engineer. You excel at communication, coordination, "
-                "reviewing the engineer's work, and ensuring the final product aligns perfectly with the user's needs and quality standards. "
-                "You always ensure the engineer has clear instructions and context."
-            ),
-            # llm=... # Removed agent-specific LLM config
-            verbose=True,
-            allow_delegation=True,  # Allow delegation specifically to the engineer agent (handled in Crew definition)
-            # memory=True # Consider adding memory if needed for longer conversations
-        )
-        print("Development Manager Agent initialized.")
-    return development_manager_agent
+def create_development_manager_agent(llm=None):
+    """
+    Creates a new Development Manager Agent.
+    Args:
+        llm: Optional shared LLM client; when None, CrewAI's default mechanism
+            picks the model up from the environment.
+    """
+    kwargs = dict(DEVELOPMENT_MANAGER_TEMPLATE)
+    if llm is not None:
+        kwargs["llm"] = llm
+    return Agent(**kwargs)
 
 # Example usage (for testing purposes)
 if __name__ == '__main__':
@@ -39,6 +36,6 @@ if __name__ == '__main__':
     # if not os.getenv("GEMINI_API_KEY"):
     #     print("Error: GEMINI_API_KEY not found.")
     # else:
-    #     manager = get_development_manager_agent()
+    #     manager = create_development_manager_agent()
     #     print(f"Agent Role: {manager.role}")
     pass # Keep __main__ block minimal or remove for now
\ No newline at end of file
@@ -0,0 +1,88 @@
+# backend/agents/registry.py
+import os
+import threading
+from typing import Dict, Optional
+from crewai import LLM
+from backend.agents.manager import create_development_manager_agent
+from backend.agents.engineer import create_senior_engineer_agent
+from backend.tools.aider_tool import AiderTool
+from backend.utils.context_compactor import ContextCompactor
+from backend.utils.logger import get_logger
+
+logger = get_logger("registry")
+
+# Role -> environment variable naming the model for that role. Unset roles fall
+# back to MODEL, and if that is unset too, to CrewAI's own default resolution.
+ROLE_MODEL_ENV = {
+    "manager": "MANAGER_MODEL",
+    "engineer": "ENGINEER_MODEL",
+    "utility": "UTILITY_MODEL",  # Cheaper model for summarizing context between tasks
+}
+
+
+class AgentRegistry:
+    """
+    Builds the expensive, shareable pieces (LLM clients) once at startup and hands
+    out cheap per-run agents and tools.
+
+    Agents and Aider tools carry per-run state (task ID, tool bindings, CrewAI
+    execution state), so every crew gets fresh instances; only the stateless LLM
+    clients and the agent templates are shared between concurrent crews.
+    """
+
+    def __init__(self):
+        self.llms: Dict[str, Optional[LLM]] = {}
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Creates the LLM client for every role. Safe to call more than once."""
+        for role in ROLE_MODEL_ENV:
+            self.get_llm(role)
+
+    def get_llm(self, role: str) -> Optional[LLM]:
+        """Returns the shared LLM client for a role, or None to use CrewAI's default."""
+        with self._lock:
+            if role not in self.llms:
+                model = os.getenv(ROLE_MODEL_ENV[role]) or os.getenv("MODEL")
+                self.llms[role] = LLM(model=model) if model else None
+                logger.info("llm_configured", role=role, model=model or "CrewAI default")
+            return self.llms[role]
+
+    def model_name(self, role: str) -> str:
+        """Model identifier used for a role, e.g. as part of result cache keys."""
+        llm = self.get_llm(role)
+        return getattr(llm, "model", None) or "crewai-default"
+
+    def create_aider_tool(self, websocket_manager=None, task_id: Optional[str] = None, **kwargs) -> AiderTool:
+        """Creates an Aider tool for one run; warm Aider processes are shared through the worker pool."""
+        return AiderTool(websocket_manager=websocket_manager, task_id=task_id, **kwargs)
+
+    def create_context_compactor(self) -> ContextCompactor:
+        """
+        Compactor for context passed between tasks, summarizing with the utility
+        model; without a configured model (or with CONTEXT_SUMMARIZE=0) it only
+        dedupes and truncates.
+        """
+        llm = self.get_llm("utility") if os.getenv("CONTEXT_SUMMARIZE", "1") == "1" else None
+        if llm is None:
+            return ContextCompactor()
+        return ContextCompactor(summarize=llm.call, model_name=self.model_name("utility"))
+
+    def create_manager_agent(self):
+        return create_development_manager_agent(llm=self.get_llm("manager"))
+
+    def create_engineer_agent(self, aider_tool: AiderTool):
+        return create_senior_engineer_agent(aider_tool, llm=self.get_llm("engineer"))
+
+
+# Shared registry, created on first use (or at server startup)
+agent_registry = None
+_registry_lock = threading.Lock()
+
+def get_agent_registry() -> AgentRegistry:
+    """Returns the process-wide AgentRegistry, creating it on first use."""
+    global agent_registry
+    with _registry_lock:
+        if agent_registry is None:
+            agent_registry = AgentRegistry()
+    return agent_registry
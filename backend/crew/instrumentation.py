@@ -0,0 +1,121 @@
+# backend/crew/instrumentation.py
+import threading
+from typing import Dict, Optional, Tuple
+
+from crewai.events import crewai_event_bus
+from crewai.events.types.llm_events import LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent
+from crewai.events.types.tool_usage_events import ToolUsageErrorEvent, ToolUsageFinishedEvent
+
+from backend.utils.metrics import (
+    LLM_LATENCY,
+    LLM_REQUESTS,
+    LLM_TOKENS,
+    TOOL_CALLS,
+    TOOL_DURATION,
+    get_task_timings,
+)
+from backend.utils.logger import get_logger
+
+logger = get_logger("instrumentation")
+
+# CrewAI task ID -> (our task ID, phase). CrewAI events only identify their own
+# Task objects, so the orchestrator registers each Task it creates here.
+_bindings: Dict[str, Tuple[Optional[str], str]] = {}
+# LLM call ID -> start time, to turn started/completed pairs into latencies
+_llm_started: Dict[str, float] = {}
+_lock = threading.Lock()
+_installed = False
+
+
+def bind_crew_task(crew_task, task_id: Optional[str], phase: str):
+    """Attributes the LLM and tool events of a CrewAI Task to a job and phase."""
+    with _lock:
+        _bindings[str(crew_task.id)] = (task_id, phase)
+
+
+def unbind_crew_task(crew_task):
+    with _lock:
+        _bindings.pop(str(crew_task.id), None)
+
+
+def _binding(event) -> Tuple[Optional[str], str]:
+    with _lock:
+        return _bindings.get(str(event.task_id), (None, "unknown"))
+
+
+def _usage_tokens(usage: Optional[dict]) -> Tuple[int, int]:
+    """(prompt, completion) token counts from a provider usage dict."""
+    if not usage:
+        return 0, 0
+    prompt = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+    completion = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+    return int(prompt), int(completion)
+
+
+def _on_llm_started(source, event: LLMCallStartedEvent):
+    with _lock:
+        _llm_started[event.call_id] = event.timestamp.timestamp()
+
+
+def _finish_llm_call(event, outcome: str) -> Tuple[Optional[str], str, str, float]:
+    with _lock:
+        started = _llm_started.pop(event.call_id, None)
+    seconds = max(event.timestamp.timestamp() - started, 0.0) if started is not None else 0.0
+    task_id, phase = _binding(event)
+    model = event.model or "unknown"
+    LLM_REQUESTS.inc(model=model, phase=phase, outcome=outcome)
+    if started is not None:
+        LLM_LATENCY.observe(seconds, model=model, phase=phase)
+    return task_id, phase, model, seconds
+
+
+def _on_llm_completed(source, event: LLMCallCompletedEvent):
+    task_id, phase, model, seconds = _finish_llm_call(event, "success")
+    prompt_tokens, completion_tokens = _usage_tokens(event.usage)
+    LLM_TOKENS.inc(prompt_tokens, model=model, phase=phase, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, phase=phase, kind="completion")
+    timings = get_task_timings(task_id)
+    if timings is not None:
+        timings.add_llm_call(seconds, prompt_tokens, completion_tokens)
+
+
+def _on_llm_failed(source, event: LLMCallFailedEvent):
+    task_id, _, _, seconds = _finish_llm_call(event, "error")
+    timings = get_task_timings(task_id)
+    if timings is not None:
+        timings.add_llm_call(seconds)
+
+
+def _on_tool_finished(source, event: ToolUsageFinishedEvent):
+    seconds = max((event.finished_at - event.started_at).total_seconds(), 0.0)
+    TOOL_DURATION.observe(seconds, tool=event.tool_name)
+    TOOL_CALLS.inc(tool=event.tool_name, outcome="cached" if event.from_cache else "success")
+    timings = get_task_timings(_binding(event)[0])
+    if timings is not None:
+        timings.add_tool_call(event.tool_name, seconds)
+
+
+def _on_tool_error(source, event: ToolUsageErrorEvent):
+    TOOL_CALLS.inc(tool=event.tool_name, outcome="error")
+
+
+def install():
+    """Registers the CrewAI event handlers that feed the metrics. Safe to call more than once."""
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        _installed = True
+    crewai_event_bus.on(LLMCallStartedEvent)(_on_llm_started)
+    crewai_event_bus.on(LLMCallCompletedEvent)(_on_llm_completed)
+    crewai_event_bus.on(LLMCallFailedEvent)(_on_llm_failed)
+    crewai_event_bus.on(ToolUsageFinishedEvent)(_on_tool_finished)
+    crewai_event_bus.on(ToolUsageErrorEvent)(_on_tool_error)
+
+
+def flush(timeout: float = 2.0):
+    """Waits for queued CrewAI event handlers, so a task's totals include its last LLM call."""
+    try:
+        crewai_event_bus.flush(timeout=timeout)
+    except Exception as e:
+        logger.warning("crewai_event_flush_failed", error=repr(e))
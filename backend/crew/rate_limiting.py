@@ -0,0 +1,72 @@
+# backend/crew/rate_limiting.py
+import os
+import threading
+
+from crewai.events import crewai_event_bus
+from crewai.events.types.llm_events import LLMCallFailedEvent
+from crewai.hooks import register_after_llm_call_hook, register_before_llm_call_hook
+
+from backend.utils.context_compactor import estimate_tokens
+from backend.utils.llm_scheduler import get_llm_scheduler, is_rate_limit_error, retry_after
+from backend.utils.logger import get_logger
+
+logger = get_logger("rate_limiting")
+
+# Completion tokens reserved for a call whose LLM sets no max_tokens; corrected once it returns
+COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", 1000))
+
+# The reservation of the call in progress on each crew thread; CrewAI runs the
+# before and after hooks of one call on the thread that makes it.
+_pending = threading.local()
+_lock = threading.Lock()
+_installed = False
+
+
+def model_key(llm) -> str:
+    """Provider-qualified model name ("gemini/gemini-2.5-pro") the scheduler keys limits by."""
+    model = str(getattr(llm, "model", None) or llm)
+    provider = getattr(llm, "provider", None)
+    return model if "/" in model or not provider else f"{provider}/{model}"
+
+
+def _message_tokens(messages) -> int:
+    return sum(estimate_tokens(str(message.get("content") or "")) for message in messages or ())
+
+
+def _before_llm_call(context):
+    """Waits for the model's rate limit before CrewAI sends the request."""
+    llm = context.llm
+    prompt_tokens = _message_tokens(context.messages)
+    completion_tokens = getattr(llm, "max_tokens", None) or COMPLETION_TOKEN_ESTIMATE
+    _pending.prompt_tokens = prompt_tokens
+    _pending.reservation = get_llm_scheduler().acquire(
+        model_key(llm), getattr(llm, "api_key", None), prompt_tokens + completion_tokens
+    )
+    return None
+
+
+def _after_llm_call(context):
+    reservation = getattr(_pending, "reservation", None)
+    _pending.reservation = None
+    if reservation is not None:
+        get_llm_scheduler().settle(reservation, _pending.prompt_tokens + estimate_tokens(context.response or ""))
+    return None  # Keep the response unchanged
+
+
+def _on_llm_failed(source, event: LLMCallFailedEvent):
+    """A 429 got through anyway (another client shares the key): pause the model."""
+    if event.model and is_rate_limit_error(event.error):
+        get_llm_scheduler().throttle(event.model, retry_after(event.error))
+
+
+def install():
+    """Routes every CrewAI LLM call through the shared LLMScheduler. Safe to call more than once."""
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        _installed = True
+    register_before_llm_call_hook(_before_llm_call)
+    register_after_llm_call_hook(_after_llm_call)
+    crewai_event_bus.on(LLMCallFailedEvent)(_on_llm_failed)
+    logger.debug("llm_rate_limiting_installed")
@@ -0,0 +1,197 @@
+# backend/crew/task_graph.py
+import json
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SubTaskStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    SKIPPED = "skipped"  # A dependency failed, or the run was cancelled
+
+
+class SubTask:
+    """One engineer step from the manager's plan."""
+
+    def __init__(self, task_id: str, description: str, files: Optional[List[str]] = None, depends_on: Optional[List[str]] = None):
+        self.task_id = task_id
+        self.description = description
+        self.files = [f.strip() for f in (files or []) if isinstance(f, str) and f.strip()]
+        self.depends_on = list(depends_on or [])
+        self.status = SubTaskStatus.PENDING
+        self.result: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.task_id,
+            "description": self.description,
+            "files": self.files,
+            "depends_on": self.depends_on,
+            "status": self.status,
+        }
+
+
+# Description of the plan format the manager is asked to produce
+PLAN_FORMAT_INSTRUCTIONS = (
+    "Return the plan as a JSON array inside a ```json code block. Each element must be an object with: "
+    '"id" (short unique string), "description" (precise instructions for the engineer), '
+    '"files" (list of file paths the step will create or modify) and '
+    '"depends_on" (list of ids of steps that must finish first; empty if none). '
+    "Steps that touch different files and do not depend on each other will be implemented in parallel."
+)
+
+_JSON_BLOCK = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_NUMBERED_STEP = re.compile(r"^\s*(?:step\s*)?(\d+)[.):]\s+(.+)$", re.IGNORECASE)
+
+
+def parse_plan(plan_text: str) -> List[SubTask]:
+    """
+    Parses the manager's plan into sub-tasks.
+
+    Accepts the JSON format from PLAN_FORMAT_INSTRUCTIONS (a list, or an object
+    with a "steps"/"tasks" list). Falls back to a numbered list, treated as a
+    chain of dependent steps, and finally to a single step holding the whole plan.
+    """
+    for candidate in _JSON_BLOCK.findall(plan_text) + [plan_text]:
+        steps = _load_steps(candidate)
+        if steps:
+            return steps
+
+    numbered = [m.group(2).strip() for m in map(_NUMBERED_STEP.match, plan_text.splitlines()) if m]
+    if len(numbered) > 1:
+        return [
+            SubTask(f"step{i + 1}", text, depends_on=[f"step{i}"] if i else [])
+            for i, text in enumerate(numbered)
+        ]
+    return [SubTask("step1", plan_text.strip())]
+
+
+def _load_steps(text: str) -> List[SubTask]:
+    start = min((i for i in (text.find("["), text.find("{")) if i >= 0), default=-1)
+    if start < 0:
+        return []
+    try:
+        data = json.loads(text[start:text.rfind("]" if text[start] == "[" else "}") + 1])
+    except ValueError:
+        return []
+    if isinstance(data, dict):
+        data = data.get("steps") or data.get("tasks") or []
+    if not isinstance(data, list):
+        return []
+    steps = []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict) or not item.get("description"):
+            continue
+        depends_on = item.get("depends_on") or []
+        steps.append(SubTask(
+            task_id=str(item.get("id") or f"step{index + 1}"),
+            description=str(item["description"]),
+            files=item.get("files") if isinstance(item.get("files"), list) else [],
+            depends_on=[str(d) for d in depends_on] if isinstance(depends_on, list) else [],
+        ))
+    return steps
+
+
+class TaskGraph:
+    """
+    Dependency DAG of sub-tasks.
+
+    Besides the declared `depends_on` edges, a sub-task implicitly depends on
+    every earlier sub-task (in plan order) that touches one of the same files,
+    so concurrent steps never edit the same file. A sub-task that lists no
+    files may touch anything and is ordered after all earlier steps.
+    """
+
+    def __init__(self, subtasks: List[SubTask]):
+        self.subtasks: Dict[str, SubTask] = {}
+        for subtask in subtasks:
+            if subtask.task_id in self.subtasks:
+                raise ValueError(f"Duplicate sub-task id: {subtask.task_id}")
+            self.subtasks[subtask.task_id] = subtask
+        self.dependencies: Dict[str, set] = {}
+        ordered = list(self.subtasks.values())
+        for index, subtask in enumerate(ordered):
+            deps = {d for d in subtask.depends_on if d in self.subtasks and d != subtask.task_id}
+            for earlier in ordered[:index]:
+                if not subtask.files or not earlier.files or set(subtask.files) & set(earlier.files):
+                    deps.add(earlier.task_id)
+            self.dependencies[subtask.task_id] = deps
+        self.topological_order()  # Validate: raises on cycles
+
+    def topological_order(self) -> List[str]:
+        remaining = {task_id: set(deps) for task_id, deps in self.dependencies.items()}
+        order = []
+        while remaining:
+            ready = [task_id for task_id, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Dependency cycle between sub-tasks: {sorted(remaining)}")
+            for task_id in ready:
+                order.append(task_id)
+                del remaining[task_id]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def run(
+        self,
+        execute: Callable[[SubTask], str],
+        max_parallel: int,
+        cancel_event: Optional[threading.Event] = None,
+        on_update: Optional[Callable[[SubTask], None]] = None,
+    ) -> List[SubTask]:
+        """
+        Executes sub-tasks as soon as their dependencies complete, at most
+        `max_parallel` at a time. A failed sub-task skips its dependents but not
+        unrelated branches. Returns the sub-tasks in plan order.
+        """
+        def update(subtask: SubTask, status: str):
+            subtask.status = status
+            if on_update:
+                on_update(subtask)
+
+        def ready() -> List[SubTask]:
+            return [
+                subtask for task_id, subtask in self.subtasks.items()
+                if subtask.status == SubTaskStatus.PENDING
+                and all(self.subtasks[d].status == SubTaskStatus.COMPLETED for d in self.dependencies[task_id])
+            ]
+
+        def skip_blocked():
+            # Pending sub-tasks downstream of a failure can never run
+            changed = True
+            while changed:
+                changed = False
+                for task_id, subtask in self.subtasks.items():
+                    if subtask.status == SubTaskStatus.PENDING and any(
+                        self.subtasks[d].status in (SubTaskStatus.FAILED, SubTaskStatus.SKIPPED) for d in self.dependencies[task_id]
+                    ):
+                        update(subtask, SubTaskStatus.SKIPPED)
+                        changed = True
+
+        running: Dict[Future, SubTask] = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="subtask") as executor:
+            while True:
+                if cancel_event is None or not cancel_event.is_set():
+                    for subtask in ready()[:max_parallel - len(running)]:
+                        update(subtask, SubTaskStatus.RUNNING)
+                        running[executor.submit(execute, subtask)] = subtask
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    subtask = running.pop(future)
+                    try:
+                        subtask.result = future.result()
+                        update(subtask, SubTaskStatus.COMPLETED)
+                    except Exception as e:
+                        subtask.result = f"Sub-task failed: {e}"
+                        update(subtask, SubTaskStatus.FAILED)
+                skip_blocked()
+        for subtask in self.subtasks.values():
+            if subtask.status == SubTaskStatus.PENDING:
+                update(subtask, SubTaskStatus.SKIPPED)  # Cancelled before it could start
+        return list(self.subtasks.values())
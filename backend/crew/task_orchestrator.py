@@ -1,127 +1,424 @@
 # backend/crew/task_orchestrator.py
-from crewai import Crew, Process, Task
 import os
+import random
+import threading
+import time
+from contextlib import contextmanager
 from crewai import Crew, Process, Task
-# from langchain_google_genai import ChatGoogleGenerativeAI # Removed, using dict config
-from backend.agents.manager import get_development_manager_agent
-from backend.agents.engineer import get_senior_engineer_agent
-from backend.tools.aider_tool import AiderTool
-# from dotenv import load_dotenv # Removed as it's unused now
+from backend.agents.registry import get_agent_registry
+from backend.crew.task_graph import PLAN_FORMAT_INSTRUCTIONS, SubTask, SubTaskStatus, TaskGraph, parse_plan
+from backend.tools.aider_tool import DEFAULT_PROJECT_ROOT
+from backend.utils.workspace_manager import MergeConflictError, TargetCheckoutError, get_workspace_manager
+from backend.utils.result_cache import cache_key, get_result_cache, repo_state_hash
+from backend.utils.repo_index import get_repo_index
+from backend.utils.checkpoint_store import RunStatus, get_checkpoint_store
+from backend.utils.metrics import PHASE_DURATION, get_task_timings
+from backend.utils.llm_scheduler import get_llm_scheduler
+from backend.crew import instrumentation, rate_limiting
+from backend.utils.logger import get_logger
+
+# Environment variables (API keys, models) are loaded from backend/.env by main.py or the worker
+
+logger = get_logger("orchestrator")
+
 
-# Load environment variables (especially API keys)
-# Assuming this module is run from the context where .env is accessible
-# or loaded beforehand (e.g., in main.py)
-# load_dotenv(dotenv_path='../.env') # Assuming .env is loaded by main.py
+# Step errors that rerunning the step cannot fix: the main checkout needs attention first
+NON_RETRYABLE_ERRORS = (TargetCheckoutError,)
+
+
+class CrewExecutionError(Exception):
+    """Raised by `run_crew` when a run fails, after the failure was streamed and checkpointed."""
 
-# TODO: Implement the main orchestration logic
 
 class TaskOrchestrator:
-    def __init__(self, websocket_manager=None):
+    def __init__(self, websocket_manager=None, registry=None):
         """
-        Initializes the TaskOrchestrator.
+        Initializes the TaskOrchestrator. Create one orchestrator per run: its
+        agents and Aider tool are per-run instances from the agent registry.
         Args:
             websocket_manager: An instance of WebSocketManager to send updates.
+            registry: AgentRegistry to build agents from (defaults to the shared one).
         """
         self.websocket_manager = websocket_manager
-        self.aider_tool = AiderTool()  # Initialize the Aider tool
-        self.manager_agent = get_development_manager_agent()
-        self.engineer_agent = get_senior_engineer_agent(self.aider_tool)
-        # TODO: Initialize Utility Agent if needed
+        self.registry = registry or get_agent_registry()
+        self.task_id = None
+        self.cancel_event = None
+        self._crew_tasks = []  # CrewAI Tasks bound to this run for instrumentation
+        self.manager_agent = self.registry.create_manager_agent()
+        # Engineers (each with its own Aider tool, hence its own Aider worker)
+        # are created per sub-task so independent steps can run in parallel.
+        self.max_parallel_subtasks = int(os.getenv("MAX_PARALLEL_SUBTASKS", 3))
+        # Failed steps are retried with exponential backoff before the run gives up on them
+        self.max_step_attempts = max(1, int(os.getenv("STEP_MAX_ATTEMPTS", 3)))
+        self.retry_backoff = float(os.getenv("STEP_RETRY_BACKOFF", 2))
+        self.retry_max_backoff = float(os.getenv("STEP_RETRY_MAX_BACKOFF", 30))
+        self.checkpoints = get_checkpoint_store()
+        # Context passed between tasks (plan, engineer reports) is compacted to this many tokens
+        self.context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", 4000))
+        self.compactor = self.registry.create_context_compactor()
+        self._compacted = {}  # (context key, budget) -> compacted text
+        self._compact_locks = {}
+        self._compact_lock = threading.Lock()
+        instrumentation.install()
+        rate_limiting.install()
 
-        # LLM config will be set directly on the agent
+    def _notify(self, message: dict):
+        """Sends an update via the WebSocket manager from the (non-async) crew thread."""
+        if self.websocket_manager:
+            if self.task_id:
+                message = {"task_id": self.task_id, **message}
+            self.websocket_manager.broadcast_threadsafe(message)
 
-    def run_crew(self, user_prompt: str):
+    def _cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    @contextmanager
+    def _phase(self, phase: str, **details):
+        """Times a phase into the metrics and the task's breakdown, and streams a `timing` event."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            PHASE_DURATION.observe(seconds, phase=phase)
+            timings = get_task_timings(self.task_id)
+            if timings is not None:
+                timings.add_phase(phase, seconds)
+            self._notify({"type": "timing", "phase": phase, "seconds": round(seconds, 4), **details})
+
+    def _kickoff(self, task: Task, agent, phase: str) -> str:
+        """Runs a single-task crew, attributing its LLM and tool calls to this job and phase."""
+        # Bindings stay until the run ends: CrewAI delivers events asynchronously
+        instrumentation.bind_crew_task(task, self.task_id, phase)
+        self._crew_tasks.append(task)
+        crew = Crew(agents=[agent], tasks=[task], process=Process.sequential, verbose=True)
+        return str(crew.kickoff())
+
+    def _run_step(self, step: str, run):
         """
-        Sets up and runs the CrewAI crew based on the user prompt.
+        Runs one step of the crew (`plan`, `subtask:<id>` or `review`), retrying
+        failures with exponential backoff and jitter, and checkpoints its result
+        once it succeeds. Only the failing step is retried; completed steps are
+        never repeated. Re-raises the last error when attempts run out or the
+        run is cancelled, and right away for errors retrying can't fix.
+        """
+        for attempt in range(1, self.max_step_attempts + 1):
+            try:
+                result = run()
+            except Exception as e:
+                if self.checkpoints is not None and self.task_id:
+                    self.checkpoints.record_failure(self.task_id, step, str(e))
+                if attempt == self.max_step_attempts or self._cancelled() or isinstance(e, NON_RETRYABLE_ERRORS):
+                    raise
+                delay = min(self.retry_backoff * 2 ** (attempt - 1), self.retry_max_backoff) * random.uniform(0.5, 1.0)
+                logger.warning("step_retry", task_id=self.task_id, step=step, attempt=attempt, delay=round(delay, 2), error=repr(e))
+                self._notify({"type": "step_retry", "step": step, "attempt": attempt, "delay": round(delay, 2), "error": str(e)})
+                if self.cancel_event is not None and self.cancel_event.wait(delay):
+                    raise  # Cancelled during the backoff
+                if self.cancel_event is None:
+                    time.sleep(delay)
+                continue
+            if self.checkpoints is not None and self.task_id:
+                self.checkpoints.save_step(self.task_id, step, result)
+            return result
+
+    def _start_checkpoint(self, user_prompt: str, priority: int) -> dict:
+        """Records the run and returns the steps an earlier attempt already completed."""
+        if self.checkpoints is None or not self.task_id:
+            return {}
+        completed = self.checkpoints.completed_steps(self.task_id)
+        self.checkpoints.start_run(self.task_id, user_prompt, priority)
+        if completed:
+            logger.info("crew_resumed", task_id=self.task_id, steps=sorted(completed))
+        return completed
+
+    def _finish_checkpoint(self, status: str, result=None):
+        if self.checkpoints is not None and self.task_id:
+            self.checkpoints.finish_run(self.task_id, status, None if result is None else str(result))
+
+    def _finish_timings(self, started: float):
+        """Streams the task's timing breakdown once its last CrewAI events are processed."""
+        instrumentation.flush()
+        for task in self._crew_tasks:
+            instrumentation.unbind_crew_task(task)
+        self._crew_tasks = []
+        timings = get_task_timings(self.task_id)
+        if timings is not None:
+            self._notify({"type": "task_timing", "total_seconds": round(time.perf_counter() - started, 4), **timings.to_dict()})
+
+    def _compact(self, key: str, text: str, budget: int, label: str, stage: str) -> str:
+        """
+        Compacts context for a downstream task, once per run for each key and
+        budget: parallel engineers share the compacted plan and dependency reports.
+        """
+        with self._compact_lock:
+            lock = self._compact_locks.setdefault((key, budget), threading.Lock())
+        with lock:  # Concurrent callers wait for one summary instead of each making their own
+            if (key, budget) not in self._compacted:
+                self._compacted[(key, budget)] = self.compactor.compact(text, budget, label, stage)
+            return self._compacted[(key, budget)]
+
+    def _refresh_index(self):
+        """Brings the repository index up to date before planning; failures only cost context."""
+        index = get_repo_index(DEFAULT_PROJECT_ROOT)
+        if index is None:
+            return
+        try:
+            stats = index.refresh()
+            logger.info("repo_index_refreshed", task_id=self.task_id, **stats)
+        except Exception as e:
+            logger.warning("repo_index_refresh_failed", task_id=self.task_id, error=repr(e))
+
+    def _relevant_files(self, text: str, seed_files=()) -> list:
+        """Files from the repository index most relevant to `text`, seeds first."""
+        index = get_repo_index(DEFAULT_PROJECT_ROOT)
+        return index.relevant_files(text, seed_files) if index is not None else list(seed_files)
+
+    def _describe_files(self, paths: list) -> str:
+        index = get_repo_index(DEFAULT_PROJECT_ROOT)
+        return index.describe(paths) if index is not None else "\n".join(f"- {path}" for path in paths)
+
+    def run_crew(self, user_prompt: str, task_id: str = None, cancel_event=None, priority: int = 0):
+        """
+        Runs the crew for a user prompt in three phases:
+        1. The manager writes a plan, parsed into a DAG of engineer sub-tasks.
+        2. Sub-tasks run as their dependencies complete, up to
+           MAX_PARALLEL_SUBTASKS at a time, each with its own engineer and Aider tool.
+        3. The manager reviews all sub-task results.
         Args:
             user_prompt: The initial requirement or task from the user.
+            task_id: Optional job ID attached to every WebSocket update.
+            cancel_event: Optional threading.Event checked between phases and sub-tasks.
+            priority: Job priority, recorded so an interrupted run is requeued the same way.
+        Each phase is timed into the metrics and streamed as a `timing` event; a
+        `task_timing` event with the full breakdown follows the final result.
+        With a task ID, every completed step is checkpointed (see CheckpointStore):
+        running the same task ID again skips the steps already completed and
+        only redoes the rest, streaming a `resumed` event listing the skipped ones.
         Returns:
-            The result of the crew execution.
+            The review result, or a message if the run was cancelled.
+        Raises:
+            CrewExecutionError: If the crew is not configured, fails, or leaves
+                sub-tasks incomplete, so the job is recorded as failed.
         """
-        print(f"Orchestrator received prompt: {user_prompt}")
+        self.task_id = task_id
+        self.cancel_event = cancel_event
+        logger.info("crew_started", task_id=task_id, prompt=user_prompt)
         if not os.getenv("GOOGLE_API_KEY"):
             error_msg = "GOOGLE_API_KEY not found. Cannot run crew."
-            print(error_msg)
-            # Send error back via WebSocket if manager exists
-            if self.websocket_manager:
-                # Assuming websocket_manager has a method like broadcast_message
-                # self.websocket_manager.broadcast_message({"type": "error", "message": error_msg})
-                pass  # Implement actual WebSocket sending
-            return error_msg
-
-        # --- Define Tasks ---
-        # Task for the Manager: Break down the user prompt
+            logger.error("crew_not_configured", task_id=task_id, error=error_msg)
+            self._notify({"type": "error", "message": error_msg})
+            raise CrewExecutionError(error_msg)
+
+        started = time.perf_counter()
+        completed = self._start_checkpoint(user_prompt, priority)
+        try:
+            # Each kickoff blocks this thread; progress streams meanwhile through the
+            # CrewAI event hooks (instrumentation), the Aider tool and `_notify`.
+            if self._cancelled():
+                self._finish_checkpoint(RunStatus.CANCELLED)
+                return "Task cancelled before crew execution started."
+            with self._phase("index"):
+                self._refresh_index()
+            if "plan" in completed:
+                plan = completed["plan"]["result"]
+            else:
+                with self._phase("plan"):
+                    plan = self._run_step("plan", lambda: self._run_plan(user_prompt))
+
+            subtasks = parse_plan(plan)
+            try:
+                graph = TaskGraph(subtasks)
+            except ValueError as e:
+                # Unusable dependency structure: run the steps one after another
+                logger.warning("plan_graph_rejected", task_id=self.task_id, error=str(e))
+                for index, subtask in enumerate(subtasks):
+                    subtask.task_id = f"step{index + 1}"
+                    subtask.depends_on = [f"step{index}"] if index else []
+                    subtask.files = []
+                graph = TaskGraph(subtasks)
+            # Sub-tasks finished by an earlier attempt count as done for the graph
+            for subtask in subtasks:
+                checkpoint = completed.get(f"subtask:{subtask.task_id}")
+                if checkpoint is not None:
+                    subtask.status = SubTaskStatus.COMPLETED
+                    subtask.result = checkpoint["result"]
+            if completed:
+                self._notify({"type": "resumed", "steps": sorted(completed)})
+            self._notify({"type": "plan", "subtasks": [subtask.to_dict() for subtask in subtasks]})
+
+            rerun = [subtask for subtask in subtasks if subtask.status != SubTaskStatus.COMPLETED]
+            graph.run(
+                lambda subtask: self._run_step(
+                    f"subtask:{subtask.task_id}", lambda: self._run_subtask(user_prompt, plan, subtask, graph)
+                ),
+                max_parallel=self.max_parallel_subtasks,
+                cancel_event=self.cancel_event,
+                on_update=lambda subtask: self._notify({"type": "subtask_status", **subtask.to_dict()}),
+            )
+            if self._cancelled():
+                self._finish_checkpoint(RunStatus.CANCELLED)
+                return "Task cancelled before review."
+
+            if "review" in completed and not rerun:
+                result = completed["review"]["result"]
+            else:
+                with self._phase("review"):
+                    result = self._run_step("review", lambda: self._run_review(user_prompt, subtasks))
+            logger.info("crew_finished", task_id=self.task_id, result=result)
+            # Runs with failed sub-tasks stay resumable: resuming retries just those
+            all_completed = all(subtask.status == SubTaskStatus.COMPLETED for subtask in subtasks)
+            self._finish_checkpoint(RunStatus.COMPLETED if all_completed else RunStatus.FAILED, result)
+
+            # Send final result via WebSocket
+            self._notify({"type": "final_result", "data": str(result)})
+            if not all_completed:
+                failed = [subtask.task_id for subtask in subtasks if subtask.status != SubTaskStatus.COMPLETED]
+                error_msg = f"Sub-tasks did not complete: {', '.join(failed)}. Resume the task to retry them."
+                self._notify({"type": "error", "message": error_msg})
+                raise CrewExecutionError(error_msg)
+
+            return result
+        except CrewExecutionError:
+            raise
+        except Exception as e:
+            error_msg = f"An error occurred during crew execution: {e}"
+            logger.exception("crew_failed", task_id=self.task_id)
+            self._finish_checkpoint(RunStatus.FAILED, error_msg)
+            self._notify({"type": "error", "message": error_msg})
+            raise CrewExecutionError(error_msg) from e
+        finally:
+            self._finish_timings(started)
+
+    def _run_plan(self, user_prompt: str) -> str:
+        """
+        Manager task: break the user prompt down into a plan of engineer sub-tasks.
+        Plans are cached by prompt, model and project state, so resubmitting the
+        same prompt against unchanged files skips the planning LLM call; runs
+        asking for the same plan at the same time share a single call.
+        """
+        cache = get_result_cache()
+        key = None
+        if cache is not None:
+            key = cache_key(
+                "plan",
+                prompt=user_prompt,
+                role="manager",
+                model=self.registry.model_name("manager"),
+                state=repo_state_hash(DEFAULT_PROJECT_ROOT),
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                self._notify({"type": "cache_hit", "phase": "plan"})
+                return cached
+        if key is None:
+            return self._kickoff_plan(user_prompt)
+        plan = get_llm_scheduler().coalesce(key, lambda: self._kickoff_plan(user_prompt), kind="plan")
+        cache.put(key, plan)
+        return plan
+
+    def _kickoff_plan(self, user_prompt: str) -> str:
+        context_files = self._describe_files(self._relevant_files(user_prompt))
         task_plan = Task(
             description=(
                 f"Analyze the user requirement: '{user_prompt}'. Break it down into specific, "
                 "actionable technical steps for the Senior Software Engineer. "
                 "Define the expected output or changes for each step. "
-                "Delegate the first implementation step to the Senior Software Engineer."
+                + (f"\nExisting project files that look relevant (path: top-level symbols):\n{context_files}\n" if context_files else "")
+                + PLAN_FORMAT_INSTRUCTIONS
             ),
-            expected_output="A clear, step-by-step technical plan and delegation of the first coding task to the Senior Software Engineer.",
+            expected_output="A JSON array of technical steps, each with id, description, files and depends_on.",
             agent=self.manager_agent
         )
+        return self._kickoff(task_plan, self.manager_agent, "plan")
 
-        # Task for the Engineer: Implement based on Manager's plan (example structure)
-        # This will likely be dynamically created or managed within a Flow
+    def _run_subtask(self, user_prompt: str, plan: str, subtask: SubTask, graph: TaskGraph) -> str:
+        """
+        Runs one sub-task in its own git worktree (when the project is a git repo)
+        and merges its commits back. Raises MergeConflictError on conflicts, which
+        fails the sub-task and skips its dependents, or TargetCheckoutError if the
+        main checkout is dirty or moved on, which does so without retrying.
+        """
+        workspaces = get_workspace_manager(DEFAULT_PROJECT_ROOT)
+        if workspaces is None:
+            with self._phase("engineer", subtask_id=subtask.task_id):
+                return self._run_engineer(user_prompt, plan, subtask, graph, DEFAULT_PROJECT_ROOT)
+        with workspaces.workspace(f"{self.task_id}/{subtask.task_id}") as workspace:
+            with self._phase("engineer", subtask_id=subtask.task_id):
+                result = self._run_engineer(user_prompt, plan, subtask, graph, workspace.path)
+            try:
+                with self._phase("merge", subtask_id=subtask.task_id):
+                    commit = workspaces.merge_back(workspace, message=f"codingorg: {subtask.task_id}: {subtask.description[:60]}")
+            except MergeConflictError as e:
+                self._notify({"type": "merge_conflict", "subtask_id": subtask.task_id, "files": e.files, "message": str(e)})
+                raise
+            except TargetCheckoutError as e:
+                self._notify({"type": "merge_blocked", "subtask_id": subtask.task_id, "message": str(e)})
+                raise
+        self._notify({"type": "subtask_merged", "subtask_id": subtask.task_id, "commit": commit})
+        return result
+
+    def _run_engineer(self, user_prompt: str, plan: str, subtask: SubTask, graph: TaskGraph, project_root: str) -> str:
+        """
+        Engineer task for one sub-task; runs in a TaskGraph worker thread with its own
+        agent and Aider tool. The step's files plus the closest matches from the
+        repository index are added to Aider's chat and listed in the task.
+        """
+        context_files = self._relevant_files(subtask.description, subtask.files)
+        aider_tool = self.registry.create_aider_tool(
+            websocket_manager=self.websocket_manager, task_id=self.task_id, project_root=project_root,
+            files=context_files,
+        )
+        engineer_agent = self.registry.create_engineer_agent(aider_tool)
+        dependencies = sorted(graph.dependencies[subtask.task_id])
+        dependency_budget = self.context_token_budget // max(len(dependencies), 1)
+        dependency_results = "\n\n".join(
+            f"Result of step '{dep}':\n"
+            + self._compact(f"subtask:{dep}", graph.subtasks[dep].result or "", dependency_budget, "engineer report", "engineer")
+            for dep in dependencies
+        )
+        plan = self._compact("plan", plan, self.context_token_budget, "technical plan", "engineer")
         task_implement = Task(
             description=(
-                "Receive the technical plan and specific task from the Development Manager. "
-                "Use the Aider Coding Tool to implement the assigned task. "
+                f"Overall user requirement: '{user_prompt}'.\n"
+                f"Full technical plan from the Development Manager:\n{plan}\n\n"
+                f"Your assigned step ('{subtask.task_id}'): {subtask.description}\n"
+                + (f"Files involved: {', '.join(subtask.files)}\n" if subtask.files else "")
+                + (f"Relevant existing files (already added to Aider's context):\n{self._describe_files(context_files)}\n"
+                   if context_files else "")
+                + (f"\n{dependency_results}\n\n" if dependency_results else "")
+                + "Use the Aider Coding Tool to implement only this step. "
                 "Ensure you write necessary tests to meet the 90% coverage goal. "
                 "Report the results, including any code changes or errors, back to the Development Manager."
             ),
             expected_output="Completed code changes, test results, and a status report including any issues encountered.",
-            agent=self.engineer_agent,
-            tools=[self.aider_tool],
-            context=[task_plan]  # Depends on the output of the planning task
+            agent=engineer_agent,
+            tools=[aider_tool],
         )
+        return self._kickoff(task_implement, engineer_agent, "engineer")
 
-        # Task for the Manager: Review the implementation (example structure)
+    def _run_review(self, user_prompt: str, subtasks: list) -> str:
+        """Manager task: review the joined results of all sub-tasks, each compacted to its share of the context budget."""
+        report_budget = self.context_token_budget // max(len(subtasks), 1)
+        reports = "\n\n".join(
+            f"Step '{subtask.task_id}' ({subtask.status}): {subtask.description}\nReport:\n"
+            + self._compact(f"subtask:{subtask.task_id}", subtask.result or "No result.", report_budget, "engineer report", "review")
+            for subtask in subtasks
+        )
+        failed = [subtask.task_id for subtask in subtasks if subtask.status != SubTaskStatus.COMPLETED]
         task_review = Task(
             description=(
+                f"Overall user requirement: '{user_prompt}'.\n"
+                f"Engineer reports for each step of the plan:\n{reports}\n\n"
                 "Review the code changes and test results provided by the Senior Software Engineer. "
-                "Verify if the implementation meets the requirements of the assigned task and the overall user prompt. "
-                "Provide feedback or request revisions if necessary. If satisfied, prepare a summary for the user."
+                "Verify if the implementation meets the requirements of the assigned tasks and the overall user prompt. "
+                + (f"These steps did not complete: {', '.join(failed)}. " if failed else "")
+                + "Provide feedback or request revisions if necessary. If satisfied, prepare a summary for the user."
             ),
             expected_output="A review summary, potentially including feedback for the engineer or a final report for the user.",
             agent=self.manager_agent,
-            context=[task_implement]  # Depends on the output of the implementation task
         )
-
-        # --- Create and Run Crew ---
-        # This is a simplified sequential example. CrewAI Flows might be better for complex logic.
-        crew = Crew(
-            agents=[self.manager_agent, self.engineer_agent],
-            tasks=[task_plan, task_implement, task_review],
-            process=Process.sequential,  # Start with sequential, consider hierarchical or Flows later
-            verbose=True,  # Provides detailed logs (Added comma)
-            # memory=True # Enable memory for context across tasks if needed
-            # llm=... # Removed central LLM config
-            # manager_llm=... # Can specify a different LLM for the crew manager itself if using hierarchical
-        )
-
-        print("Starting crew execution...")
-        try:
-            # TODO: Integrate WebSocket streaming for agent thoughts/actions here
-            # CrewAI's `kickoff` is blocking. Need to investigate callbacks or custom loops for streaming.
-            result = crew.kickoff()
-            print("Crew execution finished.")
-            print(f"Final Result:\n{result}")
-
-            # Send final result via WebSocket
-            if self.websocket_manager:
-                # self.websocket_manager.broadcast_message({"type": "final_result", "data": result})
-                pass  # Implement actual WebSocket sending
-
-            return result
-        except Exception as e:
-            error_msg = f"An error occurred during crew execution: {e}"
-            print(error_msg)
-            if self.websocket_manager:
-                # self.websocket_manager.broadcast_message({"type": "error", "message": error_msg})
-                pass  # Implement actual WebSocket sending
-            return error_msg
+        return self._kickoff(task_review, self.manager_agent, "review")
 
 # Example usage (for testing purposes)
 if __name__ == '__main__':
@@ -1,24 +1,61 @@
-from fastapi import FastAPI, WebSocket
-from fastapi.responses import HTMLResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, WebSocket
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.websockets import WebSocketDisconnect
 import uvicorn
 import os
-# import asyncio  # For running crew in background potentially
+import asyncio
 from pydantic import BaseModel  # Moved import to top
-from backend.utils.websocket_manager import WebSocketManager
-from backend.crew.task_orchestrator import TaskOrchestrator
+from backend.utils.websocket_manager import WebSocketManager, available_encodings
+from backend.utils.sse import TaskEventStream, accepts_gzip, parse_last_event_id
+from backend.utils.job_manager import Job, create_job_manager
+from backend.worker import make_job_runner, prewarm_crew, resume_interrupted_runs
+from backend.utils import metrics
+from backend.utils.checkpoint_store import RunStatus, get_checkpoint_store
+from backend.utils.context_compactor import lookup_context
+from backend.utils.logger import get_logger, setup_logging, shutdown_logging
 from dotenv import load_dotenv
 
-# Load environment variables from backend/.env file
-dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
-print(f"Attempting to load .env file from: {dotenv_path}")
-load_dotenv(dotenv_path=dotenv_path)
+# Load environment variables from backend/.env before the settings below read them
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 
-# Debug: Check if the key is loaded immediately after
-print(f"GOOGLE_API_KEY loaded in main.py: {'Yes' if os.getenv('GOOGLE_API_KEY') else 'No'}")
+logger = get_logger("api")
+manager = WebSocketManager()  # Create a single instance; its event bus is chosen by EVENT_BUS_URL
 
-app = FastAPI()
-manager = WebSocketManager()  # Create a single instance
+# NODE_ROLE=api serves the API and events only, leaving crews to `python -m backend.worker`
+# processes sharing the queue (JOB_QUEUE_URL); the default "all" also runs crews here.
+run_workers = os.getenv("NODE_ROLE", "all") != "api"
+job_manager = create_job_manager(make_job_runner(manager), websocket_manager=manager, run_workers=run_workers)
+
+# Point-in-time gauges, read whenever /metrics is scraped
+metrics.registry.gauge("codingorg_jobs_queued", "Tasks waiting in the queue.", function=job_manager.queue_size)
+metrics.registry.gauge("codingorg_jobs_running", "Tasks currently running.", function=job_manager.running_count)
+metrics.registry.gauge("codingorg_jobs_awaiting_admission", "Claimed tasks held back by the LLM token quota.", function=lambda: job_manager.awaiting_admission)
+metrics.registry.gauge("codingorg_ws_connections", "Open WebSocket connections.", function=lambda: len(manager.active_connections))
+metrics.registry.gauge("codingorg_sse_streams", "Open SSE task event streams.", function=lambda: TaskEventStream.open_streams)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()  # No-op unless a previous shutdown switched logging to synchronous writes
+    await manager.start()
+    await job_manager.start()
+    await asyncio.to_thread(get_checkpoint_store)  # Opens (and migrates) the database off the loop
+    await resume_interrupted_runs(job_manager)
+    # CrewAI and the LLM clients load in the background while the server already
+    # accepts connections; with CREW_PREWARM=0 the first crew run loads them instead.
+    # API-only nodes never run crews and skip them entirely.
+    if run_workers and os.getenv("CREW_PREWARM", "1") == "1":
+        app.state.crew_prewarm = asyncio.create_task(asyncio.to_thread(prewarm_crew))
+    logger.info("server_started", node_role=os.getenv("NODE_ROLE", "all"),
+                google_api_key_set=bool(os.getenv("GOOGLE_API_KEY")))
+    yield
+    await job_manager.stop()
+    await manager.stop()
+    shutdown_logging()  # Flush queued log records
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Basic HTML for testing WebSocket connection (optional, can be removed later)
 html = """
@@ -61,21 +98,30 @@ async def get():
     return HTMLResponse(html)
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, task_id: str = None, encoding: str = "json"):
+    # `encoding=msgpack` switches the client to binary frames (if msgpack is installed)
+    if encoding not in available_encodings():
+        await websocket.close(code=1003)  # Unsupported data
+        return
+    await manager.connect(websocket, encoding=encoding)
+    if task_id:
+        # Shortcut for `/ws?task_id=...`: subscribe to one task right away
+        manager.subscribe(websocket, task_id)
     try:
         while True:
-            # Keep connection open, listening for potential messages from client
-            # (though primary communication is server -> client for logs)
+            # Keep connection open, listening for messages from the client
+            # (primary communication is server -> client for logs)
             data = await websocket.receive_text()
-            print(f"Received message via WebSocket: {data}")
-            # Handle client messages if needed (e.g., pause/resume commands)
-            # For now, just acknowledge receipt
+            logger.debug("ws_received", client=websocket.client, data=data)
+            # Subscription control messages: {"action": "subscribe"|"unsubscribe", "task_id": ..., "events": [...]}
+            if await manager.handle_client_message(websocket, data):
+                continue
+            # Anything else is just acknowledged
             await manager.send_personal_message({"type": "ack", "message": f"Received: {data}"}, websocket)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        print(f"WebSocket error in endpoint: {e}")
+        logger.warning("ws_endpoint_error", client=websocket.client, error=repr(e))
         manager.disconnect(websocket)
         # Ensure connection is closed if not already
         try:
@@ -87,25 +133,130 @@ async def websocket_endpoint(websocket: WebSocket):
 
 class TaskRequest(BaseModel):
     prompt: str
+    priority: int = 0  # Lower values run first; equal priorities are FIFO
 
-@app.post("/start_task")
+
+async def _get_job_or_404(task_id: str) -> Job:
+    job = await job_manager.get(task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown task ID: {task_id}")
+    return job
+
+@app.post("/start_task", status_code=202)
 async def start_task(task_request: TaskRequest):
-    """Endpoint to start a new CrewAI task."""
+    """Endpoint to start a new CrewAI task. Returns a task ID immediately; the crew runs in the background."""
     user_prompt = task_request.prompt
-    print(f"Received task request via POST: {user_prompt}")
 
-    # Instantiate orchestrator with the WebSocket manager
-    orchestrator = TaskOrchestrator(websocket_manager=manager)
+    try:
+        job = await job_manager.submit(user_prompt, priority=task_request.priority)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Task queue is full, try again later.")
+
+    logger.info("task_queued", task_id=job.job_id, priority=job.priority, prompt=user_prompt)
+    return {"message": "Task queued.", "task_id": job.job_id, "status": job.status}
 
-    # Run the crew - NOTE: This is currently BLOCKING
-    # TODO: Run this in a background thread/task to not block the HTTP response
-    # For now, the client will wait until the crew finishes.
-    result = orchestrator.run_crew(user_prompt)
+@app.get("/tasks/{task_id}")
+async def get_task_status(task_id: str):
+    """Returns the current status of a task."""
+    return (await _get_job_or_404(task_id)).to_dict()
+
+@app.get("/tasks/{task_id}/result")
+async def get_task_result(task_id: str):
+    """Returns the result of a finished task (409 while it is still queued or running)."""
+    job = await _get_job_or_404(task_id)
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Task is not finished (status: {job.status}).")
+    return job.to_dict(include_result=True)
+
+@app.get("/tasks/{task_id}/events")
+async def get_task_events(task_id: str, since: int = 0, limit: int = 1000):
+    """Returns a task's recorded events with seq > `since` (for polling clients and resume after reconnect)."""
+    events, first_seq = manager.event_log.read_since(task_id, since, limit=limit)
+    return {
+        "task_id": task_id,
+        "events": events,
+        "gap": first_seq > since + 1,  # True if older events were no longer retained
+        "last_seq": manager.event_log.last_seq(task_id),
+    }
+
+@app.get("/tasks/{task_id}/stream")
+async def stream_task_events(
+    task_id: str,
+    since: int = 0,
+    events: str = None,
+    last_event_id: str = Header(None),
+    accept_encoding: str = Header(None),
+):
+    """
+    Streams a task's events as Server-Sent Events. Reconnecting clients resume
+    after their `Last-Event-ID` header (or `since`, for clients that can't set
+    headers); `events` is an optional comma-separated list of event types.
+    """
+    if not manager.event_log.has_task(task_id) and await job_manager.get(task_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown task ID: {task_id}")
+    stream = TaskEventStream(
+        manager,
+        task_id,
+        since=parse_last_event_id(last_event_id) if last_event_id else since,
+        events=[name.strip() for name in events.split(",") if name.strip()] if events else None,
+        compress=os.getenv("SSE_COMPRESSION", "1") != "0" and accepts_gzip(accept_encoding),
+    )
+    return StreamingResponse(stream, media_type="text/event-stream", headers=stream.headers)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of queue, LLM, tool, Aider and WebSocket metrics."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/tasks/{task_id}/timings")
+async def get_task_timings(task_id: str):
+    """Returns the per-phase timing and token breakdown recorded for a task so far."""
+    await _get_job_or_404(task_id)
+    timings = metrics.get_task_timings(task_id)
+    return {"task_id": task_id, **timings.to_dict()}
+
+@app.get("/context/{ref}", response_class=PlainTextResponse)
+async def get_context(ref: str):
+    """Returns the full text behind a `ctx-...` reference left in compacted task context."""
+    text = await asyncio.to_thread(lookup_context, ref)
+    if text is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired context reference: {ref}")
+    return PlainTextResponse(text)
+
+def _checkpointed_run(task_id: str):
+    store = get_checkpoint_store()
+    return store.get_run(task_id) if store is not None else None
+
+@app.post("/tasks/{task_id}/resume", status_code=202)
+async def resume_task(task_id: str):
+    """
+    Requeues a failed, cancelled or interrupted task under the same ID. It
+    continues from its last checkpointed step instead of starting over.
+    """
+    run = await asyncio.to_thread(_checkpointed_run, task_id)  # SQLite reads stay off the event loop
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"No checkpoint for task ID: {task_id}")
+    if run["status"] == RunStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Task already completed.")
+    try:
+        job = await job_manager.submit(run["prompt"], priority=run["priority"], job_id=task_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Task queue is full, try again later.")
+    logger.info("task_resumed", task_id=task_id, reason="request")
+    return {"message": "Task queued to resume.", "task_id": job.job_id, "status": job.status}
 
-    # Return the final result (or an initial task ID if running in background)
-    return {"message": "Task execution finished (sync).", "result": result}
+@app.post("/tasks/{task_id}/cancel")
+async def cancel_task(task_id: str):
+    """Cancels a queued task, or asks a running task to stop after its current step."""
+    await _get_job_or_404(task_id)
+    job = await job_manager.cancel(task_id)
+    return job.to_dict()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     print(f"Starting server on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # permessage-deflate is negotiated with clients that support it; batched
+    # log frames are highly repetitive text and compress well.
+    uvicorn.run(app, host="0.0.0.0", port=port, ws_per_message_deflate=os.getenv("WS_PER_MESSAGE_DEFLATE", "1") == "1")
\ No newline at end of file
@@ -0,0 +1,79 @@
+# backend/tests/test_aider_output.py
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from backend.tools.aider_output import AiderOutputParser
+
+# Aider's stdout and stderr interleaved as the pumps read them: a warning on
+# stderr arrives in the middle of a SEARCH/REPLACE block on stdout.
+INTERLEAVED = [
+    ("stdout", "foo.py"),
+    ("stdout", "<<<<<<< SEARCH"),
+    ("stdout", "a = 1"),
+    ("stderr", "Warning: some stderr noise"),
+    ("stderr", "ValueError: bad thing"),
+    ("stdout", "======="),
+    ("stdout", "a = 2"),
+    ("stdout", ">>>>>>> REPLACE"),
+    ("stdout", "Applied edit to foo.py"),
+]
+
+
+class InterleavedStreamsTest(unittest.TestCase):
+    def test_stderr_lines_stay_out_of_stdout_edit_blocks(self):
+        parsers = {"stdout": AiderOutputParser(), "stderr": AiderOutputParser()}
+        events = [event for stream, line in INTERLEAVED for event in parsers[stream].feed(line)]
+
+        hunks = [event for event in events if event["type"] == "aider_hunk"]
+        self.assertEqual(len(hunks), 1)
+        self.assertEqual(hunks[0]["diff"].splitlines()[1:], ["-a = 1", "+a = 2"])
+        self.assertEqual((hunks[0]["added"], hunks[0]["removed"]), (1, 1))
+        self.assertIn({"type": "aider_error", "message": "ValueError: bad thing"}, events)
+
+        report = parsers["stdout"].report("Aider task completed.", others=[parsers["stderr"]])
+        self.assertIn("Edited files: foo.py", report)
+        self.assertIn("- ValueError: bad thing", report)
+        self.assertNotIn("Warning", report)
+
+    def test_report_merges_files_from_every_stream(self):
+        stdout, stderr = AiderOutputParser(), AiderOutputParser()
+        stdout.feed("Added foo.py to the chat.")
+        stderr.feed("Applied edit to foo.py")
+        stdout.feed("Added foo.py to the chat.")
+        self.assertIn("Edited files: foo.py", stdout.report("done", others=[stderr]))
+
+
+FAKE_AIDER = """\
+#!{python}
+import sys, time
+for stream, line in {lines!r}:
+    print(line, file=getattr(sys, stream), flush=True)
+    time.sleep(0.02)  # Let the other stream's pump read in between
+"""
+
+
+class AiderToolStreamsTest(unittest.TestCase):
+    def test_process_output_streams_parse_separately(self):
+        try:
+            from backend.tools.aider_tool import AiderTool
+        except ImportError as e:
+            self.skipTest(f"AiderTool needs CrewAI: {e}")
+        with tempfile.TemporaryDirectory() as root:
+            script = os.path.join(root, "aider")
+            with open(script, "w") as f:
+                f.write(textwrap.dedent(FAKE_AIDER).format(python=sys.executable, lines=INTERLEAVED))
+            os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+            tool = AiderTool(aider_path=script, project_root=root, use_pool=False, use_cache=False, stream_logs=False)
+            result = asyncio.run(tool._run_process("change a", {"output_bytes": 0}))
+        self.assertIn("--- foo.py\n@@ -1 +1 @@\n-a = 1\n+a = 2", result)
+        self.assertIn("- ValueError: bad thing", result)
+        self.assertNotIn("-Warning", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
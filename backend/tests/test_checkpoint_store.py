@@ -0,0 +1,126 @@
+# backend/tests/test_checkpoint_store.py
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from backend.crew.task_graph import SubTask, SubTaskStatus, TaskGraph
+from backend.utils.checkpoint_store import CheckpointStore, RunStatus
+
+PLAN = json.dumps([
+    {"id": "a", "description": "Step A", "files": ["a.py"]},
+    {"id": "b", "description": "Step B", "files": ["b.py"], "depends_on": ["a"]},
+    {"id": "c", "description": "Step C", "files": ["c.py"]},
+])
+
+
+class CheckpointStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(os.path.join(self.tempdir.name, "checkpoints.sqlite3"), history_size=2)
+
+    def tearDown(self):
+        self.store.close()
+        self.tempdir.cleanup()
+
+    def test_failures_never_overwrite_a_completed_step(self):
+        self.store.start_run("t", "prompt")
+        self.store.record_failure("t", "plan", "timeout")
+        self.store.save_step("t", "plan", "the plan")
+        self.store.record_failure("t", "plan", "late failure")
+        self.store.record_failure("t", "review", "boom")
+        self.assertEqual(self.store.completed_steps("t"), {"plan": {"result": "the plan", "attempts": 2}})
+
+    def test_running_runs_are_reported_as_interrupted(self):
+        self.store.start_run("done", "prompt")
+        self.store.finish_run("done", RunStatus.COMPLETED, "ok")
+        self.store.start_run("cut", "prompt", priority=5)
+        self.assertEqual([(run["task_id"], run["priority"]) for run in self.store.interrupted_runs()], [("cut", 5)])
+
+    def test_restarting_a_run_keeps_its_steps(self):
+        self.store.start_run("t", "prompt")
+        self.store.save_step("t", "plan", "the plan")
+        self.store.finish_run("t", RunStatus.FAILED, "error")
+        self.store.start_run("t", "prompt")
+        self.assertEqual(self.store.get_run("t")["status"], RunStatus.RUNNING)
+        self.assertIn("plan", self.store.completed_steps("t"))
+
+    def test_oldest_finished_runs_are_pruned_with_their_steps(self):
+        for task_id in ("one", "two", "three"):
+            self.store.start_run(task_id, "prompt")
+            self.store.save_step(task_id, "plan", "p")
+            self.store.finish_run(task_id, RunStatus.COMPLETED)
+        self.assertIsNone(self.store.get_run("one"))
+        self.assertEqual(self.store.completed_steps("one"), {})
+        self.assertIsNotNone(self.store.get_run("three"))
+
+
+class TaskGraphResumeTest(unittest.TestCase):
+    def test_completed_steps_are_not_run_again(self):
+        subtasks = [SubTask("one", "a", files=["a.py"]), SubTask("two", "b", files=["b.py"], depends_on=["one"])]
+        subtasks[0].status = SubTaskStatus.COMPLETED
+        started = []
+        TaskGraph(subtasks).run(lambda subtask: started.append(subtask.task_id) or "done", max_parallel=1)
+        self.assertEqual(started, ["two"])
+
+
+class CrewResumeTest(unittest.TestCase):
+    """Runs the orchestrator with its LLM-backed steps replaced, checkpointing into a temporary database."""
+
+    def setUp(self):
+        environment = mock.patch.dict(os.environ, {"GOOGLE_API_KEY": "test", "CHECKPOINTS_ENABLED": "0"})
+        environment.start()
+        self.addCleanup(environment.stop)
+        from backend.crew.task_orchestrator import TaskOrchestrator  # Imports CrewAI
+
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tempdir.cleanup)
+        self.store = CheckpointStore(os.path.join(self.tempdir.name, "checkpoints.sqlite3"))
+        self.addCleanup(self.store.close)
+        self.calls = []
+        self.failing = {"b"}
+        self.orchestrator = TaskOrchestrator(websocket_manager=None)
+        self.orchestrator.checkpoints = self.store
+        self.orchestrator.max_step_attempts = 1
+        self.orchestrator._refresh_index = lambda: None
+        self.orchestrator._run_plan = self.run_plan
+        self.orchestrator._run_subtask = self.run_subtask
+        self.orchestrator._run_review = self.run_review
+
+    def run_plan(self, user_prompt):
+        self.calls.append("plan")
+        return PLAN
+
+    def run_subtask(self, user_prompt, plan, subtask, graph):
+        self.calls.append(subtask.task_id)
+        if subtask.task_id in self.failing:
+            raise RuntimeError(f"{subtask.task_id} failed")
+        return f"{subtask.task_id} report"
+
+    def run_review(self, user_prompt, subtasks):
+        self.calls.append("review")
+        return "approved"
+
+    def test_resume_skips_completed_steps(self):
+        from backend.crew.task_orchestrator import CrewExecutionError
+
+        with self.assertRaises(CrewExecutionError):
+            self.orchestrator.run_crew("prompt", task_id="t")
+        self.assertEqual(self.store.get_run("t")["status"], RunStatus.FAILED)
+        self.assertEqual(set(self.store.completed_steps("t")), {"plan", "subtask:a", "subtask:c", "review"})
+        self.assertEqual(sorted(self.calls), ["a", "b", "c", "plan", "review"])
+
+        self.calls.clear()
+        self.failing.clear()
+        self.assertEqual(self.orchestrator.run_crew("prompt", task_id="t"), "approved")
+        self.assertEqual(self.calls, ["b", "review"])  # The review reruns because "b" did
+        self.assertEqual(self.store.get_run("t")["status"], RunStatus.COMPLETED)
+
+        self.calls.clear()
+        self.orchestrator.run_crew("prompt", task_id="t")
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
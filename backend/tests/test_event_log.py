@@ -0,0 +1,87 @@
+# backend/tests/test_event_log.py
+import os
+import tempfile
+import unittest
+
+from backend.utils import event_log
+from backend.utils.event_log import EventLog
+
+
+def seqs(events):
+    return [event["seq"] for event in events]
+
+
+class EventLogTest(unittest.TestCase):
+    def test_events_get_consecutive_seqs_per_task(self):
+        log = EventLog(capacity=10, max_tasks=10)
+        self.assertEqual(log.append("a", {"type": "x"})["seq"], 1)
+        self.assertEqual(log.append("b", {"type": "x"})["seq"], 1)
+        self.assertEqual(log.append("a", {"type": "x"})["seq"], 2)
+        self.assertEqual(log.last_seq("a"), 2)
+        self.assertEqual(log.last_seq("unknown"), 0)
+
+    def test_ring_buffer_reports_a_gap_for_evicted_events(self):
+        log = EventLog(capacity=3, max_tasks=10)
+        for _ in range(5):
+            log.append("a", {"type": "x"})
+        events, first = log.read_since("a", 0)
+        self.assertEqual(seqs(events), [3, 4, 5])
+        self.assertEqual(first, 3)  # 1..2 are gone
+        events, first = log.read_since("a", 3)
+        self.assertEqual((seqs(events), first), ([4, 5], 4))
+
+    def test_unknown_task_has_no_events_and_no_gap(self):
+        self.assertEqual(EventLog(capacity=3).read_since("missing", 7), ([], 8))
+
+    def test_spilled_events_replay_without_gap(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            log = EventLog(capacity=2, spill_dir=spill_dir, max_tasks=10)
+            for index in range(10):
+                log.append("a", {"type": "x", "n": index})
+            events, first = log.read_since("a", 0)
+            self.assertEqual((seqs(events), first), (list(range(1, 11)), 1))
+            self.assertEqual(events[0]["n"], 0)
+            events, _ = log.read_since("a", 4, limit=3)
+            self.assertEqual(seqs(events), [5, 6, 7])
+
+    def test_disk_reads_seek_through_the_offset_index(self):
+        original = event_log.INDEX_INTERVAL
+        event_log.INDEX_INTERVAL = 4
+        try:
+            with tempfile.TemporaryDirectory() as spill_dir:
+                log = EventLog(capacity=2, spill_dir=spill_dir, max_tasks=10)
+                for _ in range(20):
+                    log.append("a", {"type": "x"})
+                for since in (0, 3, 4, 5, 12, 16):
+                    events, first = log.read_since("a", since, limit=2)
+                    self.assertEqual((seqs(events), first), ([since + 1, since + 2], since + 1), since)
+        finally:
+            event_log.INDEX_INTERVAL = original
+
+    def test_sealed_log_reopens_for_reads_and_appends(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            log = EventLog(capacity=1, spill_dir=spill_dir, max_tasks=10)
+            log.append("a", {"type": "x"})
+            log.append("a", {"type": "task_status", "status": "completed"})
+            log.seal("a")
+            self.assertTrue(log.is_sealed("a"))
+            self.assertEqual(seqs(log.read_since("a", 0)[0]), [1, 2])
+            log.append("a", {"type": "x"})  # Resumed task
+            self.assertFalse(log.is_sealed("a"))
+            self.assertEqual(seqs(log.read_since("a", 0)[0]), [1, 2, 3])
+
+    def test_least_recently_written_task_is_evicted_with_its_segment(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            log = EventLog(capacity=5, spill_dir=spill_dir, max_tasks=2)
+            log.append("a", {"type": "x"})
+            log.append("b", {"type": "x"})
+            log.append("a", {"type": "x"})  # "b" is now the oldest
+            self.assertTrue(os.path.exists(os.path.join(spill_dir, "b.jsonl")))
+            log.append("c", {"type": "x"})
+            self.assertTrue(log.has_task("a"))
+            self.assertFalse(log.has_task("b"))
+            self.assertFalse(os.path.exists(os.path.join(spill_dir, "b.jsonl")))
+
+
+if __name__ == "__main__":
+    unittest.main()
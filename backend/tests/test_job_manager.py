@@ -0,0 +1,82 @@
+# backend/tests/test_job_manager.py
+import asyncio
+import time
+import unittest
+
+from backend.utils.job_manager import JobManager, JobStatus
+
+
+async def wait_finished(manager: JobManager, job_id: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = await manager.get(job_id)
+        if job.finished or time.monotonic() > deadline:
+            return job
+        await asyncio.sleep(0.01)
+
+
+class JobManagerTest(unittest.IsolatedAsyncioTestCase):
+    async def run_job(self, runner, cancel: bool = False):
+        manager = JobManager(runner, max_concurrency=1, max_queue_size=10)
+        await manager.start()
+        try:
+            job = await manager.submit("prompt")
+            if cancel:
+                await manager.cancel(job.job_id)
+            return await wait_finished(manager, job.job_id)
+        finally:
+            await manager.stop()
+
+    async def test_failing_runner_ends_failed_with_error(self):
+        def runner(job):
+            raise RuntimeError("Sub-tasks did not complete: step2")
+
+        job = await self.run_job(runner)
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertEqual(job.error, "Sub-tasks did not complete: step2")
+        self.assertIsNone(job.result)
+
+    async def test_successful_runner_ends_completed_with_result(self):
+        job = await self.run_job(lambda job: "done")
+        self.assertEqual(job.status, JobStatus.COMPLETED)
+        self.assertEqual(job.result, "done")
+        self.assertIsNone(job.error)
+
+    async def test_error_after_cancellation_ends_cancelled(self):
+        started = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def runner(job):
+            loop.call_soon_threadsafe(started.set)
+            job.cancel_event.wait(5)
+            raise RuntimeError("step interrupted")
+
+        manager = JobManager(runner, max_concurrency=1, max_queue_size=10)
+        await manager.start()
+        try:
+            job = await manager.submit("prompt")
+            await asyncio.wait_for(started.wait(), 5)
+            await manager.cancel(job.job_id)
+            job = await wait_finished(manager, job.job_id)
+        finally:
+            await manager.stop()
+        self.assertEqual(job.status, JobStatus.CANCELLED)
+
+    async def test_cancelled_while_queued_never_runs(self):
+        ran = []
+        manager = JobManager(lambda job: ran.append(job.job_id), max_concurrency=1, max_queue_size=10)
+        await manager.start()
+        try:
+            blocker = await manager.submit("first")
+            job = await manager.submit("second")
+            await manager.cancel(job.job_id)
+            await wait_finished(manager, blocker.job_id)
+            job = await wait_finished(manager, job.job_id)
+        finally:
+            await manager.stop()
+        self.assertEqual(job.status, JobStatus.CANCELLED)
+        self.assertEqual(ran, [blocker.job_id])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+# backend/tests/test_llm_scheduler.py
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+from backend.tests.test_job_manager import wait_finished
+from backend.utils import job_manager
+from backend.utils.job_manager import JobManager, JobStatus
+from backend.utils.llm_scheduler import LLMScheduler, RateLimit, TokenBucket, is_rate_limit_error, retry_after
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_full_bucket_then_waits_for_the_debt(self):
+        bucket = TokenBucket(60)  # One unit per second
+        bucket.updated = 0.0
+        self.assertEqual(bucket.reserve(60, now=0.0), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1, now=0.0), 1.0)
+        self.assertAlmostEqual(bucket.reserve(1, now=0.0), 2.0)  # Waiters queue up in arrival order
+        self.assertAlmostEqual(bucket.reserve(1, now=10.0), 0.0)
+
+    def test_oversized_requests_cost_at_most_a_full_bucket(self):
+        bucket = TokenBucket(60)
+        bucket.updated = 0.0
+        self.assertEqual(bucket.reserve(1000, now=0.0), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1, now=0.0), 1.0)
+
+    def test_adjust_returns_overestimated_tokens(self):
+        bucket = TokenBucket(60)
+        bucket.updated = 0.0
+        bucket.reserve(60, now=0.0)
+        bucket.adjust(-30, now=0.0)
+        self.assertEqual(bucket.reserve(30, now=0.0), 0.0)
+
+    def test_pause_blocks_even_a_full_bucket(self):
+        bucket = TokenBucket(60)
+        bucket.updated = 0.0
+        bucket.pause(5, now=0.0)
+        self.assertAlmostEqual(bucket.reserve(0, now=1.0), 4.0)
+
+
+class LLMSchedulerTest(unittest.TestCase):
+    def test_limits_resolve_by_model_then_provider_then_default(self):
+        model, provider, default = RateLimit(1), RateLimit(2), RateLimit(3)
+        scheduler = LLMScheduler(limits={"gemini/pro": model, "gemini/*": provider}, default_limit=default)
+        self.assertIs(scheduler.limit_for("gemini/pro"), model)
+        self.assertIs(scheduler.limit_for("gemini/flash"), provider)
+        self.assertIs(scheduler.limit_for("openai/gpt"), default)
+
+    def test_acquire_paces_requests_per_key(self):
+        scheduler = LLMScheduler(limits={"*": RateLimit(tpm=120)}, default_limit=RateLimit())  # 2 tokens/s
+        scheduler.acquire("gemini/pro", api_key="one", tokens=120)
+        started = time.monotonic()
+        scheduler.acquire("gemini/pro", api_key="two", tokens=120)  # Another key has its own quota
+        self.assertLess(time.monotonic() - started, 0.1)
+        scheduler.acquire("gemini/pro", api_key="one", tokens=1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.45)
+
+    def test_throttle_pauses_the_model_without_provider_prefix(self):
+        scheduler = LLMScheduler(default_limit=RateLimit(rpm=6000))
+        scheduler.acquire("gemini/pro")
+        scheduler.throttle("pro", seconds=0.3)
+        started = time.monotonic()
+        scheduler.acquire("gemini/pro")
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+
+    def test_cancelled_acquire_returns_early(self):
+        scheduler = LLMScheduler(default_limit=RateLimit(rpm=6000))
+        scheduler.acquire("gemini/pro")
+        scheduler.throttle("gemini/pro", seconds=30)
+        cancel = threading.Event()
+        threading.Timer(0.1, cancel.set).start()
+        started = time.monotonic()
+        scheduler.acquire("gemini/pro", cancel_event=cancel)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_identical_requests_in_flight_run_once(self):
+        scheduler = LLMScheduler(default_limit=RateLimit())
+        calls = []
+        release = threading.Event()
+
+        def run():
+            calls.append(1)
+            release.wait(5)
+            return "plan"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(scheduler.coalesce("key", run))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual((len(calls), results), (1, ["plan"] * 4))
+        self.assertEqual(scheduler.coalesce("key", lambda: "again"), "again")  # Nothing cached afterwards
+
+    def test_admission_holds_jobs_beyond_the_projected_demand(self):
+        scheduler = LLMScheduler(default_limit=RateLimit(), admission_tpm=100, job_token_rate=60)
+        self.assertTrue(scheduler.try_admit("a"))
+        self.assertFalse(scheduler.try_admit("b"))  # 2 jobs x 60 > 100
+        scheduler.release("a")
+        self.assertTrue(scheduler.try_admit("b"))
+        unlimited = LLMScheduler(default_limit=RateLimit(), admission_tpm=0)
+        self.assertTrue(all(unlimited.try_admit(str(index)) for index in range(10)))
+
+    def test_release_folds_measured_use_into_the_estimate(self):
+        scheduler = LLMScheduler(default_limit=RateLimit(), admission_tpm=100, job_token_rate=1000)
+        scheduler.try_admit("a")
+        scheduler.release("a", tokens=10)  # Rounded up to one second: 600 tokens/min
+        self.assertAlmostEqual(scheduler.job_token_rate, 0.8 * 1000 + 0.2 * 600)
+
+    def test_rate_limit_errors_and_retry_delays_are_recognized(self):
+        self.assertTrue(is_rate_limit_error("litellm.RateLimitError: quota exceeded"))
+        self.assertFalse(is_rate_limit_error("def rate_limit(): pass"))
+        self.assertEqual(retry_after("Please retry in 21.5s."), 21.5)
+
+
+class AdmissionControlTest(unittest.IsolatedAsyncioTestCase):
+    async def test_job_waits_for_admission_and_can_be_cancelled_meanwhile(self):
+        scheduler = LLMScheduler(default_limit=RateLimit(), admission_tpm=100, job_token_rate=60)
+        release = threading.Event()
+        ran = []
+
+        def runner(job):
+            ran.append(job.job_id)
+            release.wait(5)
+            return "done"
+
+        with mock.patch.object(job_manager, "get_llm_scheduler", return_value=scheduler), \
+                mock.patch.object(job_manager, "ADMISSION_POLL_INTERVAL", 0.01):
+            manager = JobManager(runner, max_concurrency=3, max_queue_size=10)
+            await manager.start()
+            try:
+                first = await manager.submit("one")
+                second = await manager.submit("two")
+                third = await manager.submit("three")
+                for _ in range(100):
+                    if ran and manager.awaiting_admission == 2:
+                        break
+                    await asyncio.sleep(0.01)
+                self.assertEqual((ran, manager.awaiting_admission), ([first.job_id], 2))
+                await manager.cancel(third.job_id)
+                release.set()
+                self.assertEqual((await wait_finished(manager, second.job_id)).status, JobStatus.COMPLETED)
+                self.assertEqual((await wait_finished(manager, third.job_id)).status, JobStatus.CANCELLED)
+                self.assertEqual(ran, [first.job_id, second.job_id])
+                self.assertEqual(scheduler.admitted_count(), 0)
+            finally:
+                release.set()
+                await manager.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
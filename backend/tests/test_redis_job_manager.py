@@ -0,0 +1,135 @@
+# backend/tests/test_redis_job_manager.py
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+from backend.tests.test_job_manager import wait_finished
+from backend.utils.job_manager import JobStatus
+from backend.utils.redis_job_manager import RedisJobManager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks"))
+from fake_redis import start_server  # noqa: E402
+
+try:
+    import redis  # Optional dependency of RedisJobManager
+except ImportError:
+    redis = None
+
+
+class Runner:
+    """Blocking job runner that records which jobs ran, optionally until released."""
+
+    def __init__(self, block: bool = False):
+        self.ran = []
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def __call__(self, job):
+        self.ran.append(job.job_id)
+        self.release.wait(5)
+        return "done"
+
+
+@unittest.skipIf(redis is None, "needs the optional redis package")
+class RedisJobManagerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = await start_server("127.0.0.1", 0)
+        self.url = f"redis://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/0"
+        self.managers = []
+
+    async def asyncTearDown(self):
+        for manager in self.managers:
+            await manager.stop()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def manager(self, runner, run_workers: bool = True, **kwargs) -> RedisJobManager:
+        manager = RedisJobManager(runner, self.url, run_workers=run_workers, max_concurrency=1, **kwargs)
+        await manager.start()
+        self.managers.append(manager)
+        return manager
+
+    async def test_jobs_are_claimed_by_exactly_one_executor(self):
+        runner = Runner()
+        api = await self.manager(runner, run_workers=False)
+        await self.manager(runner)
+        await self.manager(runner)
+        jobs = [await api.submit(f"prompt {index}") for index in range(6)]
+        for job in jobs:
+            self.assertEqual((await wait_finished(api, job.job_id)).status, JobStatus.COMPLETED)
+        self.assertEqual(sorted(runner.ran), sorted(job.job_id for job in jobs))
+
+    async def test_cancelling_a_queued_job_removes_it_from_the_queue(self):
+        runner = Runner()
+        api = await self.manager(runner, run_workers=False)
+        job = await api.submit("prompt")
+        self.assertEqual((await api.cancel(job.job_id)).status, JobStatus.CANCELLED)
+        await self.manager(runner)
+        await asyncio.sleep(0.2)
+        self.assertEqual((await api.get(job.job_id)).status, JobStatus.CANCELLED)
+        self.assertEqual(runner.ran, [])
+
+    async def test_cancel_between_claim_and_registration_is_not_lost(self):
+        runner = Runner()
+        api = await self.manager(runner, run_workers=False)
+        worker = RedisJobManager(runner, self.url, run_workers=True, max_concurrency=1)
+        claimed = asyncio.Event()
+        cancelled = asyncio.Event()
+        original_get = worker.get
+
+        async def get_after_cancel(job_id):
+            # The job is popped from the queue but not registered yet
+            job = await original_get(job_id)
+            claimed.set()
+            await cancelled.wait()
+            return job
+
+        worker.get = get_after_cancel
+        await worker.start()
+        self.managers.append(worker)
+        job = await api.submit("prompt")
+        await asyncio.wait_for(claimed.wait(), 5)
+        await api.cancel(job.job_id)
+        await asyncio.sleep(0.1)  # The control message finds no registered job
+        cancelled.set()
+        self.assertEqual((await wait_finished(api, job.job_id)).status, JobStatus.CANCELLED)
+        self.assertEqual(runner.ran, [])
+
+        worker.get = original_get
+        resubmitted = await api.submit("prompt", job_id=job.job_id)  # The stale cancel flag is cleared
+        self.assertEqual((await wait_finished(api, resubmitted.job_id)).status, JobStatus.COMPLETED)
+        self.assertEqual(runner.ran, [job.job_id])
+
+    async def test_cancelling_a_running_job_reaches_its_executor(self):
+        runner = Runner(block=True)
+        api = await self.manager(runner, run_workers=False)
+        await self.manager(runner)
+        job = await api.submit("prompt")
+        while not runner.ran:
+            await asyncio.sleep(0.01)
+        await api.cancel(job.job_id)
+        for _ in range(100):
+            if (await api.get(job.job_id)).status == JobStatus.CANCELLING:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual((await api.get(job.job_id)).status, JobStatus.CANCELLING)
+        runner.release.set()
+        self.assertEqual((await wait_finished(api, job.job_id)).status, JobStatus.CANCELLED)
+
+    async def test_queue_size_is_shared_between_processes(self):
+        runner = Runner()
+        api = await self.manager(runner, run_workers=False, max_queue_size=2)
+        await api.submit("one")
+        await api.submit("two")
+        other = await self.manager(runner, run_workers=False, max_queue_size=2)
+        await asyncio.sleep(0.05)  # First queue length poll
+        self.assertEqual((api.queue_size(), other.queue_size()), (2, 2))
+        with self.assertRaises(asyncio.QueueFull):
+            await other.submit("three")
+
+
+if __name__ == "__main__":
+    unittest.main()
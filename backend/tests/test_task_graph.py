@@ -0,0 +1,110 @@
+# backend/tests/test_task_graph.py
+import threading
+import unittest
+
+from backend.crew.task_graph import SubTask, SubTaskStatus, TaskGraph, parse_plan
+
+
+class Recorder:
+    """Sub-task executor that records start/finish order and fails chosen steps."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.events = []
+        self.lock = threading.Lock()
+
+    def __call__(self, subtask: SubTask) -> str:
+        with self.lock:
+            self.events.append(("start", subtask.task_id))
+        if subtask.task_id in self.fail:
+            raise RuntimeError(f"{subtask.task_id} broke")
+        with self.lock:
+            self.events.append(("finish", subtask.task_id))
+        return f"{subtask.task_id} done"
+
+    def started(self):
+        return [task_id for event, task_id in self.events if event == "start"]
+
+
+def statuses(subtasks):
+    return {subtask.task_id: subtask.status for subtask in subtasks}
+
+
+class TaskGraphTest(unittest.TestCase):
+    def test_steps_start_after_their_dependencies_finish(self):
+        graph = TaskGraph([
+            SubTask("api", "a", files=["api.py"]),
+            SubTask("ui", "b", files=["ui.py"], depends_on=["api"]),
+            SubTask("docs", "c", files=["README.md"]),
+            SubTask("tests", "d", files=["test_api.py"], depends_on=["api", "ui"]),
+        ])
+        recorder = Recorder()
+        result = graph.run(recorder, max_parallel=4)
+        self.assertEqual(set(statuses(result).values()), {SubTaskStatus.COMPLETED})
+        for step, dependency in (("ui", "api"), ("tests", "api"), ("tests", "ui")):
+            self.assertLess(recorder.events.index(("finish", dependency)), recorder.events.index(("start", step)))
+        self.assertEqual([subtask.task_id for subtask in result], ["api", "ui", "docs", "tests"])
+
+    def test_shared_files_and_unscoped_steps_are_serialized(self):
+        graph = TaskGraph([
+            SubTask("one", "a", files=["app.py"]),
+            SubTask("two", "b", files=["app.py", "util.py"]),
+            SubTask("three", "c", files=["other.py"]),
+            SubTask("four", "d"),
+        ])
+        self.assertEqual(graph.dependencies["two"], {"one"})
+        self.assertEqual(graph.dependencies["three"], set())
+        self.assertEqual(graph.dependencies["four"], {"one", "two", "three"})
+
+    def test_failure_skips_dependents_but_not_unrelated_branches(self):
+        graph = TaskGraph([
+            SubTask("base", "a", files=["base.py"]),
+            SubTask("child", "b", files=["child.py"], depends_on=["base"]),
+            SubTask("grandchild", "c", files=["grand.py"], depends_on=["child"]),
+            SubTask("other", "d", files=["other.py"]),
+        ])
+        updates = []
+        result = graph.run(Recorder(fail=["base"]), max_parallel=2, on_update=lambda s: updates.append((s.task_id, s.status)))
+        self.assertEqual(statuses(result), {
+            "base": SubTaskStatus.FAILED,
+            "child": SubTaskStatus.SKIPPED,
+            "grandchild": SubTaskStatus.SKIPPED,
+            "other": SubTaskStatus.COMPLETED,
+        })
+        self.assertIn("base broke", graph.subtasks["base"].result)
+        self.assertIn(("grandchild", SubTaskStatus.SKIPPED), updates)
+
+    def test_cancel_skips_steps_that_have_not_started(self):
+        cancel = threading.Event()
+
+        def execute(subtask: SubTask) -> str:
+            cancel.set()
+            return "done"
+
+        graph = TaskGraph([SubTask("one", "a", files=["a.py"]), SubTask("two", "b", files=["b.py"], depends_on=["one"])])
+        result = graph.run(execute, max_parallel=1, cancel_event=cancel)
+        self.assertEqual(statuses(result), {"one": SubTaskStatus.COMPLETED, "two": SubTaskStatus.SKIPPED})
+
+    def test_cycles_and_duplicate_ids_are_rejected(self):
+        with self.assertRaises(ValueError):
+            TaskGraph([SubTask("a", "x", files=["a"], depends_on=["b"]), SubTask("b", "y", files=["b"], depends_on=["a"])])
+        with self.assertRaises(ValueError):
+            TaskGraph([SubTask("a", "x"), SubTask("a", "y")])
+
+
+class ParsePlanTest(unittest.TestCase):
+    def test_json_plan(self):
+        plan = 'Plan:\n```json\n[{"id": "a", "description": "Do A", "files": ["a.py"]}, {"id": "b", "description": "Do B", "depends_on": ["a"]}]\n```'
+        steps = parse_plan(plan)
+        self.assertEqual([(s.task_id, s.files, s.depends_on) for s in steps], [("a", ["a.py"], []), ("b", [], ["a"])])
+
+    def test_numbered_list_becomes_a_chain(self):
+        steps = parse_plan("1. Add model\n2. Add view\n3. Add tests")
+        self.assertEqual([s.depends_on for s in steps], [[], ["step1"], ["step2"]])
+
+    def test_free_text_is_a_single_step(self):
+        self.assertEqual([s.description for s in parse_plan("  Just fix it  ")], ["Just fix it"])
+
+
+if __name__ == "__main__":
+    unittest.main()
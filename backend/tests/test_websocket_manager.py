@@ -0,0 +1,206 @@
+# backend/tests/test_websocket_manager.py
+import asyncio
+import json
+import unittest
+
+from backend.utils.event_bus import InProcessEventBus
+from backend.utils.event_log import EventLog
+from backend.utils.websocket_manager import OverflowPolicy, WebSocketManager
+
+
+class FakeWebSocket:
+    """Records sent frames; sends block while `stalled` to mimic a slow client."""
+
+    def __init__(self, name: str = "client", stalled: bool = False):
+        self.client = (name, 0)
+        self.sent = []
+        self.close_code = None
+        self.released = asyncio.Event()
+        if not stalled:
+            self.released.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, frame: str):
+        await self.released.wait()
+        self.sent.append(json.loads(frame))
+
+    async def send_bytes(self, frame: bytes):
+        raise AssertionError("binary frame sent to a JSON client")
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+async def received(websocket: FakeWebSocket, count: int, timeout: float = 2):
+    """Waits until `count` frames were sent to `websocket` and returns them."""
+    async def poll():
+        while len(websocket.sent) < count:
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+    return websocket.sent
+
+
+def make_manager(**kwargs) -> WebSocketManager:
+    kwargs.setdefault("batch_window", 0)
+    return WebSocketManager(event_log=EventLog(capacity=100), event_bus=InProcessEventBus(), **kwargs)
+
+
+class OverflowTest(unittest.IsolatedAsyncioTestCase):
+    async def connect_stalled(self, manager: WebSocketManager) -> FakeWebSocket:
+        """Connects a stalled client whose writer is already blocked sending a first `hold` frame."""
+        websocket = FakeWebSocket(stalled=True)
+        await manager.connect(websocket)
+        manager.subscribe(websocket, "t")
+        await manager.broadcast_message({"type": "hold"})
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(manager.active_connections[websocket].queue), 0)
+        return websocket
+
+    async def test_drop_oldest_keeps_newest_frames_and_reports_the_count(self):
+        manager = make_manager(max_queue_size=3, overflow_policy=OverflowPolicy.DROP_OLDEST)
+        websocket = await self.connect_stalled(manager)
+        for index in range(5):
+            await manager.broadcast_message({"type": "aider_log", "task_id": "t", "line": index})
+        self.assertEqual(manager.active_connections[websocket].dropped, 2)
+        websocket.released.set()
+        sent = await received(websocket, 5)
+        self.assertEqual(sent[0]["type"], "hold")
+        self.assertEqual(sent[1], {"type": "dropped", "count": 2})
+        self.assertEqual([frame["line"] for frame in sent[2:]], [2, 3, 4])
+
+    async def test_coalesce_replaces_the_queued_event_of_the_same_type(self):
+        manager = make_manager(max_queue_size=2, overflow_policy=OverflowPolicy.COALESCE)
+        websocket = await self.connect_stalled(manager)
+        await manager.broadcast_message({"type": "task_status", "task_id": "t", "status": "queued"})
+        await manager.broadcast_message({"type": "aider_log", "task_id": "t", "line": 0})
+        await manager.broadcast_message({"type": "task_status", "task_id": "t", "status": "running"})
+        websocket.released.set()
+        sent = await received(websocket, 4)
+        self.assertEqual(sent[1], {"type": "dropped", "count": 1})
+        self.assertEqual(sent[2]["type"], "aider_log")
+        self.assertEqual(sent[3]["status"], "running")
+
+    async def test_coalesce_replaces_a_batch_with_the_same_event_types(self):
+        manager = make_manager(max_queue_size=2, overflow_policy=OverflowPolicy.COALESCE, batch_window=60)
+        websocket = await self.connect_stalled(manager)
+
+        async def batch(*messages):
+            for message in messages:
+                await manager.broadcast_message({**message, "task_id": "t"})
+            manager._flush_batch("t")
+
+        await batch({"type": "aider_log", "line": 0}, {"type": "aider_log", "line": 1})
+        await batch({"type": "task_status", "status": "running"})
+        await batch({"type": "aider_log", "line": 2}, {"type": "aider_log", "line": 3})
+        websocket.released.set()
+        sent = await received(websocket, 4)
+        self.assertEqual(sent[1], {"type": "dropped", "count": 1})
+        self.assertEqual(sent[2]["status"], "running")
+        self.assertEqual(sent[3]["type"], "batch")
+        self.assertEqual([event["seq"] for event in sent[3]["events"]], [4, 5])
+
+    async def test_frames_without_a_key_fall_back_to_dropping_the_oldest(self):
+        manager = make_manager(max_queue_size=2, overflow_policy=OverflowPolicy.COALESCE)
+        websocket = await self.connect_stalled(manager)
+        connection = manager.active_connections[websocket]
+        for index in range(3):
+            connection.enqueue(json.dumps({"type": "raw", "n": index}))
+        websocket.released.set()
+        sent = await received(websocket, 4)
+        self.assertEqual([frame.get("n") for frame in sent[2:]], [1, 2])
+
+    async def test_disconnect_policy_closes_the_slow_client_only(self):
+        manager = make_manager(max_queue_size=1, overflow_policy=OverflowPolicy.DISCONNECT)
+        slow = await self.connect_stalled(manager)
+        slow_connection = manager.active_connections[slow]
+        fast = FakeWebSocket("fast")
+        await manager.connect(fast)
+        manager.subscribe(fast, "t")
+        for index in range(2):
+            await manager.broadcast_message({"type": "aider_log", "task_id": "t", "line": index})
+            await asyncio.sleep(0.01)  # The fast client keeps up
+        self.assertEqual(slow.close_code, 1013)
+        self.assertNotIn(slow, manager.active_connections)
+        self.assertNotIn(slow_connection, manager.subscribers["t"])
+        sent = await received(fast, 2)
+        self.assertEqual([frame["line"] for frame in sent], [0, 1])
+
+
+class SubscriptionTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = make_manager(max_queue_size=100)
+
+    async def connect(self, name: str) -> FakeWebSocket:
+        websocket = FakeWebSocket(name)
+        await self.manager.connect(websocket)
+        return websocket
+
+    async def publish(self, *messages):
+        for message in messages:
+            await self.manager.broadcast_message(message)
+        await asyncio.sleep(0.01)
+
+    async def test_task_events_reach_only_matching_subscribers(self):
+        task, everything, statuses, idle = [await self.connect(name) for name in ("task", "all", "statuses", "idle")]
+        self.manager.subscribe(task, "t1")
+        self.manager.subscribe(everything, "*")
+        self.manager.subscribe(statuses, "*", ["task_status"])
+        await self.publish(
+            {"type": "aider_log", "task_id": "t1"},
+            {"type": "task_status", "task_id": "t2"},
+            {"type": "notice"},
+        )
+
+        def types(websocket):
+            return [(frame["type"], frame.get("task_id")) for frame in websocket.sent]
+
+        self.assertEqual(types(task), [("aider_log", "t1"), ("notice", None)])
+        self.assertEqual(types(everything), [("aider_log", "t1"), ("task_status", "t2"), ("notice", None)])
+        self.assertEqual(types(statuses), [("task_status", "t2"), ("notice", None)])
+        self.assertEqual(types(idle), [("notice", None)])
+
+    async def test_unsubscribe_stops_delivery(self):
+        websocket = await self.connect("client")
+        self.manager.subscribe(websocket, "t1")
+        await self.publish({"type": "aider_log", "task_id": "t1", "line": 0})
+        self.manager.unsubscribe(websocket, "t1")
+        await self.publish({"type": "aider_log", "task_id": "t1", "line": 1})
+        self.assertEqual([frame["line"] for frame in websocket.sent], [0])
+        self.assertNotIn("t1", self.manager.subscribers)
+
+    async def test_task_and_wildcard_filters_combine(self):
+        websocket = await self.connect("client")
+        connection = self.manager.active_connections[websocket]
+        self.manager.subscribe(websocket, "t1", ["aider_log"])
+        self.manager.subscribe(websocket, "*", ["task_status"])
+        self.assertEqual(self.manager._task_recipients("t1"), {connection: frozenset({"aider_log", "task_status"})})
+        self.assertEqual(self.manager._task_recipients("t2"), {connection: frozenset({"task_status"})})
+        self.manager.subscribe(websocket, "*")
+        self.assertEqual(self.manager._task_recipients("t1"), {connection: None})
+        await self.publish({"type": "agent_thought", "task_id": "t1"})
+        self.assertEqual([frame["type"] for frame in websocket.sent], ["agent_thought"])
+
+    async def test_control_messages_subscribe_with_filter_and_replay(self):
+        await self.publish(
+            {"type": "aider_log", "task_id": "t1", "line": 0},
+            {"type": "task_status", "task_id": "t1", "status": "running"},
+            {"type": "aider_log", "task_id": "t1", "line": 1},
+        )
+        websocket = await self.connect("client")
+        request = {"action": "subscribe", "task_id": "t1", "events": ["aider_log"], "since": 0}
+        self.assertTrue(await self.manager.handle_client_message(websocket, json.dumps(request)))
+        await self.publish({"type": "task_status", "task_id": "t1", "status": "completed"})
+        await self.publish({"type": "aider_log", "task_id": "t1", "line": 2})
+        sent = await received(websocket, 3)
+        self.assertEqual(sent[0], {"type": "subscribed", "task_id": "t1", "events": ["aider_log"]})
+        self.assertEqual(sent[1]["type"], "replay")
+        self.assertEqual([event["line"] for event in sent[1]["events"]], [0, 1])
+        self.assertEqual(sent[2]["line"], 2)
+        self.assertEqual(len(sent), 3)
+        self.assertFalse(await self.manager.handle_client_message(websocket, "hello"))
+
+
+if __name__ == "__main__":
+    unittest.main()
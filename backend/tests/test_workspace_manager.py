@@ -0,0 +1,75 @@
+# backend/tests/test_workspace_manager.py
+import os
+import subprocess
+import tempfile
+import unittest
+
+from backend.utils.workspace_manager import MergeConflictError, TargetCheckoutError, WorkspaceManager, run_git
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "test", "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "test", "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def write(path: str, text: str):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class WorkspaceManagerTest(unittest.TestCase):
+    def setUp(self):
+        self._env = {key: os.environ.get(key) for key in GIT_ENV}
+        os.environ.update(GIT_ENV)
+        self._tmp = tempfile.TemporaryDirectory()
+        self.repo = self._tmp.name
+        subprocess.run(["git", "init", "-q", "-b", "main", self.repo], check=True)
+        write(os.path.join(self.repo, "app.py"), "a = 1\n")
+        run_git(self.repo, "add", "app.py")
+        run_git(self.repo, "commit", "-q", "-m", "initial")
+        self.manager = WorkspaceManager(self.repo, max_slots=2)
+
+    def tearDown(self):
+        self.manager.remove_all()
+        self._tmp.cleanup()
+        for key, value in self._env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    def head(self) -> str:
+        return run_git(self.repo, "rev-parse", "main").stdout.strip()
+
+    def test_merge_back_fast_forwards_the_checked_out_branch(self):
+        with self.manager.workspace("job1") as workspace:
+            write(os.path.join(workspace.path, "new.py"), "b = 2\n")
+            commit = self.manager.merge_back(workspace)
+        self.assertEqual(self.head(), commit)
+        self.assertTrue(os.path.exists(os.path.join(self.repo, "new.py")))
+
+    def test_dirty_main_checkout_is_reported_separately(self):
+        before = self.head()
+        with self.manager.workspace("job1") as workspace:
+            write(os.path.join(workspace.path, "new.py"), "b = 2\n")
+            write(os.path.join(self.repo, "app.py"), "a = 'edited by hand'\n")
+            with self.assertRaises(TargetCheckoutError) as raised:
+                self.manager.merge_back(workspace)
+        self.assertNotIsInstance(raised.exception, MergeConflictError)
+        self.assertIn("app.py", str(raised.exception))
+        self.assertEqual(self.head(), before)
+
+    def test_conflicting_changes_raise_merge_conflict(self):
+        with self.manager.workspace("job1") as first, self.manager.workspace("job2") as second:
+            write(os.path.join(first.path, "app.py"), "a = 'first'\n")
+            write(os.path.join(second.path, "app.py"), "a = 'second'\n")
+            self.manager.merge_back(first)
+            with self.assertRaises(MergeConflictError) as raised:
+                self.manager.merge_back(second)
+        self.assertEqual(raised.exception.files, ["app.py"])
+        with open(os.path.join(self.repo, "app.py")) as f:
+            self.assertEqual(f.read(), "a = 'first'\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,238 @@
+# backend/tools/aider_output.py
+import difflib
+import re
+from typing import Dict, List, Optional, Sequence
+
+# Lines of unchanged context kept around each change in a hunk
+HUNK_CONTEXT_LINES = 1
+# Longest diff kept per hunk; the rest is summarized as a line count
+HUNK_MAX_LINES = 80
+
+ADDED_RE = re.compile(r"^Added (\S+) to the chat\.?$")
+APPLIED_RE = re.compile(r"^Applied edit to (\S+)$")
+COMMIT_RE = re.compile(r"^Commit ([0-9a-f]{7,40}) (.*)$")
+# pytest's final line: "==== 3 failed, 12 passed, 1 skipped in 0.42s ===="
+PYTEST_SUMMARY_RE = re.compile(r"^=+ (.*\b(?:passed|failed|errors?|skipped|no tests ran)\b.*?) =+$")
+PYTEST_FAILED_RE = re.compile(r"^(?:FAILED|ERROR) (\S+)")
+# unittest: "Ran 12 tests in 0.042s" followed by "OK" or "FAILED (failures=1, errors=2)"
+UNITTEST_RAN_RE = re.compile(r"^Ran (\d+) tests? in ([\d.]+)s$")
+UNITTEST_RESULT_RE = re.compile(r"^(OK|FAILED)\b(?: \((.*)\))?")
+COUNT_RE = re.compile(r"(\d+) (passed|failed|errors?|skipped|xfailed|xpassed)")
+ERROR_RE = re.compile(
+    r"^(?:[\w.]*(?:Error|Exception): .*"
+    r"|Failed to apply edit.*|The LLM did not conform to the edit format.*"
+    r"|Unable to .*|Can't .*|fatal: .*|error: .*)$"
+)
+UDIFF_FROM_RE = re.compile(r"^--- (?:a/)?(\S+)")
+UDIFF_TO_RE = re.compile(r"^\+\+\+ (?:b/)?(\S+)")
+HUNK_HEADER_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+# Aider's own status lines, which never appear inside an edit block
+STATUS_RE = re.compile(f"{APPLIED_RE.pattern}|{COMMIT_RE.pattern}|{ADDED_RE.pattern}")
+# A bare path on its own line, as Aider prints before each SEARCH/REPLACE block
+PATH_RE = re.compile(r"^[\w./\\-]+\.\w+$|^[\w.-]*/[\w./\\-]+$")
+
+
+def _counts(text: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for number, kind in COUNT_RE.findall(text):
+        kind = "errors" if kind.startswith("error") else kind
+        counts[kind] = counts.get(kind, 0) + int(number)
+    return counts
+
+
+def _hunk(file: str, lines: List[str]) -> dict:
+    """Hunk event for diff lines (header first), trimmed to HUNK_MAX_LINES."""
+    body = lines[1:]
+    added = sum(1 for line in body if line.startswith("+"))
+    removed = sum(1 for line in body if line.startswith("-"))
+    if len(lines) > HUNK_MAX_LINES:
+        lines = lines[:HUNK_MAX_LINES] + [f"... {len(lines) - HUNK_MAX_LINES} more lines"]
+    return {"type": "aider_hunk", "file": file, "added": added, "removed": removed, "diff": "\n".join(lines)}
+
+
+class AiderOutputParser:
+    """
+    Incremental parser turning Aider's plain-text output (`--no-pretty`) into
+    typed events, each returned by `feed` as soon as the line completing it
+    arrives:
+
+    - `aider_file`: a file added to the chat (`action: added`) or edited (`edited`).
+    - `aider_hunk`: one unified-diff hunk of an edit, from SEARCH/REPLACE blocks
+      (line numbers relative to the block) or from udiff-format edits.
+    - `aider_commit`: a commit Aider made, with hash and message.
+    - `aider_test`: a pytest or unittest summary with counts and failed tests.
+    - `aider_error`: an error line (exceptions, edits that failed to apply).
+
+    `report` then renders everything parsed as a compact text for the agent,
+    in place of Aider's raw transcript.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, str] = {}  # Path -> last action, in order of appearance
+        self.hunks: List[dict] = []
+        self.commits: List[dict] = []
+        self.tests: List[dict] = []
+        self.errors: List[str] = []
+        self._failed_tests: List[str] = []
+        self._last_path: Optional[str] = None
+        self._block: Optional[dict] = None  # SEARCH/REPLACE block being read
+        self._udiff_file: Optional[str] = None
+        self._udiff_hunk: Optional[List[str]] = None
+        self._unittest_ran: Optional[int] = None
+
+    def feed(self, text: str) -> List[dict]:
+        """Parses one line of output (trailing newline optional) and returns the events it completed."""
+        line = text.rstrip("\r\n")
+        if self._block is not None:
+            if not STATUS_RE.match(line):
+                return self._feed_block(line)
+            self._block = None  # Aider moved on without closing the block (cut-off reply): drop it
+        events = []
+        if self._udiff_hunk is not None:
+            if line[:1] in (" ", "-", "+") and not UDIFF_FROM_RE.match(line):
+                self._udiff_hunk.append(line)
+                return events
+            events.extend(self._end_udiff_hunk())
+        stripped = line.strip()
+        if stripped == "<<<<<<< SEARCH":
+            self._block = {"file": self._last_path or "unknown", "search": [], "replace": None}
+            return events
+        match = UDIFF_TO_RE.match(line)
+        if match and self._udiff_file is not None:
+            self._udiff_file = match.group(1)
+            return events
+        match = UDIFF_FROM_RE.match(line)
+        if match:
+            self._udiff_file = match.group(1)
+            return events
+        if HUNK_HEADER_RE.match(line) and self._udiff_file is not None:
+            self._udiff_hunk = [line]
+            return events
+        events.extend(self._feed_line(stripped))
+        return events
+
+    def _feed_block(self, line: str) -> List[dict]:
+        block = self._block
+        if line.strip() == "=======" and block["replace"] is None:
+            block["replace"] = []
+        elif line.strip().startswith(">>>>>>> REPLACE"):
+            self._block = None
+            diff = difflib.unified_diff(block["search"], block["replace"] or [], lineterm="", n=HUNK_CONTEXT_LINES)
+            return self._split_hunks(block["file"], list(diff)[2:])  # Skip the ---/+++ headers
+        elif block["replace"] is None:
+            block["search"].append(line)
+        else:
+            block["replace"].append(line)
+        return []
+
+    def _split_hunks(self, file: str, diff: List[str]) -> List[dict]:
+        events, current = [], None
+        for line in diff:
+            if line.startswith("@@"):
+                if current:
+                    events.append(_hunk(file, current))
+                current = [line]
+            elif current is not None:
+                current.append(line)
+        if current:
+            events.append(_hunk(file, current))
+        self.hunks.extend(events)
+        return events
+
+    def _end_udiff_hunk(self) -> List[dict]:
+        lines, self._udiff_hunk = self._udiff_hunk, None
+        event = _hunk(self._udiff_file, lines)
+        self.hunks.append(event)
+        return [event]
+
+    def _feed_line(self, line: str) -> List[dict]:
+        match = ADDED_RE.match(line) or APPLIED_RE.match(line)
+        if match:
+            action = "added" if line.startswith("Added") else "edited"
+            if self.files.get(match.group(1)) == "edited":
+                return []  # Already reported as edited; adding it back to the chat changes nothing
+            self.files[match.group(1)] = action
+            return [{"type": "aider_file", "file": match.group(1), "action": action}]
+        match = COMMIT_RE.match(line)
+        if match:
+            commit = {"type": "aider_commit", "hash": match.group(1), "message": match.group(2)}
+            self.commits.append(commit)
+            return [commit]
+        match = PYTEST_FAILED_RE.match(line)
+        if match:
+            self._failed_tests.append(match.group(1))
+            return []
+        match = PYTEST_SUMMARY_RE.match(line)
+        if match:
+            return [self._test_result("pytest", match.group(1), _counts(match.group(1)))]
+        match = UNITTEST_RAN_RE.match(line)
+        if match:
+            self._unittest_ran = int(match.group(1))
+            return []
+        match = UNITTEST_RESULT_RE.match(line)
+        if match and self._unittest_ran is not None:
+            ran, self._unittest_ran = self._unittest_ran, None
+            details = dict(re.findall(r"(\w+)=(\d+)", match.group(2) or ""))
+            failed, errors = int(details.get("failures", 0)), int(details.get("errors", 0))
+            counts = {"passed": ran - failed - errors, "failed": failed, "errors": errors}
+            return [self._test_result("unittest", line, {kind: count for kind, count in counts.items() if count})]
+        if ERROR_RE.match(line):
+            self.errors.append(line)
+            return [{"type": "aider_error", "message": line}]
+        if PATH_RE.match(line):
+            self._last_path = line
+        return []
+
+    def _test_result(self, runner: str, summary: str, counts: Dict[str, int]) -> dict:
+        failed, self._failed_tests = self._failed_tests, []
+        result = {"type": "aider_test", "runner": runner, "summary": summary, **counts, "failed_tests": failed}
+        self.tests.append(result)
+        return result
+
+    def close(self) -> List[dict]:
+        """Ends the output, returning events for a hunk still open at its end."""
+        return self._end_udiff_hunk() if self._udiff_hunk is not None else []
+
+    @property
+    def found(self) -> bool:
+        return bool(self.files or self.hunks or self.commits or self.tests or self.errors)
+
+    def report(self, header: str, fallback: str = "", others: Sequence["AiderOutputParser"] = ()) -> str:
+        """
+        `header` followed by the edited files, commits, test results, errors and
+        diffs parsed so far, identical hunks listed once. Without anything parsed
+        (e.g. Aider only answered a question), `fallback` follows the header instead.
+        `others` are parsers of the same run's other streams (one parser per
+        stream, so stderr lines never land inside a stdout edit block), whose
+        results are merged in.
+        """
+        parsers = (self, *others)
+        if not any(parser.found for parser in parsers):
+            return f"{header}\n{fallback}" if fallback else header
+        files: Dict[str, str] = {}
+        for parser in parsers:
+            for path, action in parser.files.items():
+                if files.get(path) != "edited":
+                    files[path] = action
+        parts = [header]
+        edited = [path for path, action in files.items() if action == "edited"]
+        if edited:
+            parts.append("Edited files: " + ", ".join(edited))
+        for commit in (commit for parser in parsers for commit in parser.commits):
+            parts.append(f"Commit {commit['hash']}: {commit['message']}")
+        for test in (test for parser in parsers for test in parser.tests):
+            parts.append(f"Tests ({test['runner']}): {test['summary']}")
+            if test["failed_tests"]:
+                parts.append("Failed tests: " + ", ".join(test["failed_tests"]))
+        errors = [error for parser in parsers for error in parser.errors]
+        if errors:
+            parts.append("Errors:\n" + "\n".join(f"- {error}" for error in dict.fromkeys(errors)))
+        seen, diffs = set(), []
+        for hunk in (hunk for parser in parsers for hunk in parser.hunks):
+            if (hunk["file"], hunk["diff"]) in seen:
+                continue
+            seen.add((hunk["file"], hunk["diff"]))
+            diffs.append(f"--- {hunk['file']}\n{hunk['diff']}")
+        if diffs:
+            parts.append("Diffs:\n" + "\n".join(diffs))
+        return "\n".join(parts)
@@ -0,0 +1,313 @@
+# backend/tools/aider_pool.py
+import json
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "aider_worker.py")
+
+
+class AiderPoolError(Exception):
+    """Raised when a warm Aider worker cannot be started or used."""
+
+
+class AiderWorker:
+    """
+    One long-lived `aider_worker.py` process bound to a project root.
+
+    A reader thread moves protocol lines from the process stdout into a bounded
+    queue; when the consumer falls behind the queue fills, the reader blocks and
+    the pipe applies backpressure to Aider itself.
+    """
+
+    def __init__(self, root: str, command: List[str], startup_timeout: float):
+        self.root = root
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.healthy = True
+        self._lines: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=1000)
+        self.process = subprocess.Popen(
+            command + ["--root", root],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+            cwd=root,
+        )
+        threading.Thread(target=self._read_stdout, name=f"aider-worker-{self.process.pid}", daemon=True).start()
+        ready = self._next_message(startup_timeout)
+        if ready is None or ready.get("type") != "ready":
+            self.close()
+            error = ready.get("error") if ready else "no response"
+            raise AiderPoolError(f"Aider worker for {root} failed to start: {error}")
+
+    @property
+    def alive(self) -> bool:
+        return self.healthy and self.process.poll() is None
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            try:
+                self._lines.put(json.loads(line))
+            except ValueError:
+                continue  # Stray non-protocol output
+        self._lines.put(None)  # EOF: the process exited
+
+    def _next_message(self, timeout: Optional[float]) -> Optional[dict]:
+        try:
+            return self._lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _send(self, request: dict):
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.healthy = False
+            raise AiderPoolError(f"Aider worker for {self.root} is gone: {e}")
+
+    def ping(self, timeout: float) -> bool:
+        """Health check: the worker must answer a ping within `timeout` seconds."""
+        if not self.alive:
+            return False
+        request_id = uuid.uuid4().hex
+        try:
+            self._send({"op": "ping", "id": request_id})
+        except AiderPoolError:
+            return False
+        message = self._next_message(timeout)
+        self.healthy = message is not None and message.get("type") == "pong" and message.get("id") == request_id
+        return self.healthy
+
+    def run(self, instructions: str, on_log: Callable[[str, str], None], files: Optional[List[str]] = None) -> Optional[str]:
+        """
+        Sends one instruction and blocks until Aider finishes it.
+        Args:
+            instructions: The coding instructions for Aider.
+            on_log: Called with (stream_name, text) for every output line, in order.
+            files: Optional paths (relative to the root) to add to the Aider chat.
+        Returns:
+            None on success, otherwise the error reported by the worker.
+        """
+        request_id = uuid.uuid4().hex
+        self._send({"op": "run", "id": request_id, "instructions": instructions, "files": files or []})
+        try:
+            while True:
+                message = self._next_message(None)
+                if message is None:
+                    self.healthy = False
+                    raise AiderPoolError(f"Aider worker for {self.root} exited mid-request (code {self.process.poll()})")
+                if message.get("id") != request_id:
+                    continue  # Late reply to an earlier ping
+                if message["type"] == "log":
+                    on_log(message.get("stream", "stdout"), message.get("content", ""))
+                elif message["type"] == "done":
+                    return None if message.get("ok") else (message.get("error") or "unknown error")
+        except BaseException:
+            if self.healthy and self.process.poll() is None:
+                # Interrupted by the caller: the worker's output stream is now
+                # out of sync with our reader, so it can't be reused.
+                self.healthy = False
+            raise
+        finally:
+            self.last_used = time.time()
+
+    def close(self):
+        self.healthy = False
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+
+class AiderWorkerPool:
+    """
+    Pool of warm Aider workers keyed by project root.
+
+    Callers check a worker out with `acquire(root)` and get it back exclusively
+    until the context exits. Idle workers are reused for the same root, evicted
+    after `idle_timeout` seconds, and health-checked before reuse when they have
+    been idle longer than `health_check_interval`. The total number of worker
+    processes never exceeds `max_size`; when the pool is full, an idle worker of
+    another root is evicted, otherwise the caller waits.
+    """
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        health_check_interval: Optional[float] = None,
+        worker_command: Optional[List[str]] = None,
+    ):
+        """
+        Args:
+            max_size: Maximum number of worker processes (env AIDER_POOL_SIZE).
+            idle_timeout: Seconds an idle worker is kept alive (env AIDER_POOL_IDLE_TIMEOUT).
+            health_check_interval: Idle seconds after which a worker is pinged before reuse.
+            worker_command: Command that starts a worker (env AIDER_WORKER_CMD); `--root` is appended.
+        """
+        self.max_size = max_size or int(os.getenv("AIDER_POOL_SIZE", 4))
+        self.idle_timeout = idle_timeout or float(os.getenv("AIDER_POOL_IDLE_TIMEOUT", 300))
+        self.health_check_interval = health_check_interval or float(os.getenv("AIDER_POOL_HEALTH_INTERVAL", 30))
+        self.startup_timeout = float(os.getenv("AIDER_POOL_STARTUP_TIMEOUT", 120))
+        env_command = os.getenv("AIDER_WORKER_CMD")
+        self.worker_command = worker_command or (shlex.split(env_command) if env_command else [sys.executable, WORKER_SCRIPT])
+        self._idle: Dict[str, List[AiderWorker]] = {}
+        # Roots whose worker failed to start, with the time of failure; new
+        # starts are refused for `start_retry_after` seconds to avoid paying a
+        # failing startup on every tool call.
+        self._start_failures: Dict[str, float] = {}
+        self.start_retry_after = float(os.getenv("AIDER_POOL_RETRY_AFTER", 60))
+        self._size = 0  # Live workers, idle or checked out (including ones starting up)
+        self._cond = threading.Condition()
+        self._closed = False
+        threading.Thread(target=self._reap_idle, name="aider-pool-reaper", daemon=True).start()
+
+    @contextmanager
+    def acquire(self, root: str, timeout: Optional[float] = None):
+        """Checks out a warm worker for `root`, starting one if needed."""
+        root = os.path.abspath(root)
+        worker = self._checkout(root, timeout)
+        try:
+            yield worker
+        finally:
+            self._checkin(worker)
+
+    def _checkout(self, root: str, timeout: Optional[float]) -> AiderWorker:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            worker = self._reserve(root, deadline, timeout)
+            if worker is None:
+                break  # A slot is reserved: start a new worker
+            if self._is_healthy(worker):
+                return worker
+            with self._cond:
+                self._discard(worker)
+                self._cond.notify()
+        # Start outside the lock: startup takes seconds and must not block other roots
+        try:
+            worker = AiderWorker(root, self.worker_command, self.startup_timeout)
+        except Exception as e:
+            with self._cond:
+                self._size -= 1
+                self._start_failures[root] = time.time()
+                self._cond.notify()
+            if isinstance(e, AiderPoolError):
+                raise
+            raise AiderPoolError(f"Could not start Aider worker for {root}: {e}") from e
+        with self._cond:
+            self._start_failures.pop(root, None)
+        return worker
+
+    def _reserve(self, root: str, deadline: Optional[float], timeout: Optional[float]) -> Optional[AiderWorker]:
+        """
+        Takes a live idle worker for `root`, or reserves a slot for a new one and
+        returns None, waiting for a free slot if the pool is full. Caller must not
+        hold the lock.
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise AiderPoolError("Aider worker pool is closed")
+                failed_at = self._start_failures.get(root)
+                if failed_at is not None and time.time() - failed_at < self.start_retry_after:
+                    raise AiderPoolError(f"Aider worker for {root} failed to start recently")
+                idle = self._idle.get(root)
+                while idle:
+                    worker = idle.pop()  # Most recently used first: warmest caches
+                    if worker.alive:
+                        return worker
+                    self._discard(worker)
+                if self._size < self.max_size or self._evict_one_idle():
+                    self._size += 1
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise AiderPoolError(f"No Aider worker available within {timeout}s")
+                self._cond.wait(remaining)
+
+    def _checkin(self, worker: AiderWorker):
+        with self._cond:
+            if worker.alive and not self._closed:
+                self._idle.setdefault(worker.root, []).append(worker)
+            else:
+                self._discard(worker)
+            self._cond.notify()
+
+    def _is_healthy(self, worker: AiderWorker) -> bool:
+        """
+        Pings a worker idle for longer than the health check interval. Called
+        without the lock: a stale worker may take seconds to answer and must not
+        block checkouts and checkins for other roots.
+        """
+        if time.time() - worker.last_used > self.health_check_interval:
+            return worker.ping(timeout=5)
+        return True
+
+    def _discard(self, worker: AiderWorker):
+        """Closes a worker that is no longer tracked as idle. Caller holds the lock."""
+        self._size -= 1
+        threading.Thread(target=worker.close, daemon=True).start()
+
+    def _evict_one_idle(self) -> bool:
+        """Closes the least recently used idle worker of any root. Caller holds the lock."""
+        candidates = [w for workers in self._idle.values() for w in workers]
+        if not candidates:
+            return False
+        oldest = min(candidates, key=lambda w: w.last_used)
+        self._idle[oldest.root].remove(oldest)
+        self._discard(oldest)
+        return True
+
+    def _reap_idle(self):
+        while not self._closed:
+            time.sleep(min(self.idle_timeout, 30))
+            now = time.time()
+            with self._cond:
+                for root, workers in list(self._idle.items()):
+                    for worker in [w for w in workers if now - w.last_used > self.idle_timeout or not w.alive]:
+                        workers.remove(worker)
+                        self._discard(worker)
+                    if not workers:
+                        del self._idle[root]
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            idle = sum(len(workers) for workers in self._idle.values())
+            return {"size": self._size, "idle": idle, "busy": self._size - idle, "max_size": self.max_size}
+
+    def close(self):
+        """Stops all idle workers; checked-out workers are closed when returned."""
+        with self._cond:
+            self._closed = True
+            for workers in self._idle.values():
+                for worker in workers:
+                    self._discard(worker)
+            self._idle.clear()
+            self._cond.notify_all()
+
+
+# Shared pool so workers stay warm across tool calls and crews
+aider_worker_pool = None
+_pool_lock = threading.Lock()
+
+def get_aider_worker_pool() -> AiderWorkerPool:
+    """Returns the process-wide AiderWorkerPool, creating it on first use."""
+    global aider_worker_pool
+    with _pool_lock:
+        if aider_worker_pool is None:
+            aider_worker_pool = AiderWorkerPool()
+    return aider_worker_pool
@@ -1,13 +1,32 @@
 # backend/tools/aider_tool.py
 from crewai.tools import BaseTool
-import subprocess
-import os  # Potentially needed later
-# import asyncio  # Needed for async streaming implementation later
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel, Field # Use Pydantic v2 BaseModel
-from typing import Type, Any
+from typing import Type, Any, List, Optional
+from backend.tools.aider_output import AiderOutputParser
+from backend.tools.aider_pool import AiderPoolError, get_aider_worker_pool
+from backend.utils.result_cache import cache_key, get_result_cache, repo_state_hash
+from backend.utils.metrics import AIDER_DURATION, AIDER_OUTPUT_BYTES, get_task_timings
+from backend.utils.context_compactor import ContextCompactor
+from backend.utils.llm_scheduler import get_llm_scheduler, is_rate_limit_error, retry_after
+from backend.utils.logger import get_logger
 # Remove v1 import: from pydantic.v1 import BaseModel, Field
 
-# TODO: Define the input schema for the Aider tool
+logger = get_logger("aider")
+
+# Default project root Aider operates on (two levels up from backend/tools)
+DEFAULT_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# StreamReader line limit; longer lines are forwarded in chunks of this size
+STREAM_LIMIT = 64 * 1024
+
+# Model Aider uses when AIDER_MODEL is unset (same default as aider_worker.py)
+DEFAULT_AIDER_MODEL = "gemini/gemini-2.5-pro-exp-03-25"
+
 class AiderInputSchema(BaseModel):
     """Input schema for the Aider Tool."""
     instructions: str = Field(description="Detailed instructions for the coding task to be performed by Aider. Should include file paths if specific files need modification.")
@@ -21,96 +40,302 @@ class AiderTool(BaseTool):
         "Provide clear and specific instructions for the task."
     )
     args_schema: Type[BaseModel] = AiderInputSchema
-    # Optional: Add attributes for configuration like Aider path, project path, model, API key if not handled globally
-    # aider_path: str = "aider" # Or full path if needed
-    # project_path: str = os.getcwd() # Default to current, but should be the actual project root
+    aider_path: str = Field(default_factory=lambda: os.getenv("AIDER_PATH", "aider"))
+    project_root: str = DEFAULT_PROJECT_ROOT
+    # WebSocketManager used to stream output lines, and the job they belong to
+    websocket_manager: Optional[Any] = None
+    task_id: Optional[str] = None
+    # Only the last N lines are kept for the value returned to the agent;
+    # the full transcript is streamed and never held in memory.
+    output_tail_lines: int = Field(default_factory=lambda: int(os.getenv("AIDER_OUTPUT_TAIL_LINES", 200)))
+    # Route instructions to a warm, long-lived Aider session from the shared
+    # pool; falls back to a one-off `aider --message` process if unavailable.
+    use_pool: bool = Field(default_factory=lambda: os.getenv("AIDER_POOL_ENABLED", "1") == "1")
+    # Serve repeated instructions from the result cache when they left the
+    # project unchanged (no-op edits); see `_cache_lookup`.
+    use_cache: bool = True
+    # Paths (relative to project_root) added to Aider's chat up front, usually
+    # picked from the repository index so Aider doesn't have to search for them.
+    files: List[str] = Field(default_factory=list)
+    # Output returned to the agent is deduplicated and trimmed to this many
+    # tokens (0 to disable); the full text stays fetchable by reference.
+    output_token_budget: int = Field(default_factory=lambda: int(os.getenv("AIDER_OUTPUT_TOKEN_BUDGET", 2000)))
+    # Stream every raw output line as `aider_log`; typed events (aider_file,
+    # aider_hunk, aider_commit, aider_test, aider_error) are streamed either way.
+    stream_logs: bool = Field(default_factory=lambda: os.getenv("AIDER_STREAM_LOGS", "1") == "1")
+    # Tokens of the Aider model's quota reserved per run with the LLM scheduler (0 to disable)
+    llm_token_estimate: int = Field(default_factory=lambda: int(os.getenv("AIDER_RUN_TOKEN_ESTIMATE", 20000)))
 
-    # TODO: Implement the _run method to invoke Aider
     def _run(
         self,
         instructions: str,
         # project_path: str = None # Or get from self.project_path
         **kwargs: Any,
     ) -> str:
-        """Synchronous execution method (required by BaseTool). Will delegate to async method."""
-        # CrewAI typically runs tools in separate threads, allowing async operations
-        # within the sync wrapper if needed, but direct async support might vary.
-        # For simplicity, we might run the subprocess synchronously here,
-        # but ideally, we want streaming output.
-        # This synchronous wrapper might just kick off the async process
-        # and potentially return an initial status or task ID.
-        # The actual streaming would happen via the WebSocket manager.
-
-        print(f"Aider Tool received instructions: {instructions}")
-
-        # Determine project root directory (two levels up from backend/tools)
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-        print(f"Project root determined as: {project_root}")
-        # project_dir = project_path or self.project_path # Determine project directory
-
-        # --- Placeholder for synchronous execution (replace with proper async/streaming later) ---
+        """Synchronous execution method (required by BaseTool). Uses a warm pooled worker, else streams a new process."""
+        started = time.perf_counter()
+        stats = {"output_bytes": 0}
+        key, state, cached = self._cache_lookup(instructions)
+        if cached is not None:
+            self._emit_sync({"type": "aider_status", "status": "cached"})
+            self._record_run("cached", started, stats)
+            return cached
+        self._reserve_llm_quota()
+        result = self._run_pooled(instructions, stats) if self.use_pool else None
+        mode = "pool" if result is not None else "process"
+        if result is None:
+            # CrewAI calls tools from its (non-async) worker thread, so we can normally
+            # spin up a private event loop here. If this thread already runs a loop,
+            # hand the coroutine to a helper thread instead of nesting loops.
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                result = asyncio.run(self._run_process(instructions, stats))
+            else:
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(asyncio.run, self._run_process(instructions, stats)).result()
+        self._record_run(mode, started, stats)
+        result = self._compact(result)
+        self._cache_store(key, state, result)
+        return result
+
+    async def _arun(
+        self,
+        instructions: str,
+        # project_path: str = None
+        **kwargs: Any,
+    ) -> str:
+        """Asynchronous execution method with the same cache and pool/process choice as `_run`."""
+        started = time.perf_counter()
+        stats = {"output_bytes": 0}
+        key, state, cached = await asyncio.to_thread(self._cache_lookup, instructions)
+        if cached is not None:
+            await self._emit({"type": "aider_status", "status": "cached"})
+            self._record_run("cached", started, stats)
+            return cached
+        await asyncio.to_thread(self._reserve_llm_quota)
+        result = await asyncio.to_thread(self._run_pooled, instructions, stats) if self.use_pool else None
+        mode = "pool" if result is not None else "process"
+        if result is None:
+            result = await self._run_process(instructions, stats)
+        self._record_run(mode, started, stats)
+        result = await asyncio.to_thread(self._compact, result)
+        await asyncio.to_thread(self._cache_store, key, state, result)
+        return result
+
+    def _record_run(self, mode: str, started: float, stats: dict):
+        """Records a run's wall time and output volume in the metrics and the task's timings."""
+        seconds = time.perf_counter() - started
+        AIDER_DURATION.observe(seconds, mode=mode)
+        timings = get_task_timings(self.task_id)
+        if timings is not None:
+            timings.add_aider_run(seconds, stats["output_bytes"])
+
+    def _reserve_llm_quota(self):
+        """
+        Aider makes its LLM calls from its own process, out of reach of the
+        CrewAI hooks, so each run reserves an estimated share of the Aider
+        model's quota up front and waits its turn behind the crews' calls.
+        """
+        if self.llm_token_estimate > 0:
+            get_llm_scheduler().acquire(os.getenv("AIDER_MODEL", DEFAULT_AIDER_MODEL), tokens=self.llm_token_estimate)
+
+    @staticmethod
+    def _check_rate_limited(text: str):
+        """Pauses the Aider model's quota when Aider reports a provider 429 (it retries on its own)."""
+        if is_rate_limit_error(text):
+            get_llm_scheduler().throttle(os.getenv("AIDER_MODEL", DEFAULT_AIDER_MODEL), retry_after(text))
+
+    def _compact(self, result: str) -> str:
+        if self.output_token_budget <= 0:
+            return result
+        return ContextCompactor().compact(result, self.output_token_budget, label="Aider output", stage="aider")
+
+    def _cache_lookup(self, instructions: str):
+        """
+        Returns (key, project state hash, cached result or None). The key covers the
+        instructions, the Aider model and the project state, so a hit means the same
+        instructions were already run against identical files.
+        """
+        cache = get_result_cache() if self.use_cache else None
+        if cache is None:
+            return None, None, None
+        state = repo_state_hash(self.project_root)
+        key = cache_key(
+            "aider", instructions=instructions, files=sorted(self.files), model=os.getenv("AIDER_MODEL"), state=state
+        )
+        return key, state, cache.get(key)
+
+    def _cache_store(self, key: Optional[str], state: Optional[str], result: str):
+        """
+        Caches successful runs that left the project unchanged. Runs that edited files
+        are not cached: replaying their output would not re-apply the edits.
+        """
+        cache = get_result_cache() if self.use_cache else None
+        if cache is None or key is None or not result.startswith("Aider task completed"):
+            return
+        if repo_state_hash(self.project_root) == state:
+            cache.put(key, result)
+
+    def _run_pooled(self, instructions: str, stats: dict) -> Optional[str]:
+        """
+        Runs the instructions on a warm worker from the shared pool, streaming each
+        output line and parsed event as it arrives. Must be called from a thread without a running
+        event loop. Returns None if no worker could be started (e.g. Aider's Python
+        package is unavailable) so the caller can fall back to a fresh process.
+        """
+        logger.info("aider_run", mode="pool", task_id=self.task_id, root=self.project_root, instructions=instructions)
+        stdout_tail = deque(maxlen=self.output_tail_lines)
+        stderr_tail = deque(maxlen=self.output_tail_lines)
+        # One parser per stream: stderr lines must not land inside a stdout edit block
+        parser, stderr_parser = AiderOutputParser(), AiderOutputParser()
+
+        def on_log(stream_name: str, text: str):
+            (stderr_tail if stream_name == "stderr" else stdout_tail).append(text)
+            self._count_output(stats, stream_name, len(text.encode("utf-8")))
+            self._check_rate_limited(text)
+            if self.stream_logs:
+                self._emit_sync({"type": "aider_log", "stream": stream_name, "content": text})
+            for event in (stderr_parser if stream_name == "stderr" else parser).feed(text):
+                self._emit_sync(event)
+
         try:
-            # Construct the Aider command
-            # Ensure AIDER_MODEL and relevant API keys (e.g., GOOGLE_API_KEY) are set as environment variables
-            # Aider typically picks these up automatically.
-            # We might need to explicitly pass the project context if not running from the root.
-            # The command needs to be run within the project's root directory.
-            aider_command = [
-                "aider",  # Assuming aider is in PATH
-                "--message", instructions,
-                # Add other necessary aider flags if needed (e.g., --yes for auto-commit)
-                # "--model", os.getenv("AIDER_MODEL", "gemini/gemini-1.5-pro-latest") # Aider might pick this from env
-            ]
-
-            print(f"Executing Aider command: {' '.join(aider_command)}")
-
-            # Execute Aider - This blocks and captures all output at the end.
-            # We need to replace this with async streaming.
-            # Ensure the command runs in the correct directory (e.g., project root)
-            # For now, assume execution context is correct or manage via `cwd`
-            process = subprocess.run(
-                aider_command,
-                capture_output=True,  # Capture stdout/stderr
-                text=True,  # Decode output as text
-                check=True,  # Raise exception on non-zero exit code
-                cwd=project_root  # <<< Run Aider in the project root directory
-                # cwd=project_dir # Specify the working directory for Aider
-            )
+            with get_aider_worker_pool().acquire(self.project_root) as worker:
+                error = worker.run(instructions, on_log, files=self._existing_files())
+        except AiderPoolError as e:
+            if not stdout_tail and not stderr_tail:
+                logger.warning("aider_pool_unavailable", task_id=self.task_id, error=str(e))
+                return None
+            logger.error("aider_worker_failed", task_id=self.task_id, error=str(e))
+            return parser.report(f"Aider execution failed: {e}. Stderr: {''.join(stderr_tail)}", others=[stderr_parser])
+
+        for event in parser.close() + stderr_parser.close():
+            self._emit_sync(event)
+        output = "".join(stdout_tail)
+        error_output = "".join(stderr_tail)
+        if error:
+            logger.error("aider_failed", task_id=self.task_id, error=error, stderr=error_output)
+            return parser.report(f"Aider execution failed: {error}. Stderr: {error_output}", others=[stderr_parser])
+        self._emit_sync({"type": "aider_status", "status": "completed", "exit_code": 0})
+        return parser.report("Aider task completed.", fallback=f"Output:\n{output}\n{error_output}", others=[stderr_parser])
 
-            output = process.stdout
-            error_output = process.stderr
-            print(f"Aider stdout:\n{output}")
-            if error_output:
-                print(f"Aider stderr:\n{error_output}")
+    async def _run_process(self, instructions: str, stats: dict) -> str:
+        """
+        Runs Aider and streams its stdout/stderr line by line, and the events parsed
+        from them, via the WebSocket manager.
+        Each line is delivered before the next one is read, so a slow consumer
+        applies backpressure to the Aider process instead of growing a buffer.
+        """
 
-            # Return the final output (or a summary)
-            # Streaming will be handled separately.
-            return f"Aider task completed. Output:\n{output}\n{error_output if error_output else ''}"
+        # Ensure AIDER_MODEL and relevant API keys (e.g., GOOGLE_API_KEY) are set as environment variables
+        # Aider typically picks these up automatically.
+        aider_command = [
+            self.aider_path,
+            "--message", instructions,
+            "--no-pretty",  # Plain text output, no ANSI colours, for streaming
+            "--yes-always",  # Non-interactive: auto-confirm prompts
+            # "--model", os.getenv("AIDER_MODEL", "gemini/gemini-1.5-pro-latest") # Aider might pick this from env
+            *self._existing_files(),
+        ]
+        logger.info("aider_run", mode="process", task_id=self.task_id, root=self.project_root, command=aider_command)
 
-        except subprocess.CalledProcessError as e:
-            print(f"Aider execution failed: {e}")
-            print(f"Stderr: {e.stderr}")
-            return f"Aider execution failed: {e}. Stderr: {e.stderr}"
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *aider_command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self.project_root,  # <<< Run Aider in the project root directory
+                limit=STREAM_LIMIT,
+            )
         except FileNotFoundError:
-            print("Error: 'aider' command not found. Make sure Aider is installed and in the system PATH.")
+            logger.error("aider_not_found", path=self.aider_path)
             return "Error: 'aider' command not found."
         except Exception as e:
-            print(f"An unexpected error occurred while running Aider: {e}")
+            logger.exception("aider_start_failed", task_id=self.task_id)
             return f"An unexpected error occurred: {e}"
 
-    # TODO: Implement an async method for streaming output (if CrewAI/FastAPI setup allows)
-    async def _arun(
-        self,
-        instructions: str,
-        # project_path: str = None
-        **kwargs: Any,
-    ) -> str:
-        """Asynchronous execution method for potential streaming."""
-        # This is where the actual streaming logic would go, using asyncio.create_subprocess_exec
-        # and reading stdout/stderr line by line, pushing updates via WebSocket manager.
-        print(f"Aider Tool (async) received instructions: {instructions}")
-        # Placeholder - delegate to sync version for now until streaming is implemented
-        return self._run(instructions=instructions, **kwargs)
+        stdout_tail = deque(maxlen=self.output_tail_lines)
+        stderr_tail = deque(maxlen=self.output_tail_lines)
+        # One parser per stream: the pumps run concurrently, and stderr lines must
+        # not land inside a stdout edit block. Their results are merged in the report.
+        parser, stderr_parser = AiderOutputParser(), AiderOutputParser()
+        try:
+            await asyncio.gather(
+                self._pump(process.stdout, "stdout", stdout_tail, stats, parser),
+                self._pump(process.stderr, "stderr", stderr_tail, stats, stderr_parser),
+            )
+            return_code = await process.wait()
+        except BaseException:
+            # Cancelled or failed while streaming: don't leave Aider running
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+        for event in parser.close() + stderr_parser.close():
+            await self._emit(event)
+        output = "".join(stdout_tail)
+        error_output = "".join(stderr_tail)
+        if return_code != 0:
+            logger.error("aider_failed", task_id=self.task_id, exit_code=return_code, stderr=error_output)
+            return parser.report(f"Aider execution failed: exit code {return_code}. Stderr: {error_output}", others=[stderr_parser])
+
+        await self._emit({"type": "aider_status", "status": "completed", "exit_code": return_code})
+        return parser.report("Aider task completed.", fallback=f"Output:\n{output}\n{error_output}", others=[stderr_parser])
+
+    def _existing_files(self) -> List[str]:
+        """The configured files that exist under project_root (Aider would create missing ones)."""
+        return [path for path in self.files if os.path.isfile(os.path.join(self.project_root, path))]
+
+    @staticmethod
+    def _count_output(stats: dict, stream_name: str, size: int):
+        stats["output_bytes"] += size
+        AIDER_OUTPUT_BYTES.inc(size, stream=stream_name)
+
+    async def _pump(self, stream: asyncio.StreamReader, stream_name: str, tail: deque, stats: dict, parser: AiderOutputParser):
+        """Reads a process stream line by line, forwarding each line and its parsed events and keeping a bounded tail."""
+        while True:
+            try:
+                line = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                line = e.partial  # Final line without a newline (empty at EOF)
+            except asyncio.LimitOverrunError as e:
+                # Line longer than STREAM_LIMIT: forward what is buffered as a chunk
+                line = await stream.read(max(e.consumed, 1))
+            if not line:
+                break
+            self._count_output(stats, stream_name, len(line))
+            text = line.decode("utf-8", errors="replace")
+            tail.append(text)
+            self._check_rate_limited(text)
+            if self.stream_logs:
+                await self._emit({"type": "aider_log", "stream": stream_name, "content": text})
+            for event in parser.feed(text):
+                await self._emit(event)
+
+    async def _emit(self, message: dict):
+        """Delivers a message through the WebSocket manager, waiting until it is sent."""
+        if self.websocket_manager is None:
+            return
+        if self.task_id:
+            message = {"task_id": self.task_id, **message}
+        if asyncio.get_running_loop() is self.websocket_manager.loop:
+            await self.websocket_manager.broadcast_message(message)
+            return
+        future = self.websocket_manager.broadcast_threadsafe(message)
+        if future is not None:
+            await asyncio.wrap_future(future)
+
+    def _emit_sync(self, message: dict):
+        """Blocking variant of `_emit` for worker threads without an event loop."""
+        if self.websocket_manager is None:
+            return
+        if self.task_id:
+            message = {"task_id": self.task_id, **message}
+        future = self.websocket_manager.broadcast_threadsafe(message)
+        if future is not None:
+            future.result()
 
 
 # Example usage (for testing purposes)
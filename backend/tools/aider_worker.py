@@ -0,0 +1,128 @@
+# backend/tools/aider_worker.py
+"""
+Long-lived Aider session used by the AiderWorkerPool.
+
+Run as `python aider_worker.py --root <project_root>`. The script imports Aider
+and builds a Coder once (model metadata, git repo, repo map), then serves
+instructions over a JSON-lines protocol so repeated tool calls skip the cold
+start of a fresh `aider --message` process.
+
+Requests (stdin, one JSON object per line):
+    {"op": "run", "id": "...", "instructions": "...", "files": ["optional/rel/path.py"]}
+    {"op": "ping", "id": "..."}
+Responses (stdout, one JSON object per line):
+    {"type": "ready"}                                          once, after startup
+    {"type": "log", "id": "...", "stream": "stdout", "content": "..."}
+    {"type": "done", "id": "...", "ok": true, "error": null}
+    {"type": "pong", "id": "..."}
+
+The script deliberately imports nothing from `backend` so it can run with any
+project root as its working directory.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import traceback
+
+# Protocol messages go to the real stdout; everything Aider prints is wrapped
+# into "log" messages via LineForwarder so it cannot corrupt the protocol.
+_protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1, encoding="utf-8")
+_protocol_lock = threading.Lock()
+
+
+def send(message: dict):
+    with _protocol_lock:
+        _protocol_out.write(json.dumps(message) + "\n")
+        _protocol_out.flush()
+
+
+class LineForwarder:
+    """File-like object that forwards complete lines as protocol log messages."""
+
+    def __init__(self, stream_name: str):
+        self.stream_name = stream_name
+        self.request_id = None
+        self._buffer = ""
+
+    def write(self, text: str) -> int:
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            send({"type": "log", "id": self.request_id, "stream": self.stream_name, "content": line + "\n"})
+        return len(text)
+
+    def flush(self):
+        if self._buffer:
+            send({"type": "log", "id": self.request_id, "stream": self.stream_name, "content": self._buffer})
+            self._buffer = ""
+
+    def isatty(self) -> bool:
+        return False
+
+
+def build_coder(root: str):
+    """Creates the Aider Coder once; this is the expensive part we keep warm."""
+    from aider.coders import Coder
+    from aider.io import InputOutput
+    from aider.models import Model
+
+    io = InputOutput(pretty=False, yes=True)
+    try:
+        from aider.repo import GitRepo
+        repo = GitRepo(io, [], root)
+    except Exception:
+        repo = None  # Not a git repository: Aider still edits, just without commits
+    model = Model(os.getenv("AIDER_MODEL", "gemini/gemini-2.5-pro-exp-03-25"))
+    return Coder.create(main_model=model, io=io, repo=repo, fnames=[])
+
+
+def handle_run(coder, request: dict):
+    # Every request starts from a clean chat; the warm state we want to keep is
+    # the model, repo and repo map, not the previous conversation.
+    coder.commands.cmd_clear("")
+    coder.commands.cmd_drop("")
+    for rel_fname in request.get("files") or []:
+        coder.add_rel_fname(rel_fname)
+    coder.run(with_message=request["instructions"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent Aider worker")
+    parser.add_argument("--root", required=True, help="Project root Aider operates on")
+    args = parser.parse_args()
+    os.chdir(args.root)
+
+    stdout, stderr = LineForwarder("stdout"), LineForwarder("stderr")
+    sys.stdout, sys.stderr = stdout, stderr
+
+    try:
+        coder = build_coder(args.root)
+    except Exception as e:
+        send({"type": "fatal", "error": f"Failed to start Aider: {e}"})
+        return 1
+    send({"type": "ready"})
+
+    for raw in sys.stdin:
+        if not raw.strip():
+            continue
+        request = json.loads(raw)
+        request_id = request.get("id")
+        if request.get("op") == "ping":
+            send({"type": "pong", "id": request_id})
+            continue
+        stdout.request_id = stderr.request_id = request_id
+        try:
+            handle_run(coder, request)
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+        stdout.flush()
+        stderr.flush()
+        send({"type": "done", "id": request_id, "ok": error is None, "error": error})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
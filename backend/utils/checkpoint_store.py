@@ -0,0 +1,173 @@
+# backend/utils/checkpoint_store.py
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Default database location: <project root>/.codingorg/checkpoints.sqlite3
+DEFAULT_CHECKPOINT_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "..", ".codingorg", "checkpoints.sqlite3")
+)
+
+
+class RunStatus:
+    """Checkpointed run states. `running` after a restart means the run was interrupted."""
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class StepStatus:
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    task_id TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    task_id TEXT NOT NULL REFERENCES runs(task_id) ON DELETE CASCADE,
+    step TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (task_id, step)
+);
+CREATE INDEX IF NOT EXISTS runs_status ON runs(status, updated_at);
+"""
+
+
+class CheckpointStore:
+    """
+    Durable record of crew runs and their completed steps, in SQLite.
+
+    A run is written when it starts and each step (`plan`, `subtask:<id>`,
+    `review`) is written as soon as it completes, so a run that failed, was
+    cancelled or was cut short by a restart can continue from its last
+    completed step instead of from the first LLM call. Failed attempts are
+    recorded too, for the `attempts` count and last error.
+
+    One connection in WAL mode is shared by all threads behind a lock; every
+    write is its own short transaction.
+    """
+
+    def __init__(self, path: Optional[str] = None, history_size: Optional[int] = None):
+        """
+        Args:
+            path: SQLite database file (env CHECKPOINT_DB, default <project root>/.codingorg/checkpoints.sqlite3).
+            history_size: Finished runs kept before the oldest are deleted (env CHECKPOINT_HISTORY_SIZE).
+        """
+        self.path = path or os.getenv("CHECKPOINT_DB") or DEFAULT_CHECKPOINT_PATH
+        self.history_size = history_size or int(os.getenv("CHECKPOINT_HISTORY_SIZE", 1000))
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")  # Durable across process crashes, cheap per write
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def start_run(self, task_id: str, prompt: str, priority: int = 0):
+        """Records a run as running, keeping the steps of an earlier attempt with the same ID."""
+        now = time.time()
+        self._execute(
+            "INSERT INTO runs (task_id, prompt, priority, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(task_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at",
+            (task_id, prompt, priority, RunStatus.RUNNING, now, now),
+        )
+
+    def finish_run(self, task_id: str, status: str, result: Optional[str] = None):
+        self._execute(
+            "UPDATE runs SET status = ?, result = ?, updated_at = ? WHERE task_id = ?",
+            (status, result, time.time(), task_id),
+        )
+        self._prune()
+
+    def mark_interrupted(self, task_id: str):
+        """Puts a run stopped by a shutdown back to running, so the next start resumes it."""
+        self._execute(
+            "UPDATE runs SET status = ?, updated_at = ? WHERE task_id = ?", (RunStatus.RUNNING, time.time(), task_id)
+        )
+
+    def get_run(self, task_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT * FROM runs WHERE task_id = ?", (task_id,))
+        return dict(rows[0]) if rows else None
+
+    def interrupted_runs(self) -> List[Dict[str, Any]]:
+        """Runs still marked running, i.e. cut short by a restart (call before starting new runs)."""
+        return [dict(row) for row in self._execute(
+            "SELECT * FROM runs WHERE status = ? ORDER BY created_at", (RunStatus.RUNNING,)
+        )]
+
+    def save_step(self, task_id: str, step: str, result: Optional[str]):
+        """Checkpoints a completed step with its result."""
+        self._execute(
+            "INSERT INTO steps (task_id, step, status, result, attempts, updated_at) VALUES (?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT(task_id, step) DO UPDATE SET status = excluded.status, result = excluded.result, "
+            "error = NULL, attempts = steps.attempts + 1, updated_at = excluded.updated_at",
+            (task_id, step, StepStatus.COMPLETED, result, time.time()),
+        )
+
+    def record_failure(self, task_id: str, step: str, error: str):
+        """Records a failed attempt at a step; a completed checkpoint for it is never overwritten."""
+        self._execute(
+            "INSERT INTO steps (task_id, step, status, error, attempts, updated_at) VALUES (?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT(task_id, step) DO UPDATE SET error = excluded.error, attempts = steps.attempts + 1, "
+            "updated_at = excluded.updated_at WHERE steps.status != ?",
+            (task_id, step, StepStatus.FAILED, error, time.time(), StepStatus.COMPLETED),
+        )
+
+    def completed_steps(self, task_id: str) -> Dict[str, Dict[str, Any]]:
+        """Step name -> {"result", "attempts"} for every completed step of a run."""
+        rows = self._execute(
+            "SELECT step, result, attempts FROM steps WHERE task_id = ? AND status = ?",
+            (task_id, StepStatus.COMPLETED),
+        )
+        return {row["step"]: {"result": row["result"], "attempts": row["attempts"]} for row in rows}
+
+    def delete_run(self, task_id: str):
+        self._execute("DELETE FROM runs WHERE task_id = ?", (task_id,))
+
+    def _prune(self):
+        """Deletes the oldest finished runs (and their steps) beyond `history_size`."""
+        self._execute(
+            "DELETE FROM runs WHERE task_id IN (SELECT task_id FROM runs WHERE status != ? "
+            "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (RunStatus.RUNNING, self.history_size),
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# Shared store, created on first use
+checkpoint_store = None
+_store_lock = threading.Lock()
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """Returns the process-wide CheckpointStore, or None if checkpointing is disabled (env CHECKPOINTS_ENABLED=0)."""
+    global checkpoint_store
+    if os.getenv("CHECKPOINTS_ENABLED", "1") != "1":
+        return None
+    with _store_lock:
+        if checkpoint_store is None:
+            checkpoint_store = CheckpointStore()
+    return checkpoint_store
@@ -0,0 +1,193 @@
+# backend/utils/context_compactor.py
+import hashlib
+import os
+import re
+import threading
+from typing import Callable, List, Optional
+
+from backend.utils.metrics import registry
+from backend.utils.result_cache import ResultCache, cache_key, get_result_cache
+from backend.utils.llm_scheduler import get_llm_scheduler
+from backend.utils.logger import get_logger
+
+logger = get_logger("compactor")
+
+CONTEXT_TOKENS = registry.counter(
+    "codingorg_context_tokens_total", "Estimated tokens of context passed between tasks, before and after compaction.", ["stage", "kind"]
+)
+
+# Default location of the full texts behind compacted context: <project root>/.codingorg/context
+DEFAULT_CONTEXT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".codingorg", "context"))
+
+# Rough characters per token for English text and code; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+# Lines at least this long are dropped when they repeat anywhere in the text
+DEDUPE_MIN_LINE_CHARS = 40
+REF_PATTERN = re.compile(r"^ctx-[0-9a-f]{16}$")
+
+SUMMARY_PROMPT = (
+    "Summarize the following {label} for a software engineering agent in at most {words} words. "
+    "Keep every file path, command, error message, failing test and decision; drop progress output, "
+    "repeated lines and boilerplate. Reply with the summary only.\n\n{text}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def dedupe_lines(text: str) -> str:
+    """
+    Collapses runs of identical lines into one line with a repeat count, and
+    drops long lines already seen earlier in the text (repeated progress and
+    log output). Short lines such as closing brackets are kept.
+    """
+    lines = text.splitlines()
+    result: List[str] = []
+    seen = set()
+    previous, repeats = None, 0
+    for line in lines + [None]:
+        if line is not None and line == previous:
+            repeats += 1
+            continue
+        if repeats:
+            result[-1] += f"  [repeated {repeats + 1}x]"
+            repeats = 0
+        if line is None:
+            break
+        previous = line
+        stripped = line.strip()
+        if len(stripped) >= DEDUPE_MIN_LINE_CHARS:
+            if stripped in seen:
+                continue
+            seen.add(stripped)
+        result.append(line)
+    return "\n".join(result)
+
+
+def truncate_middle(text: str, max_tokens: int, note: str = "") -> str:
+    """Keeps the head and tail of `text` within `max_tokens`, marking what was cut."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    marker = f"\n[... {{omitted}} characters omitted{note} ...]\n"
+    keep = max(max_chars - len(marker) - 8, 0)
+    # The tail usually holds the outcome (final status, errors, test summary)
+    head_end, tail_start = keep * 2 // 5, len(text) - (keep - keep * 2 // 5)
+    # Cut at line boundaries when there is one close by
+    newline = text.rfind("\n", 0, head_end)
+    head_end = newline if newline > head_end // 2 else head_end
+    newline = text.find("\n", tail_start)
+    tail_start = newline + 1 if 0 <= newline < tail_start + (len(text) - tail_start) // 2 else tail_start
+    return text[:head_end] + marker.format(omitted=tail_start - head_end) + text[tail_start:]
+
+
+class ContextCompactor:
+    """
+    Shrinks text handed from one crew task to the next (plans, engineer
+    reports, Aider transcripts) to a token budget:
+
+    1. Deduplicate repeated lines. Text within budget is returned as is.
+    2. Summarize with the utility model, if one is configured. Summaries are
+       cached by content, budget and model, so re-runs pay for them once.
+    3. Otherwise, or if the summary is still too long, keep the head and tail.
+
+    Compacted text ends with a reference such as `ctx-1a2b3c4d5e6f7a8b`; the
+    full original is kept in a size-bounded store and can be fetched with
+    `lookup_context` (and over HTTP at /context/{ref}).
+    """
+
+    def __init__(
+        self,
+        summarize: Optional[Callable[[str], str]] = None,
+        model_name: str = "",
+        store: Optional[ResultCache] = None,
+        summary_input_tokens: Optional[int] = None,
+    ):
+        """
+        Args:
+            summarize: Callable sending a prompt to the utility LLM and returning its reply; None to only truncate.
+            model_name: Name of the summarizing model, part of the summary cache key.
+            store: Where full texts are kept (defaults to the shared context store).
+            summary_input_tokens: Largest input sent to the summarizer; longer text is truncated first
+                (env CONTEXT_SUMMARY_INPUT_TOKENS).
+        """
+        self.summarize = summarize
+        self.model_name = model_name
+        self.store = store or get_context_store()
+        self.summary_input_tokens = summary_input_tokens or int(os.getenv("CONTEXT_SUMMARY_INPUT_TOKENS", 24000))
+
+    def remember(self, text: str) -> str:
+        """Stores the full text and returns its reference."""
+        ref = "ctx-" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        if self.store.get(ref) is None:
+            self.store.put(ref, text)
+        return ref
+
+    def compact(self, text: str, budget_tokens: int, label: str = "text", stage: str = "context") -> str:
+        """Returns `text` fitted into `budget_tokens` (see class docstring)."""
+        text = text or ""
+        tokens_in = estimate_tokens(text)
+        CONTEXT_TOKENS.inc(tokens_in, stage=stage, kind="input")
+        deduped = dedupe_lines(text)
+        if estimate_tokens(deduped) <= budget_tokens:
+            CONTEXT_TOKENS.inc(estimate_tokens(deduped), stage=stage, kind="output")
+            return deduped
+        ref = self.remember(text)
+        footer = f"\n[Compacted from ~{tokens_in} tokens; full {label}: {ref}]"
+        budget = max(budget_tokens - estimate_tokens(footer), 1)
+        summary = self._summarize(deduped, budget, label) if self.summarize is not None else None
+        compacted = truncate_middle(summary or deduped, budget, f", see {ref}") + footer
+        tokens_out = estimate_tokens(compacted)
+        CONTEXT_TOKENS.inc(tokens_out, stage=stage, kind="output")
+        logger.debug("context_compacted", stage=stage, ref=ref, tokens_in=tokens_in, tokens_out=tokens_out, summarized=bool(summary))
+        return compacted
+
+    def _summarize(self, text: str, budget_tokens: int, label: str) -> Optional[str]:
+        cache = get_result_cache()
+        key = cache_key("summary", text=text, budget=budget_tokens, label=label, model=self.model_name)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        prompt = SUMMARY_PROMPT.format(
+            label=label,
+            words=max(budget_tokens * 3 // 4, 20),  # ~0.75 words per token
+            text=truncate_middle(text, self.summary_input_tokens),
+        )
+        try:
+            # Parallel engineers compacting the same report share one summary call
+            summary = str(get_llm_scheduler().coalesce(key, lambda: self.summarize(prompt), kind="summary") or "").strip()
+        except Exception as e:
+            logger.warning("context_summary_failed", label=label, error=repr(e))
+            return None
+        if summary and cache is not None:
+            cache.put(key, summary)
+        return summary or None
+
+
+def lookup_context(ref: str) -> Optional[str]:
+    """Returns the full text behind a compaction reference, or None if unknown or evicted."""
+    if not REF_PATTERN.match(ref):
+        return None
+    return get_context_store().get(ref)
+
+
+# Full texts behind compacted context, created on first use
+context_store = None
+_store_lock = threading.Lock()
+
+def get_context_store() -> ResultCache:
+    """
+    Returns the process-wide store of full texts (a ResultCache under
+    CONTEXT_STORE_DIR, default .codingorg/context, bounded by CONTEXT_STORE_MAX_BYTES).
+    """
+    global context_store
+    with _store_lock:
+        if context_store is None:
+            context_store = ResultCache(
+                cache_dir=os.getenv("CONTEXT_STORE_DIR", DEFAULT_CONTEXT_DIR),
+                max_memory_entries=64,
+                max_disk_bytes=int(os.getenv("CONTEXT_STORE_MAX_BYTES", 512 * 1024 * 1024)),
+            )
+    return context_store
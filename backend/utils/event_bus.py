@@ -0,0 +1,146 @@
+# backend/utils/event_bus.py
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from backend.utils.logger import get_logger
+
+logger = get_logger("event_bus")
+
+# Channel carrying broadcast messages between processes
+DEFAULT_CHANNEL = "codingorg:events"
+
+Deliver = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def redis_client(url: str):
+    """Async Redis client for a redis://, rediss:// or unix:// URL."""
+    try:
+        # Optional, and imported only when a Redis URL is configured to keep startup fast
+        import redis.asyncio as aioredis
+    except ImportError:
+        raise RuntimeError(f"{url} needs the optional `redis` package (pip install redis)") from None
+    return aioredis.from_url(url, decode_responses=True)
+
+
+class EventBus:
+    """
+    Carries broadcast messages to the WebSocketManager of every process.
+
+    `publish` hands a message to the bus; the bus calls the `deliver` callback
+    bound by each manager, in the same order on every process. Managers only
+    fan out what the bus delivers, so clients see the same events whichever
+    front-end process they are connected to.
+    """
+
+    def __init__(self):
+        self.deliver: Optional[Deliver] = None
+
+    def bind(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def start(self):
+        """Connects the bus; a no-op for the in-process bus."""
+
+    async def stop(self):
+        pass
+
+    async def publish(self, message: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class InProcessEventBus(EventBus):
+    """Default bus: delivers straight to this process's manager."""
+
+    async def publish(self, message: Dict[str, Any]):
+        await self.deliver(message)
+
+
+class RedisEventBus(EventBus):
+    """
+    Bus over Redis pub/sub (or anything speaking its protocol), for running
+    several front-end and executor processes.
+
+    Messages published within one event-loop tick are sent together as one
+    JSON array, so a burst of Aider output costs one round trip instead of one
+    per line. Processes that only run crews can skip subscribing.
+    """
+
+    def __init__(self, url: str, channel: Optional[str] = None, subscribe: bool = True):
+        """
+        Args:
+            url: redis://host:port/db or unix:///path/to/redis.sock.
+            channel: Pub/sub channel (env EVENT_BUS_CHANNEL).
+            subscribe: Receive messages (False for processes with no clients to deliver to).
+        """
+        super().__init__()
+        self.url = url
+        self.channel = channel or os.getenv("EVENT_BUS_CHANNEL", DEFAULT_CHANNEL)
+        self.subscribe = subscribe
+        self.client = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._outbox: List[Dict[str, Any]] = []
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.client = redis_client(self.url)
+        if self.subscribe:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(self.channel)
+            self._reader = asyncio.create_task(self._read())
+        logger.info("event_bus_started", backend="redis", url=self.url, channel=self.channel, subscribe=self.subscribe)
+
+    async def stop(self):
+        if self._flusher is not None:
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def publish(self, message: Dict[str, Any]):
+        self._outbox.append(message)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        await asyncio.sleep(0)  # Let the rest of this tick's messages join the batch
+        while self._outbox:
+            batch, self._outbox = self._outbox, []
+            try:
+                await self.client.publish(self.channel, json.dumps(batch))
+            except Exception as e:
+                logger.error("event_bus_publish_failed", count=len(batch), error=repr(e))
+
+    async def _read(self):
+        while True:
+            try:
+                async for item in self._pubsub.listen():
+                    for message in json.loads(item["data"]):
+                        await self.deliver(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Redis restarted or the connection dropped: resubscribe after a pause
+                logger.warning("event_bus_read_failed", error=repr(e))
+                await asyncio.sleep(1)
+                try:
+                    await self._pubsub.subscribe(self.channel)
+                except Exception:
+                    pass
+
+
+def create_event_bus(url: Optional[str] = None, subscribe: bool = True) -> EventBus:
+    """
+    Bus selected by EVENT_BUS_URL: unset or "memory" for the in-process bus,
+    a redis://, rediss:// or unix:// URL for the Redis bus.
+    """
+    url = url if url is not None else os.getenv("EVENT_BUS_URL", "")
+    if not url or url == "memory":
+        return InProcessEventBus()
+    return RedisEventBus(url, subscribe=subscribe)
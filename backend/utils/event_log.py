@@ -0,0 +1,152 @@
+# backend/utils/event_log.py
+import json
+import os
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Byte offset of every Nth event is remembered so disk reads can seek close to
+# the requested sequence number instead of scanning the whole segment file.
+INDEX_INTERVAL = 256
+
+
+class TaskEventLog:
+    """
+    Append-only event log for one task.
+
+    Every event gets a sequence number (starting at 1). The most recent
+    `capacity` events are kept in a ring buffer; when a spill directory is
+    configured every event is also appended to a per-task segment file so
+    older events stay replayable without growing memory.
+    """
+
+    def __init__(self, task_id: str, capacity: int, spill_dir: Optional[str] = None):
+        self.task_id = task_id
+        self.last_seq = 0
+        self.buffer: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.path = os.path.join(spill_dir, f"{task_id}.jsonl") if spill_dir else None
+        self._file = None
+        self._offsets: List[Tuple[int, int]] = []  # (seq, byte offset) every INDEX_INTERVAL events
+        self.sealed = False
+
+    def append(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Assigns the next sequence number and stores the event. Returns the stored event."""
+        self.last_seq += 1
+        self.sealed = False  # A resumed task appends again after being sealed
+        event = {**event, "seq": self.last_seq}
+        self.buffer.append(event)
+        if self.path:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            if self.last_seq % INDEX_INTERVAL == 1:
+                self._offsets.append((self.last_seq, self._file.tell()))
+            self._file.write(json.dumps(event).encode("utf-8") + b"\n")
+        return event
+
+    @property
+    def first_buffered_seq(self) -> int:
+        return self.buffer[0]["seq"] if self.buffer else self.last_seq + 1
+
+    def read_since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Returns events with a sequence number greater than `seq` (at most `limit`),
+        plus the first sequence number that could be returned. If that number is
+        greater than `seq + 1` the caller missed events that are no longer retained.
+        """
+        if seq >= self.first_buffered_seq - 1:
+            events = [e for e in self.buffer if e["seq"] > seq]
+            first = seq + 1
+        elif self.path and os.path.exists(self.path):
+            events = self._read_from_disk(seq, limit)
+            first = seq + 1
+        else:
+            events = list(self.buffer)
+            first = self.first_buffered_seq
+        return (events[:limit] if limit is not None else events), first
+
+    def _read_from_disk(self, seq: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+        if self._file is not None:
+            self._file.flush()
+        offset = 0
+        for indexed_seq, indexed_offset in self._offsets:
+            if indexed_seq > seq + 1:
+                break
+            offset = indexed_offset
+        events = []
+        with open(self.path, "rb") as segment:
+            segment.seek(offset)
+            for line in segment:
+                event = json.loads(line)
+                if event["seq"] > seq:
+                    events.append(event)
+                    if limit is not None and len(events) >= limit:
+                        break
+        return events
+
+    def seal(self):
+        """Closes the segment file handle (the task has finished; reads reopen it)."""
+        self.sealed = True
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def delete(self):
+        self.seal()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class EventLog:
+    """
+    Per-task replayable event logs, used to let reconnecting clients resume
+    from the last sequence number they saw instead of re-reading everything.
+    Only the `max_tasks` most recently written tasks are retained.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, spill_dir: Optional[str] = None, max_tasks: Optional[int] = None):
+        """
+        Args:
+            capacity: Events kept in memory per task (env EVENT_LOG_CAPACITY).
+            spill_dir: Directory for per-task segment files, None for memory only (env EVENT_LOG_DIR).
+            max_tasks: Number of task logs retained (env EVENT_LOG_MAX_TASKS).
+        """
+        self.capacity = capacity or int(os.getenv("EVENT_LOG_CAPACITY", 1000))
+        self.spill_dir = spill_dir or os.getenv("EVENT_LOG_DIR") or None
+        self.max_tasks = max_tasks or int(os.getenv("EVENT_LOG_MAX_TASKS", 500))
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        self.tasks: "OrderedDict[str, TaskEventLog]" = OrderedDict()
+
+    def append(self, task_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        log = self.tasks.get(task_id)
+        if log is None:
+            log = self.tasks[task_id] = TaskEventLog(task_id, self.capacity, self.spill_dir)
+            while len(self.tasks) > self.max_tasks:
+                _, evicted = self.tasks.popitem(last=False)
+                evicted.delete()
+        else:
+            self.tasks.move_to_end(task_id)
+        return log.append(event)
+
+    def read_since(self, task_id: str, seq: int, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """See TaskEventLog.read_since; unknown tasks return no events."""
+        log = self.tasks.get(task_id)
+        if log is None:
+            return [], seq + 1
+        return log.read_since(seq, limit)
+
+    def last_seq(self, task_id: str) -> int:
+        log = self.tasks.get(task_id)
+        return log.last_seq if log else 0
+
+    def has_task(self, task_id: str) -> bool:
+        return task_id in self.tasks
+
+    def is_sealed(self, task_id: str) -> bool:
+        """True once the task has finished and no more events will be appended."""
+        log = self.tasks.get(task_id)
+        return log is not None and log.sealed
+
+    def seal(self, task_id: str):
+        log = self.tasks.get(task_id)
+        if log is not None:
+            log.seal()
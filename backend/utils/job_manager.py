@@ -0,0 +1,298 @@
+# backend/utils/job_manager.py
+import asyncio
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from backend.utils.metrics import QUEUE_WAIT, TASK_DURATION, get_task_timings
+from backend.utils.llm_scheduler import get_llm_scheduler
+from backend.utils.logger import get_logger
+
+logger = get_logger("jobs")
+
+# Seconds between admission checks for a job held back by the LLM quota
+ADMISSION_POLL_INTERVAL = 1.0
+
+
+class JobStatus:
+    """String constants for the lifecycle of a job."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    CANCELLING = "cancelling"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class Job:
+    """A single crew run submitted through the API."""
+
+    def __init__(self, job_id: str, prompt: str, priority: int = 0):
+        self.job_id = job_id
+        self.prompt = prompt
+        self.priority = priority
+        self.status = JobStatus.QUEUED
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Crews run in worker threads and cannot be killed; the orchestrator
+        # polls this event between steps to stop early on cancellation.
+        self.cancel_event = threading.Event()
+        # Set when the cancellation comes from a server shutdown rather than a user
+        self.interrupted = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JobStatus.FINISHED
+
+    def to_record(self) -> Dict[str, Any]:
+        """Everything needed to rebuild the job in another process (see `from_record`)."""
+        return {**self.to_dict(include_result=True), "prompt": self.prompt}
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Job":
+        job = cls(record["task_id"], record["prompt"], record.get("priority", 0))
+        job.status = record["status"]
+        job.result = record.get("result")
+        job.error = record.get("error")
+        job.created_at = record["created_at"]
+        job.started_at = record.get("started_at")
+        job.finished_at = record.get("finished_at")
+        return job
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        data = {
+            "task_id": self.job_id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            data["result"] = self.result
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Runs crews in the background on a bounded worker pool.
+
+    Jobs are pulled from a priority queue (lower number runs first, FIFO among
+    equal priorities) by `max_concurrency` worker coroutines, each of which hands
+    the blocking crew run to a dedicated thread pool so the event loop stays free
+    for HTTP and WebSocket traffic.
+
+    Jobs and the queue live in this process. RedisJobManager shares them
+    between processes instead (see `create_job_manager`).
+
+    A worker only starts a job once the LLM scheduler admits it (see
+    LLMScheduler.try_admit): while the running jobs are projected to use the
+    whole token quota, further jobs stay queued instead of adding to a storm
+    of rate-limited requests.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Job], Any],
+        websocket_manager=None,
+        max_concurrency: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        history_size: Optional[int] = None,
+        run_workers: bool = True,
+    ):
+        """
+        Args:
+            runner: Blocking callable executed in a worker thread for each job.
+            websocket_manager: Optional WebSocketManager used to broadcast status changes.
+            max_concurrency: Number of crews allowed to run at once (env MAX_CONCURRENT_CREWS).
+            max_queue_size: Maximum number of queued jobs, 0 for unbounded (env JOB_QUEUE_SIZE).
+            history_size: Number of finished jobs kept for status/result lookups (env JOB_HISTORY_SIZE).
+            run_workers: Run crews in this process; False for API-only processes (shared queues only).
+        """
+        self.runner = runner
+        self.websocket_manager = websocket_manager
+        self.max_concurrency = max_concurrency or int(os.getenv("MAX_CONCURRENT_CREWS", 2))
+        self.max_queue_size = max_queue_size if max_queue_size is not None else int(os.getenv("JOB_QUEUE_SIZE", 100))
+        self.history_size = history_size or int(os.getenv("JOB_HISTORY_SIZE", 1000))
+        self.run_workers = run_workers
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.awaiting_admission = 0  # Claimed jobs held back by admission control
+        self._counter = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers = []
+
+    async def start(self):
+        """Creates the queue, thread pool and worker coroutines. Call once on app startup."""
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queue_size)
+        self._start_workers()
+        logger.info("job_manager_started", workers=len(self._workers), queue_size=self.max_queue_size)
+
+    def _start_workers(self):
+        if not self.run_workers:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="crew")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+    async def stop(self):
+        """Stops the workers. Running crews are signalled to cancel but not awaited."""
+        for job in self.jobs.values():
+            if not job.finished:
+                job.interrupted = True
+                job.cancel_event.set()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, prompt: str, priority: int = 0, job_id: Optional[str] = None) -> Job:
+        """
+        Queues a new job and returns it immediately. Passing the `job_id` of a
+        finished (or forgotten) job runs it again under the same ID, which lets a
+        checkpointed crew resume where it stopped.
+        Raises:
+            asyncio.QueueFull: If the queue is at capacity.
+            ValueError: If a job with `job_id` is still queued or running.
+        """
+        existing = self.jobs.get(job_id) if job_id else None
+        if existing is not None and not existing.finished:
+            raise ValueError(f"Task {job_id} is still {existing.status}")
+        job = Job(job_id=job_id or uuid.uuid4().hex, prompt=prompt, priority=priority)
+        self._queue.put_nowait((priority, next(self._counter), job.job_id))
+        self.jobs.pop(job.job_id, None)
+        self.jobs[job.job_id] = job
+        self._prune_history()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancels a job. Queued jobs are cancelled immediately; running jobs are
+        asked to stop and move to `cancelled` once their current step returns.
+        Returns the job, or None if it does not exist.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        if job.status == JobStatus.QUEUED:
+            await self._finish(job, JobStatus.CANCELLED)
+        else:
+            job.status = JobStatus.CANCELLING
+            self._notify(job)
+        return job
+
+    def queue_size(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _claim(self) -> Optional[Job]:
+        """Waits for the next queued job; None if the entry was cancelled or evicted meanwhile."""
+        _, _, job_id = await self._queue.get()
+        self._queue.task_done()
+        job = self.jobs.get(job_id)
+        return job if job is not None and job.status == JobStatus.QUEUED else None
+
+    async def _worker(self):
+        while True:
+            job = await self._claim()
+            if job is not None and await self._admit(job):
+                await self._run(job)
+
+    async def _admit(self, job: Job) -> bool:
+        """
+        Holds a claimed job in the queue until the LLM scheduler admits it.
+        Returns False (after recording the cancellation) if it was cancelled meanwhile.
+        """
+        scheduler = get_llm_scheduler()
+        if not scheduler.try_admit(job.job_id):
+            self.awaiting_admission += 1
+            logger.info("job_awaiting_admission", task_id=job.job_id, running=scheduler.admitted_count())
+            try:
+                while not job.cancel_event.is_set() and not scheduler.try_admit(job.job_id):
+                    await asyncio.sleep(ADMISSION_POLL_INTERVAL)
+            finally:
+                self.awaiting_admission -= 1
+        if not job.cancel_event.is_set():
+            return True
+        scheduler.release(job.job_id)
+        if not job.finished:
+            await self._finish(job, JobStatus.CANCELLED)
+        return False
+
+    async def _run(self, job: Job):
+        loop = asyncio.get_running_loop()
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        queue_wait = job.started_at - job.created_at
+        QUEUE_WAIT.observe(queue_wait)
+        get_task_timings(job.job_id).add_phase("queue_wait", queue_wait)
+        await self._save(job)
+        self._notify(job)
+        try:
+            result = await loop.run_in_executor(self._executor, self.runner, job)
+        except Exception as e:
+            job.error = str(e)
+            # A step interrupted by the cancellation may surface as an error
+            await self._finish(job, JobStatus.CANCELLED if job.cancel_event.is_set() else JobStatus.FAILED)
+        else:
+            job.result = str(result) if result is not None else None
+            await self._finish(job, JobStatus.CANCELLED if job.cancel_event.is_set() else JobStatus.COMPLETED)
+
+    async def _save(self, job: Job):
+        """Persists a status change; jobs of the local manager live in `jobs` only."""
+
+    async def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        tokens = 0
+        if job.started_at is not None:
+            TASK_DURATION.observe(job.finished_at - job.started_at, status=status)
+            llm = get_task_timings(job.job_id).llm
+            tokens = llm["prompt_tokens"] + llm["completion_tokens"]
+        get_llm_scheduler().release(job.job_id, tokens)  # Measured use refines the admission estimate
+        await self._save(job)
+        self._notify(job)
+
+    def running_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status in (JobStatus.RUNNING, JobStatus.CANCELLING))
+
+    def _notify(self, job: Job):
+        if self.websocket_manager:
+            asyncio.create_task(self.websocket_manager.broadcast_message({"type": "task_status", **job.to_dict()}))
+
+    def _prune_history(self):
+        """Drops the oldest finished jobs once more than `history_size` are retained."""
+        excess = len(self.jobs) - self.history_size
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, job in self.jobs.items() if job.finished][:excess]:
+            del self.jobs[job_id]
+
+
+def create_job_manager(runner: Callable[[Job], Any], websocket_manager=None, run_workers: bool = True) -> JobManager:
+    """
+    JobManager selected by JOB_QUEUE_URL (defaulting to EVENT_BUS_URL): unset or
+    "memory" for the in-process manager, a redis://, rediss:// or unix:// URL
+    for a RedisJobManager shared by every process using the same URL.
+    """
+    url = os.getenv("JOB_QUEUE_URL", os.getenv("EVENT_BUS_URL", ""))
+    if not url or url == "memory":
+        if not run_workers:
+            logger.warning("job_manager_workers_forced", reason="no shared queue: set JOB_QUEUE_URL for API-only nodes")
+        return JobManager(runner=runner, websocket_manager=websocket_manager)
+    from backend.utils.redis_job_manager import RedisJobManager
+    return RedisJobManager(runner=runner, url=url, websocket_manager=websocket_manager, run_workers=run_workers)
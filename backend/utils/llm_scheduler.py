@@ -0,0 +1,328 @@
+# backend/utils/llm_scheduler.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from backend.utils.metrics import registry
+from backend.utils.logger import get_logger
+
+logger = get_logger("llm_scheduler")
+
+LLM_RATE_WAIT = registry.histogram(
+    "codingorg_llm_rate_limit_wait_seconds", "Time LLM requests waited for their model's rate limit.", ["model"]
+)
+LLM_THROTTLED = registry.counter(
+    "codingorg_llm_throttled_total", "Provider rate-limit errors (429s) that paused a model's requests.", ["model"]
+)
+LLM_COALESCED = registry.counter(
+    "codingorg_llm_coalesced_total", "Requests served by an identical request already in flight.", ["kind"]
+)
+
+# Environment variables holding each provider's API key, for requests that don't carry one
+PROVIDER_KEY_ENV = {
+    "gemini": ("GEMINI_API_KEY", "GOOGLE_API_KEY"),
+    "openai": ("OPENAI_API_KEY",),
+    "anthropic": ("ANTHROPIC_API_KEY",),
+}
+# Provider 429s as reported by the OpenAI, Gemini and Anthropic SDKs and by LiteLLM (inside Aider); specific
+# enough not to match code that merely mentions rate limits, as Aider output may
+RATE_LIMIT_PATTERN = re.compile(
+    r"RateLimitError|RESOURCE_EXHAUSTED|rate_limit_(?:exceeded|error)|too many requests|(?:error|status)(?: code)?:? 429\b",
+    re.IGNORECASE,
+)
+RETRY_AFTER_PATTERN = re.compile(r"retry(?:[ _-]?after| in)\D{0,5}(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+
+def is_rate_limit_error(text: str) -> bool:
+    return bool(text and RATE_LIMIT_PATTERN.search(text))
+
+
+def retry_after(text: str) -> Optional[float]:
+    """Delay a provider asked for in a rate-limit error ("retry in 20s", "Retry-After: 20s"), if any."""
+    match = RETRY_AFTER_PATTERN.search(text or "")
+    return float(match.group(1)) if match else None
+
+
+def key_fingerprint(api_key: Optional[str]) -> str:
+    """Short, non-reversible identifier of an API key, safe to keep in memory and logs."""
+    if not api_key:
+        return "default"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+def provider_api_key(model: str) -> Optional[str]:
+    """The API key a provider's SDK would pick from the environment for `model` (provider/name)."""
+    for env in PROVIDER_KEY_ENV.get(model.split("/", 1)[0], ()):
+        if os.getenv(env):
+            return os.getenv(env)
+    return None
+
+
+class RateLimit:
+    """Requests and tokens per minute allowed for one model and API key; 0 means unlimited."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+
+
+class TokenBucket:
+    """
+    Refills `rate_per_minute` units per minute, holding at most a minute's worth.
+
+    Reservations are taken immediately and may overdraw the bucket; the caller
+    then waits until the debt is repaid. Waiters are therefore served in the
+    order they arrived and the limit is never exceeded, rather than everyone
+    polling and the fastest thread winning. Not thread-safe on its own.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Takes `amount` units and returns how long to wait before using them."""
+        self._refill(now)
+        self.level -= min(amount, self.capacity)  # A request larger than the bucket would never fit
+        debt_delay = -self.level / self.rate if self.level < 0 else 0.0
+        return max(debt_delay, self.blocked_until - now)
+
+    def adjust(self, amount: float, now: float):
+        """Corrects an earlier reservation by `amount` units (negative to give some back)."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level - amount)
+
+    def pause(self, seconds: float, now: float):
+        """Stops handing out capacity for `seconds`: the provider disagrees with our accounting."""
+        self._refill(now)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.level = min(self.level, 0.0)
+
+
+class Reservation:
+    """Capacity taken for one request, settled with its actual size once it returns."""
+
+    def __init__(self, buckets: Tuple[Optional[TokenBucket], Optional[TokenBucket]], model: str, tokens: int):
+        self.buckets = buckets
+        self.model = model
+        self.tokens = tokens
+
+
+class _Flight:
+    """A coalesced request in progress; followers wait for the leader's result."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class LLMScheduler:
+    """
+    Central scheduler for LLM requests from every crew in the process.
+
+    - Rate limiting: each (model, API key) pair has token buckets for requests
+      and tokens per minute. `acquire` blocks the calling crew thread until the
+      request fits, so concurrent crews share a quota at its ceiling instead
+      of all firing at once and retrying on 429s. A 429 seen anyway pauses the
+      model's buckets for the provider's retry delay (or `cooldown`).
+    - Coalescing: `coalesce` runs identical requests (same key, e.g. a result
+      cache key) once while they are in flight and hands every caller the result.
+    - Admission control: `try_admit` lets a queued job start only while the
+      projected token demand of the running jobs, each assumed to use a
+      measured tokens-per-minute rate, stays within `admission_tpm`. One job
+      is always admitted so the queue cannot stall.
+
+    Limits come from LLM_RATE_LIMITS, a JSON object mapping a model
+    ("gemini/gemini-2.5-pro"), a provider ("gemini/*") or "*" to {"rpm", "tpm"};
+    models without an entry use LLM_RPM_LIMIT and LLM_TPM_LIMIT. Limits apply
+    to this process; give each process its share when running several.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, RateLimit]] = None,
+        default_limit: Optional[RateLimit] = None,
+        cooldown: Optional[float] = None,
+        admission_tpm: Optional[float] = None,
+        job_token_rate: Optional[float] = None,
+    ):
+        """
+        Args:
+            limits: Rate limits by model, provider ("gemini/*") or "*" (env LLM_RATE_LIMITS, JSON).
+            default_limit: Limit for models without an entry (env LLM_RPM_LIMIT, LLM_TPM_LIMIT).
+            cooldown: Seconds a model is paused after a 429 without a retry delay (env LLM_RATE_LIMIT_COOLDOWN).
+            admission_tpm: Tokens per minute running jobs may be projected to use, 0 to admit every job
+                (env LLM_ADMISSION_TPM, default LLM_TPM_LIMIT).
+            job_token_rate: Tokens per minute a running job is assumed to use until jobs have been measured
+                (env LLM_JOB_TOKEN_RATE).
+        """
+        if limits is None:
+            limits = {
+                model: RateLimit(float(limit.get("rpm", 0)), float(limit.get("tpm", 0)))
+                for model, limit in json.loads(os.getenv("LLM_RATE_LIMITS") or "{}").items()
+            }
+        self.limits = limits
+        if default_limit is None:
+            default_limit = RateLimit(float(os.getenv("LLM_RPM_LIMIT", 0)), float(os.getenv("LLM_TPM_LIMIT", 0)))
+        self.default_limit = default_limit
+        self.cooldown = cooldown or float(os.getenv("LLM_RATE_LIMIT_COOLDOWN", 10))
+        self.admission_tpm = admission_tpm if admission_tpm is not None else float(
+            os.getenv("LLM_ADMISSION_TPM", self.default_limit.tpm)
+        )
+        self.job_token_rate = job_token_rate or float(os.getenv("LLM_JOB_TOKEN_RATE", 20000))
+        self._buckets: Dict[Tuple[str, str], Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        self._inflight: Dict[str, _Flight] = {}
+        self._admitted: Dict[str, float] = {}  # Job ID -> admission time
+        self._lock = threading.Lock()
+
+    def limit_for(self, model: str) -> RateLimit:
+        provider = model.split("/", 1)[0]
+        for name in (model, f"{provider}/*", "*"):
+            if name in self.limits:
+                return self.limits[name]
+        return self.default_limit
+
+    def _buckets_for(self, model: str, api_key: Optional[str]) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        key = (model, key_fingerprint(api_key or provider_api_key(model)))
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            limit = self.limit_for(model)
+            buckets = self._buckets[key] = (
+                TokenBucket(limit.rpm) if limit.rpm else None,
+                TokenBucket(limit.tpm) if limit.tpm else None,
+            )
+        return buckets
+
+    def acquire(self, model: str, api_key: Optional[str] = None, tokens: int = 0,
+                cancel_event: Optional[threading.Event] = None) -> Reservation:
+        """
+        Blocks until one request of about `tokens` tokens to `model` fits its
+        rate limits, and returns the reservation to `settle` afterwards. Returns
+        early if `cancel_event` is set; the request is then expected not to run.
+        """
+        with self._lock:
+            buckets = self._buckets_for(model, api_key)
+            reservation = Reservation(buckets, model, tokens)
+            if not any(buckets):
+                return reservation
+            now = time.monotonic()
+            requests, token_bucket = buckets
+            delay = max(
+                requests.reserve(1, now) if requests else 0.0,
+                token_bucket.reserve(tokens, now) if token_bucket else 0.0,
+            )
+        started = time.monotonic()
+        while delay > 0:
+            if cancel_event is not None and cancel_event.wait(delay):
+                break
+            if cancel_event is None:
+                time.sleep(delay)
+            with self._lock:  # A 429 while we waited pushes the start back further
+                delay = max((bucket.blocked_until for bucket in buckets if bucket), default=0.0) - time.monotonic()
+        waited = time.monotonic() - started
+        LLM_RATE_WAIT.observe(waited, model=model)
+        if waited > 1:
+            logger.info("llm_rate_limited", model=model, waited=round(waited, 2), tokens=tokens)
+        return reservation
+
+    def settle(self, reservation: Reservation, tokens: int):
+        """Replaces the reservation's estimated tokens with the request's actual size."""
+        token_bucket = reservation.buckets[1]
+        if token_bucket is None or tokens == reservation.tokens:
+            return
+        with self._lock:
+            token_bucket.adjust(tokens - reservation.tokens, time.monotonic())
+
+    def throttle(self, model: str, seconds: Optional[float] = None):
+        """
+        Pauses every key's requests to `model` after a provider rate-limit error.
+        `model` may lack the provider prefix (as in CrewAI events).
+        """
+        seconds = seconds or self.cooldown
+        LLM_THROTTLED.inc(model=model)
+        logger.warning("llm_throttled", model=model, seconds=seconds)
+        now = time.monotonic()
+        with self._lock:
+            for (name, _), buckets in self._buckets.items():
+                if name == model or name.endswith("/" + model):
+                    for bucket in buckets:
+                        if bucket is not None:
+                            bucket.pause(seconds, now)
+
+    def coalesce(self, key: str, run: Callable[[], Any], kind: str = "request") -> Any:
+        """
+        Runs `run` unless a call with the same key is already in flight, in
+        which case it waits for that call and returns (or raises) its outcome.
+        """
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            LLM_COALESCED.inc(kind=kind)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = run()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def try_admit(self, job_id: str) -> bool:
+        """Admits a job if the running jobs' projected token demand leaves room for it."""
+        with self._lock:
+            if job_id in self._admitted:
+                return True
+            projected = (len(self._admitted) + 1) * self.job_token_rate
+            if self._admitted and self.admission_tpm and projected > self.admission_tpm:
+                return False
+            self._admitted[job_id] = time.monotonic()
+            return True
+
+    def release(self, job_id: str, tokens: int = 0):
+        """
+        Frees a finished job's share of the admission quota and, if its token
+        use is known, folds its tokens per minute into the per-job estimate.
+        """
+        with self._lock:
+            admitted = self._admitted.pop(job_id, None)
+            if admitted is None or tokens <= 0:
+                return
+            minutes = max((time.monotonic() - admitted) / 60.0, 1 / 60.0)
+            self.job_token_rate = 0.8 * self.job_token_rate + 0.2 * (tokens / minutes)
+
+    def admitted_count(self) -> int:
+        return len(self._admitted)
+
+
+# Shared scheduler, created on first use
+llm_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Returns the process-wide LLMScheduler, creating it on first use."""
+    global llm_scheduler
+    with _scheduler_lock:
+        if llm_scheduler is None:
+            llm_scheduler = LLMScheduler()
+    return llm_scheduler
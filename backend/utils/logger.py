@@ -0,0 +1,214 @@
+# backend/utils/logger.py
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from backend.utils.metrics import registry
+
+LOG_RECORDS_DROPPED = registry.counter(
+    "codingorg_log_records_dropped_total", "Log records dropped because the log queue was full."
+)
+
+# Logger name prefix for everything routed through the structured pipeline
+ROOT_LOGGER = "codingorg"
+
+
+def _parse_sample_rates(spec: str) -> Dict[str, int]:
+    """Parses LOG_SAMPLE_RATES ("aider_log=0.01,broadcast=0.1") into keep-one-in-N intervals."""
+    intervals = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, rate = item.partition("=")
+        try:
+            rate = float(rate)
+        except ValueError:
+            continue
+        intervals[key.strip()] = 0 if rate <= 0 else max(1, round(1 / min(rate, 1.0)))
+    return intervals
+
+
+def truncate(value: Any, max_chars: int) -> Any:
+    """Shortens long strings (and serialized containers) to `max_chars`, noting how much was cut."""
+    if isinstance(value, (dict, list, tuple)):
+        value = json.dumps(value, default=str, separators=(",", ":"))
+    elif not isinstance(value, (str, int, float, bool)) and value is not None:
+        value = str(value)
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+    return value
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Renders records as one JSON object per line (LOG_FORMAT=json) or as
+    `time level logger event key=value ...` text. Runs on the listener thread,
+    so serialization and truncation cost nothing on the logging call site.
+    """
+
+    def __init__(self, fmt: str = "text", max_field_chars: int = 500):
+        super().__init__()
+        self.fmt = fmt
+        self.max_field_chars = max_field_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        event = record.getMessage()
+        fields = {key: truncate(value, self.max_field_chars) for key, value in fields.items()}
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}"
+        if self.fmt == "json":
+            return json.dumps(
+                {"ts": timestamp, "level": record.levelname.lower(), "logger": record.name, "event": event, **fields},
+                default=str,
+            )
+        pairs = " ".join(f"{key}={json.dumps(value) if isinstance(value, str) and (' ' in value or not value) else value}"
+                         for key, value in fields.items())
+        return f"{timestamp} {record.levelname:<7} {record.name} {event}" + (f" {pairs}" if pairs else "")
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks and never formats on the caller's thread:
+    records are enqueued as-is (the listener formats them) and dropped, with a
+    counter, when the bounded queue is full.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class StructuredLogger:
+    """
+    Thin wrapper over a stdlib logger taking an event name plus key/value fields:
+
+        logger.info("task_queued", task_id=job.job_id, priority=1)
+        logger.debug("broadcast", sample=message["type"], type=message["type"], payload=message)
+
+    Calls below the configured level return after a single level check. Calls
+    with a `sample` key are additionally thinned to the rate configured for that
+    key in LOG_SAMPLE_RATES (every Nth record is kept, counted without locks).
+    Everything else (formatting, truncation, I/O) happens on the listener thread.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_intervals: Dict[str, int]):
+        self.logger = logger
+        self.sample_intervals = sample_intervals
+        self._sample_counters: Dict[str, Any] = {}
+
+    def _keep(self, sample: Optional[str]) -> bool:
+        interval = self.sample_intervals.get(sample) if sample else None
+        if interval is None or interval == 1:
+            return True
+        if interval == 0:
+            return False
+        counter = self._sample_counters.get(sample)
+        if counter is None:
+            counter = self._sample_counters.setdefault(sample, itertools.count())
+        return next(counter) % interval == 0  # itertools.count is atomic under the GIL
+
+    def log(self, level: int, event: str, sample: Optional[str] = None, exc_info=None, **fields: Any):
+        if not self.logger.isEnabledFor(level) or not self._keep(sample):
+            return
+        self.logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event: str, **fields: Any):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields: Any):
+        self.log(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields: Any):
+        self.log(logging.ERROR, event, exc_info=True, **fields)
+
+    def is_enabled_for(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_sample_intervals: Dict[str, int] = {}
+_setup_lock = threading.Lock()
+_atexit_registered = threading.Event()
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    queue_size: Optional[int] = None,
+    max_field_chars: Optional[int] = None,
+    sample_rates: Optional[str] = None,
+):
+    """
+    Routes the `codingorg` loggers through a bounded queue to a background
+    listener writing to stderr. Called automatically by `get_logger`; call it
+    explicitly (before the first `get_logger`) to override the environment.
+    Args:
+        level: Minimum level (env LOG_LEVEL, default INFO).
+        fmt: "text" or "json" (env LOG_FORMAT).
+        queue_size: Records buffered before new ones are dropped (env LOG_QUEUE_SIZE).
+        max_field_chars: Longest field value written before truncation (env LOG_MAX_FIELD_CHARS).
+        sample_rates: Per-key sampling rates, e.g. "aider_log=0.01" (env LOG_SAMPLE_RATES).
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+        root.propagate = False
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size or int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+        root.handlers[:] = [DroppingQueueHandler(log_queue)]
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(StructuredFormatter(
+            fmt or os.getenv("LOG_FORMAT", "text"),
+            max_field_chars or int(os.getenv("LOG_MAX_FIELD_CHARS", 500)),
+        ))
+        # Updated in place: loggers created earlier share this dict
+        _sample_intervals.clear()
+        _sample_intervals.update(_parse_sample_rates(
+            sample_rates if sample_rates is not None else os.getenv("LOG_SAMPLE_RATES", "aider_log=0.01")
+        ))
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+        _listener.start()
+        if not _atexit_registered.is_set():
+            atexit.register(shutdown_logging)
+            _atexit_registered.set()
+
+
+def shutdown_logging():
+    """
+    Stops the listener after writing every queued record. Records logged
+    afterwards are written synchronously; `setup_logging` re-enables the queue.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            logging.getLogger(ROOT_LOGGER).handlers[:] = list(_listener.handlers)
+            _listener = None
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Returns a structured logger under the `codingorg` namespace, e.g. get_logger("websocket")."""
+    if not logging.getLogger(ROOT_LOGGER).handlers:
+        setup_logging()
+    return StructuredLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"), _sample_intervals)
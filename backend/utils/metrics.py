@@ -0,0 +1,263 @@
+# backend/utils/metrics.py
+import bisect
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Histogram buckets (seconds) suited to everything from a WebSocket send to a crew run
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base for labelled metrics; values are kept per tuple of label values."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        yield from self._samples()
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """A value that goes up and down; may instead be read from a callback at render time."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.function = function
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def _samples(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return
+            yield f"{self.name} {_format_value(value)}"
+            return
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (non-cumulative, last is +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observes the wall time of a block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing  # Registering twice (e.g. on module reload) returns the original
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (), function=None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry served by the /metrics endpoint
+registry = MetricsRegistry()
+
+QUEUE_WAIT = registry.histogram("codingorg_queue_wait_seconds", "Time tasks spent queued before a worker picked them up.")
+TASK_DURATION = registry.histogram("codingorg_task_duration_seconds", "Crew run wall time by final status.", ["status"])
+PHASE_DURATION = registry.histogram("codingorg_phase_duration_seconds", "Wall time of crew phases (plan, engineer, merge, review).", ["phase"])
+LLM_LATENCY = registry.histogram("codingorg_llm_request_duration_seconds", "Latency of agent LLM calls.", ["model", "phase"])
+LLM_REQUESTS = registry.counter("codingorg_llm_requests_total", "Agent LLM calls by outcome.", ["model", "phase", "outcome"])
+LLM_TOKENS = registry.counter("codingorg_llm_tokens_total", "Tokens used by agent LLM calls.", ["model", "phase", "kind"])
+TOOL_DURATION = registry.histogram("codingorg_tool_call_duration_seconds", "Wall time of agent tool calls.", ["tool"])
+TOOL_CALLS = registry.counter("codingorg_tool_calls_total", "Agent tool calls by outcome.", ["tool", "outcome"])
+AIDER_DURATION = registry.histogram("codingorg_aider_run_duration_seconds", "Wall time of Aider runs by execution mode.", ["mode"])
+AIDER_OUTPUT_BYTES = registry.counter("codingorg_aider_output_bytes_total", "Bytes of Aider output streamed.", ["stream"])
+WS_SEND_LATENCY = registry.histogram("codingorg_ws_send_duration_seconds", "Time to write one frame to a WebSocket client.")
+WS_FRAMES_SENT = registry.counter("codingorg_ws_frames_sent_total", "Frames written to WebSocket clients.")
+WS_FRAMES_DROPPED = registry.counter("codingorg_ws_frames_dropped_total", "Frames dropped by a client's overflow policy.")
+
+
+class TaskTimings:
+    """Per-task breakdown of where a crew run spent its time and tokens."""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.phases: Dict[str, float] = {}
+        self.llm = {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.tools: Dict[str, Dict[str, float]] = {}
+        self.aider = {"runs": 0, "seconds": 0.0, "output_bytes": 0}
+        self._lock = threading.Lock()
+
+    def add_phase(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_llm_call(self, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+        with self._lock:
+            self.llm["calls"] += 1
+            self.llm["seconds"] += seconds
+            self.llm["prompt_tokens"] += prompt_tokens
+            self.llm["completion_tokens"] += completion_tokens
+
+    def add_tool_call(self, tool: str, seconds: float):
+        with self._lock:
+            entry = self.tools.setdefault(tool, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+
+    def add_aider_run(self, seconds: float, output_bytes: int):
+        with self._lock:
+            self.aider["runs"] += 1
+            self.aider["seconds"] += seconds
+            self.aider["output_bytes"] += output_bytes
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "phases": {phase: round(seconds, 4) for phase, seconds in self.phases.items()},
+                "llm": {**self.llm, "seconds": round(self.llm["seconds"], 4)},
+                "tools": {tool: {**entry, "seconds": round(entry["seconds"], 4)} for tool, entry in self.tools.items()},
+                "aider": {**self.aider, "seconds": round(self.aider["seconds"], 4)},
+            }
+
+
+# Timings of recent tasks, oldest evicted first
+task_timings: "OrderedDict[str, TaskTimings]" = OrderedDict()
+_timings_lock = threading.Lock()
+TASK_TIMINGS_HISTORY = int(os.getenv("TASK_TIMINGS_HISTORY", 1000))
+
+def get_task_timings(task_id: Optional[str]) -> Optional[TaskTimings]:
+    """Returns (creating if needed) the timings for a task, or None without a task ID."""
+    if not task_id:
+        return None
+    with _timings_lock:
+        timings = task_timings.get(task_id)
+        if timings is None:
+            timings = task_timings[task_id] = TaskTimings(task_id)
+            while len(task_timings) > TASK_TIMINGS_HISTORY:
+                task_timings.popitem(last=False)
+        return timings
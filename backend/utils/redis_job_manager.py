@@ -0,0 +1,226 @@
+# backend/utils/redis_job_manager.py
+import asyncio
+import json
+import os
+import socket
+import uuid
+from typing import Any, Callable, Optional
+
+from backend.utils.event_bus import redis_client
+from backend.utils.job_manager import Job, JobManager, JobStatus
+from backend.utils.logger import get_logger
+
+logger = get_logger("jobs")
+
+# Seconds a claiming worker blocks on the queue before checking for shutdown
+CLAIM_TIMEOUT = 1
+# Seconds between refreshes of the shared queue length reported by queue_size()
+QUEUE_SIZE_POLL_INTERVAL = 5
+# Orders jobs by priority, then submission order, within one sorted-set score
+PRIORITY_SCALE = 10 ** 12
+
+
+class RedisJobManager(JobManager):
+    """
+    JobManager whose queue and job records live in Redis, so API front-ends
+    and crew executors can run as separate processes, on one or many nodes.
+
+    - `submit` (any process) stores the job record and adds its ID to a sorted
+      set scored by priority, then submission order.
+    - Executors (`run_workers=True`) claim jobs with BZPOPMIN, which hands each
+      job to exactly one of them, and run crews like the local JobManager.
+      Only the claiming executor writes a running job's record, so `get` from
+      any process sees its latest status.
+    - Cancelling a queued job removes it from the set; cancelling a claimed
+      one stores a cancel flag and publishes on a control channel the
+      executors listen to. The flag covers a job claimed but not yet
+      registered by its executor when the message arrives.
+
+    Status changes are broadcast through the WebSocketManager as usual, so a
+    shared event bus delivers them to every front-end. Finished job records
+    expire after `history_ttl` seconds. Jobs interrupted by an executor
+    shutdown are marked failed; the executor's checkpoint store requeues them
+    when it starts again.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Job], Any],
+        url: str,
+        websocket_manager=None,
+        max_concurrency: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        run_workers: bool = True,
+        prefix: Optional[str] = None,
+        history_ttl: Optional[int] = None,
+    ):
+        """
+        Args:
+            runner: Blocking callable executed in a worker thread for each claimed job.
+            url: redis://host:port/db or unix:///path/to/redis.sock.
+            websocket_manager: WebSocketManager used to broadcast status changes.
+            max_concurrency: Crews this process runs at once (env MAX_CONCURRENT_CREWS).
+            max_queue_size: Maximum number of queued jobs across all processes, 0 for unbounded (env JOB_QUEUE_SIZE).
+            run_workers: Claim and run jobs in this process; False for API-only front-ends.
+            prefix: Key prefix for the queue, job records and control channel (env JOB_QUEUE_PREFIX).
+            history_ttl: Seconds finished job records are kept (env JOB_HISTORY_TTL).
+        """
+        super().__init__(runner, websocket_manager, max_concurrency, max_queue_size, run_workers=run_workers)
+        self.url = url
+        self.prefix = prefix or os.getenv("JOB_QUEUE_PREFIX", "codingorg:jobs")
+        self.history_ttl = history_ttl or int(os.getenv("JOB_HISTORY_TTL", 24 * 3600))
+        self.node_id = os.getenv("NODE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+        self.client = None
+        self._control: Optional[asyncio.Task] = None
+        self._queue_size_poller: Optional[asyncio.Task] = None
+        self._queued = 0  # Last observed queue length, for the metrics gauge
+
+    @property
+    def _queue_key(self) -> str:
+        return f"{self.prefix}:queue"
+
+    @property
+    def _control_channel(self) -> str:
+        return f"{self.prefix}:control"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def _cancel_key(self, job_id: str) -> str:
+        return f"{self.prefix}:cancel:{job_id}"
+
+    async def start(self):
+        self.client = redis_client(self.url)
+        self._start_workers()
+        if self.run_workers:
+            self._control = asyncio.create_task(self._listen_control())
+        self._queue_size_poller = asyncio.create_task(self._poll_queue_size())
+        logger.info("job_manager_started", backend="redis", node=self.node_id, workers=len(self._workers))
+
+    async def stop(self):
+        interrupted = [job for job in self.jobs.values() if not job.finished]
+        tasks = [task for task in (self._control, self._queue_size_poller) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await super().stop()
+        for job in interrupted:
+            job.error = "Interrupted by executor shutdown."
+            await self._finish(job, JobStatus.FAILED)
+        await self.client.aclose()
+
+    async def submit(self, prompt: str, priority: int = 0, job_id: Optional[str] = None) -> Job:
+        """
+        Queues a new job for any executor. See JobManager.submit.
+        Raises:
+            asyncio.QueueFull: If the shared queue is at capacity.
+            ValueError: If a job with `job_id` is still queued or running.
+        """
+        if job_id:
+            existing = await self.get(job_id)
+            if existing is not None and not existing.finished:
+                raise ValueError(f"Task {job_id} is still {existing.status}")
+            await self.client.delete(self._cancel_key(job_id))  # Left from a cancelled earlier run
+        self._queued = await self.client.zcard(self._queue_key)
+        if self.max_queue_size and self._queued >= self.max_queue_size:
+            raise asyncio.QueueFull()
+        job = Job(job_id=job_id or uuid.uuid4().hex, prompt=prompt, priority=priority)
+        order = await self.client.incr(f"{self.prefix}:order")
+        await self._save(job)
+        await self.client.zadd(self._queue_key, {job.job_id: priority * PRIORITY_SCALE + order})
+        self._queued += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)  # Running here: the local object is the freshest
+        if job is not None:
+            return job
+        record = await self.client.get(self._job_key(job_id))
+        return Job.from_record(json.loads(record)) if record else None
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancels a queued job, or asks the executor running it to stop after its current step."""
+        job = await self.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.status == JobStatus.QUEUED and await self.client.zrem(self._queue_key, job_id):
+            await self._finish(job, JobStatus.CANCELLED)
+            return job
+        # Claimed by an executor (possibly this one); it records the cancellation.
+        # The flag reaches an executor that popped the job but has not registered it yet.
+        await self.client.set(self._cancel_key(job_id), "1", ex=self.history_ttl)
+        await self.client.publish(self._control_channel, json.dumps({"action": "cancel", "task_id": job_id}))
+        return job
+
+    def queue_size(self) -> int:
+        """Length of the shared queue as of the last poll (or local submit)."""
+        return self._queued
+
+    async def _poll_queue_size(self):
+        while True:
+            try:
+                self._queued = await self.client.zcard(self._queue_key)
+            except Exception as e:
+                logger.warning("job_queue_size_failed", error=repr(e))
+            await asyncio.sleep(QUEUE_SIZE_POLL_INTERVAL)
+
+    async def _claim(self) -> Optional[Job]:
+        try:
+            item = await self.client.bzpopmin(self._queue_key, timeout=CLAIM_TIMEOUT)
+        except Exception as e:
+            logger.warning("job_claim_failed", error=repr(e))
+            await asyncio.sleep(CLAIM_TIMEOUT)
+            return None
+        if item is None:
+            return None
+        job = await self.get(item[1])
+        if job is None or job.status != JobStatus.QUEUED:
+            return None
+        # Register before checking the flag: a cancel either set it already, or
+        # publishes after this and the control listener finds the job in `jobs`
+        self.jobs[job.job_id] = job
+        if await self.client.get(self._cancel_key(job.job_id)):
+            job.cancel_event.set()  # _admit records the cancellation
+        logger.info("job_claimed", task_id=job.job_id, node=self.node_id)
+        return job
+
+    async def _admit(self, job: Job) -> bool:
+        admitted = await super()._admit(job)
+        if not admitted:
+            self.jobs.pop(job.job_id, None)
+        return admitted
+
+    async def _run(self, job: Job):
+        try:
+            await super()._run(job)
+        finally:
+            self.jobs.pop(job.job_id, None)
+
+    async def _save(self, job: Job):
+        record = json.dumps({**job.to_record(), "node": self.node_id if job.started_at else None})
+        await self.client.set(self._job_key(job.job_id), record, ex=self.history_ttl if job.finished else None)
+
+    async def _listen_control(self):
+        """Applies cancellations published by any process to the jobs running here."""
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self._control_channel)
+                async for item in pubsub.listen():
+                    message = json.loads(item["data"])
+                    job = self.jobs.get(message.get("task_id"))
+                    if message.get("action") == "cancel" and job is not None and not job.finished:
+                        job.cancel_event.set()
+                        job.status = JobStatus.CANCELLING
+                        await self._save(job)
+                        self._notify(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("job_control_failed", error=repr(e))
+                await asyncio.sleep(CLAIM_TIMEOUT)
+            finally:
+                await pubsub.aclose()
+
+    def _prune_history(self):
+        """Finished records expire in Redis instead."""
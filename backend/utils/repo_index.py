@@ -0,0 +1,301 @@
+# backend/utils/repo_index.py
+import ast
+import hashlib
+import json
+import os
+import re
+import subprocess
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from backend.utils.result_cache import IGNORED_DIRS
+from backend.utils.logger import get_logger
+
+logger = get_logger("repo_index")
+
+# Default location of persisted indexes: <project root>/.codingorg/index
+DEFAULT_INDEX_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".codingorg", "index"))
+
+# Files larger than this are hashed and listed but not parsed for symbols/imports
+MAX_PARSE_BYTES = 512 * 1024
+
+PYTHON_EXTENSIONS = {".py"}
+SCRIPT_EXTENSIONS = {".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs"}
+
+_JS_IMPORT = re.compile(r"""(?:import\s[^'"]*?from\s*|import\s*\(?\s*|require\s*\(\s*)['"]([^'"]+)['"]""")
+_JS_SYMBOL = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\*?|class|interface|type|enum|const|let|var)\s+([A-Za-z_$][\w$]*)",
+    re.MULTILINE,
+)
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]+")
+# Common words that would otherwise match half the repository
+_STOP_WORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "add", "use", "make", "create", "should",
+    "file", "files", "code", "test", "tests", "new", "all", "are", "not", "when", "each", "its", "can",
+}
+
+
+def _tokens(text: str) -> set:
+    """Lower-cased words of a text, with camelCase and snake_case identifiers split into parts."""
+    words = set()
+    for word in _WORD.findall(text):
+        for part in re.findall(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])", word):
+            part = part.lower()
+            if len(part) > 2 and part not in _STOP_WORDS:
+                words.add(part)
+    return words
+
+
+class FileEntry:
+    """What the index knows about one file."""
+
+    def __init__(self, path: str, mtime_ns: int, size: int, sha: str, symbols: List[str], imports: List[str]):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha = sha
+        self.symbols = symbols
+        self.imports = imports  # Raw module specifiers, resolved to files by RepoIndex
+
+    def to_dict(self) -> dict:
+        return {
+            "mtime_ns": self.mtime_ns, "size": self.size, "sha": self.sha,
+            "symbols": self.symbols, "imports": self.imports,
+        }
+
+    @classmethod
+    def from_dict(cls, path: str, data: dict) -> "FileEntry":
+        return cls(path, data["mtime_ns"], data["size"], data["sha"], data["symbols"], data["imports"])
+
+
+def parse_file(path: str, source: str) -> tuple:
+    """Returns (top-level symbols, imported modules) of a Python or JS/TS source file."""
+    extension = os.path.splitext(path)[1]
+    if extension in PYTHON_EXTENSIONS:
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError):
+            return [], []
+        symbols, imports = [], []
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                symbols.append(node.name)
+                if isinstance(node, ast.ClassDef):
+                    symbols.extend(
+                        f"{node.name}.{item.name}" for item in node.body
+                        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and not item.name.startswith("__")
+                    )
+            elif isinstance(node, ast.Assign):
+                symbols.extend(t.id for t in node.targets if isinstance(t, ast.Name) and t.id.isupper())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imports.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                module = "." * node.level + (node.module or "")
+                imports.append(module)
+                # `from package import module` may name submodules
+                imports.extend(f"{module.rstrip('.')}.{alias.name}" if node.module else module + alias.name for alias in node.names)
+        return symbols, imports
+    if extension in SCRIPT_EXTENSIONS:
+        return _JS_SYMBOL.findall(source), _JS_IMPORT.findall(source)
+    return [], []
+
+
+class RepoIndex:
+    """
+    Persistent, incrementally updated index of a project: content hash, mtime,
+    top-level symbols and imports of every file, plus the resolved import graph.
+
+    `refresh` lists the project's files (via git when available, honouring
+    .gitignore) and only re-reads files whose mtime or size changed since the
+    last refresh, so it is cheap to call before every task. `relevant_files`
+    ranks files against a piece of text so agents and Aider only receive the
+    files a step is likely to need instead of the whole repository.
+    """
+
+    def __init__(self, root: str, index_path: Optional[str] = None):
+        """
+        Args:
+            root: Project root to index.
+            index_path: Where the index is persisted (default under env REPO_INDEX_DIR or
+                .codingorg/index, one file per root; "" to keep it in memory only).
+        """
+        self.root = os.path.abspath(root)
+        if index_path is None:
+            index_dir = os.getenv("REPO_INDEX_DIR", DEFAULT_INDEX_DIR)
+            root_id = hashlib.sha256(self.root.encode()).hexdigest()[:16]
+            index_path = os.path.join(index_dir, f"{root_id}.json") if index_dir else ""
+        self.index_path = index_path
+        self.files: Dict[str, FileEntry] = {}
+        self.imports: Dict[str, set] = {}      # file -> files it imports
+        self.imported_by: Dict[str, set] = {}  # file -> files importing it
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = {path: FileEntry.from_dict(path, entry) for path, entry in data["files"].items()}
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("repo_index_unreadable", path=self.index_path, error=repr(e))
+            self.files = {}
+        self._build_graph()
+
+    def _save(self):
+        if not self.index_path:
+            return
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f"{self.index_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"root": self.root, "files": {path: e.to_dict() for path, e in self.files.items()}}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _list_files(self) -> List[str]:
+        try:
+            listing = subprocess.run(
+                ["git", "ls-files", "--cached", "--others", "--exclude-standard", "-z"],
+                cwd=self.root, capture_output=True,
+            )
+            if listing.returncode == 0:
+                paths = {p.decode("utf-8", errors="replace") for p in listing.stdout.split(b"\0") if p}
+                return sorted(p for p in paths if p.split("/", 1)[0] not in IGNORED_DIRS)
+        except FileNotFoundError:
+            pass  # git not installed
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+            paths.extend(os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/") for name in filenames)
+        return sorted(paths)
+
+    def refresh(self) -> dict:
+        """
+        Brings the index up to date with the files on disk.
+        Returns counts of added, updated, removed and unchanged files.
+        """
+        with self._lock:
+            stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+            seen = set()
+            for path in self._list_files():
+                try:
+                    stat = os.stat(os.path.join(self.root, path))
+                except OSError:
+                    continue  # Deleted but still in the git index
+                seen.add(path)
+                entry = self.files.get(path)
+                if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                    stats["unchanged"] += 1
+                    continue
+                new_entry = self._index_file(path, stat)
+                if new_entry is None:
+                    continue
+                if entry is not None and entry.sha == new_entry.sha:
+                    entry.mtime_ns = new_entry.mtime_ns  # Touched, not changed
+                    stats["unchanged"] += 1
+                    continue
+                self.files[path] = new_entry
+                stats["updated" if entry is not None else "added"] += 1
+            for path in set(self.files) - seen:
+                del self.files[path]
+                stats["removed"] += 1
+            if stats["added"] or stats["updated"] or stats["removed"]:
+                self._build_graph()
+            self._save()
+            return stats
+
+    def _index_file(self, path: str, stat: os.stat_result) -> Optional[FileEntry]:
+        try:
+            with open(os.path.join(self.root, path), "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        symbols, imports = [], []
+        if len(content) <= MAX_PARSE_BYTES:
+            symbols, imports = parse_file(path, content.decode("utf-8", errors="replace"))
+        return FileEntry(path, stat.st_mtime_ns, stat.st_size, hashlib.sha256(content).hexdigest(), symbols, imports)
+
+    def _build_graph(self):
+        """Resolves every file's import specifiers to indexed files."""
+        modules = {}  # Dotted Python module name -> file
+        for path in self.files:
+            if path.endswith(".py"):
+                module = path[:-3].replace("/", ".")
+                modules[module[:-len(".__init__")] if module.endswith(".__init__") else module] = path
+        self.imports = {path: set() for path in self.files}
+        self.imported_by = {path: set() for path in self.files}
+        for path, entry in self.files.items():
+            for spec in entry.imports:
+                target = self._resolve(path, spec, modules)
+                if target and target != path:
+                    self.imports[path].add(target)
+                    self.imported_by[target].add(path)
+
+    def _resolve(self, path: str, spec: str, modules: Dict[str, str]) -> Optional[str]:
+        if path.endswith(".py"):
+            if spec.startswith("."):
+                level = len(spec) - len(spec.lstrip("."))
+                package = path.split("/")[:-1]
+                package = package[:len(package) - (level - 1)] if level > 1 else package
+                spec = ".".join(package + [spec.lstrip(".")]).strip(".")
+            return modules.get(spec)
+        if not spec.startswith("."):
+            return None  # Package import, not a project file
+        base = os.path.normpath(os.path.join(os.path.dirname(path), spec)).replace(os.sep, "/")
+        for candidate in [base] + [base + ext for ext in sorted(SCRIPT_EXTENSIONS)] + [f"{base}/index{ext}" for ext in sorted(SCRIPT_EXTENSIONS)]:
+            if candidate in self.files:
+                return candidate
+        return None
+
+    def relevant_files(self, text: str, seed_files: Iterable[str] = (), limit: Optional[int] = None) -> List[str]:
+        """
+        Ranks indexed files by how well their path and symbols match the words in
+        `text`, then pulls in direct import neighbours of the best matches. Files in
+        `seed_files` (e.g. the ones a plan step names) always come first.
+        Returns at most `limit` paths (env REPO_INDEX_MAX_FILES).
+        """
+        limit = limit or int(os.getenv("REPO_INDEX_MAX_FILES", 8))
+        words = _tokens(text)
+        mentioned = {path for path in self.files if path in text or os.path.basename(path) in text.split()}
+        scores: Dict[str, float] = {}
+        with self._lock:
+            for path, entry in self.files.items():
+                score = 5.0 if path in mentioned else 0.0
+                score += 2.0 * len(words & _tokens(path))
+                score += min(3.0, 1.0 * len(words & _tokens(" ".join(entry.symbols))))
+                if score:
+                    scores[path] = score
+            # Neighbours in the import graph inherit part of a match's score
+            for path, score in sorted(scores.items(), key=lambda item: -item[1])[:limit]:
+                for neighbour in self.imports.get(path, set()) | self.imported_by.get(path, set()):
+                    scores[neighbour] = scores.get(neighbour, 0.0) + score * 0.3
+        seeds = [path for path in seed_files if path in self.files]
+        ranked = sorted((p for p in scores if p not in seeds), key=lambda p: (-scores[p], p))
+        return (seeds + ranked)[:max(limit, len(seeds))]
+
+    def describe(self, paths: Iterable[str], max_symbols: int = 12) -> str:
+        """Compact context block listing each path with its top-level symbols."""
+        lines = []
+        for path in paths:
+            entry = self.files.get(path)
+            if entry is None:
+                continue
+            symbols = [s for s in entry.symbols if "." not in s][:max_symbols]
+            lines.append(f"- {path}" + (f": {', '.join(symbols)}" if symbols else ""))
+        return "\n".join(lines)
+
+
+# Shared indexes, one per project root, created on first use
+repo_indexes: Dict[str, RepoIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_repo_index(root: str) -> Optional[RepoIndex]:
+    """Returns the RepoIndex for a project root, or None if indexing is disabled (env REPO_INDEX_ENABLED=0)."""
+    if os.getenv("REPO_INDEX_ENABLED", "1") != "1":
+        return None
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        if root not in repo_indexes:
+            repo_indexes[root] = RepoIndex(root)
+        return repo_indexes[root]
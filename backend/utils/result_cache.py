@@ -0,0 +1,208 @@
+# backend/utils/result_cache.py
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+# Default disk tier location: <project root>/.codingorg/cache
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".codingorg", "cache"))
+
+# Directories never considered part of the project state
+IGNORED_DIRS = {".git", ".codingorg", "node_modules", "__pycache__", ".venv", "venv"}
+
+
+def repo_state_hash(root: str) -> str:
+    """
+    Hashes the current contents of a project: for git repositories the HEAD tree
+    plus uncommitted and untracked changes, otherwise every file's path, size
+    and mtime. Any file change produces a different hash, which is what
+    invalidates cache entries keyed on it.
+    """
+    digest = hashlib.sha256()
+    try:
+        tree = subprocess.run(["git", "rev-parse", "HEAD^{tree}"], cwd=root, capture_output=True, text=True)
+        if tree.returncode == 0:
+            digest.update(tree.stdout.encode())
+            # Uncommitted changes to tracked files, then untracked files by content
+            digest.update(subprocess.run(["git", "diff", "HEAD", "--binary"], cwd=root, capture_output=True).stdout)
+            untracked = subprocess.run(
+                ["git", "ls-files", "--others", "--exclude-standard", "-z"], cwd=root, capture_output=True
+            ).stdout.split(b"\0")
+            for rel_path in filter(None, untracked):
+                digest.update(rel_path)
+                try:
+                    with open(os.path.join(root, rel_path.decode()), "rb") as f:
+                        digest.update(hashlib.sha256(f.read()).digest())
+                except OSError:
+                    pass
+            return digest.hexdigest()
+    except FileNotFoundError:
+        pass  # git not installed
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_DIRS)
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.relpath(path, root)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def cache_key(kind: str, **parts: Any) -> str:
+    """Content-addressed key: SHA-256 of the entry kind and its (JSON-serializable) inputs."""
+    payload = json.dumps({"kind": kind, **parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for LLM plans and Aider results.
+
+    A small in-memory LRU sits in front of an on-disk store (one JSON file per
+    key, sharded by key prefix). The disk tier is bounded by total size; when
+    it grows past `max_disk_bytes` the least recently used files are removed.
+    Keys should include a `repo_state_hash` so entries are never served for a
+    project state they weren't produced in.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_memory_entries: Optional[int] = None,
+        max_disk_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Args:
+            cache_dir: Disk tier location (env RESULT_CACHE_DIR, default .codingorg/cache; "" for memory only).
+            max_memory_entries: Entries kept in the memory tier (env RESULT_CACHE_MEMORY_ENTRIES).
+            max_disk_bytes: Size budget of the disk tier (env RESULT_CACHE_MAX_BYTES).
+            ttl: Seconds an entry stays valid, 0 for no expiry (env RESULT_CACHE_TTL).
+        """
+        self.cache_dir = cache_dir if cache_dir is not None else os.getenv("RESULT_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_memory_entries = max_memory_entries or int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", 256))
+        self.max_disk_bytes = max_disk_bytes or int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESULT_CACHE_TTL", 0))
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_at, value)
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(os.path.getsize(path) for path in self._disk_files())
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _disk_files(self):
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.endswith(".json"):
+                    yield os.path.join(dirpath, name)
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            entry = self._read_disk(key)
+            if entry is None or self._expired(entry[0]):
+                self.misses += 1
+                return None
+            self._remember(key, entry)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: str):
+        entry = (time.time(), value)
+        with self._lock:
+            self._remember(key, entry)
+            if self.cache_dir:
+                self._write_disk(key, entry)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            if self.cache_dir:
+                self._remove_file(self._path(key))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir:
+                for path in list(self._disk_files()):
+                    self._remove_file(path)
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)  # Mark as recently used for eviction
+        except (OSError, ValueError):
+            return None
+        return data["created_at"], data["value"]
+
+    def _write_disk(self, key: str, entry: tuple):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            self._disk_bytes -= os.path.getsize(path)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": entry[0], "value": entry[1]}, f)
+        os.replace(tmp_path, path)  # Atomic: readers never see partial entries
+        self._disk_bytes += os.path.getsize(path)
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Removes least recently used files until the disk tier is at 90% of its budget."""
+        files = sorted(self._disk_files(), key=lambda p: os.path.getmtime(p))
+        for path in files:
+            if self._disk_bytes <= self.max_disk_bytes * 0.9:
+                break
+            self._remove_file(path)
+
+    def _remove_file(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._disk_bytes -= size
+        except OSError:
+            pass
+
+
+# Shared cache, created on first use
+result_cache = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Returns the process-wide ResultCache, or None if caching is disabled (env RESULT_CACHE_ENABLED=0)."""
+    global result_cache
+    if os.getenv("RESULT_CACHE_ENABLED", "1") != "1":
+        return None
+    with _cache_lock:
+        if result_cache is None:
+            result_cache = ResultCache()
+    return result_cache
@@ -0,0 +1,148 @@
+# backend/utils/sse.py
+import json
+import os
+import zlib
+from typing import Any, AsyncIterator, Dict, FrozenSet, Iterable, Optional
+
+from backend.utils.metrics import registry
+from backend.utils.websocket_manager import REPLAY_CHUNK_SIZE, WebSocketManager
+
+SSE_EVENTS_SENT = registry.counter("codingorg_sse_events_sent_total", "Task events written to SSE streams.")
+
+# Small deflate window and state: an idle gzip stream holds ~32KB instead of ~256KB
+GZIP_WINDOW_BITS = 12
+GZIP_MEM_LEVEL = 5
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True if an Accept-Encoding header allows gzip (and doesn't give it q=0)."""
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    """Sequence number from a Last-Event-ID header; missing or malformed IDs start from 0."""
+    try:
+        return max(int(value or 0), 0)
+    except ValueError:
+        return 0
+
+
+def format_event(data: str, event_id: Optional[int] = None) -> str:
+    """One SSE message; `data` must be single-line (json.dumps output is)."""
+    return (f"id: {event_id}\n" if event_id is not None else "") + f"data: {data}\n\n"
+
+
+class TaskEventStream:
+    """
+    Server-Sent Events stream of one task's events, read from the same
+    EventLog that backs WebSocket replay.
+
+    Each event is sent as `id: <seq>` plus `data: <event JSON>`, so a browser
+    EventSource (or any client sending `Last-Event-ID`) reconnects exactly
+    where it left off; events no longer retained are reported with a
+    `{"type": "gap", ...}` message. The stream ends after the task's final
+    `task_status` event (`{"type": "end"}` is sent last so clients can stop
+    reconnecting).
+
+    Idle streams are cheap: a stream holds no queue and no task of its own,
+    only its position in the log, and waits on the manager's shared per-task
+    future. Comment heartbeats keep proxies from closing idle connections,
+    and with gzip each write is sync-flushed so nothing sits in a buffer.
+    """
+
+    open_streams = 0
+
+    def __init__(
+        self,
+        manager: WebSocketManager,
+        task_id: str,
+        since: int = 0,
+        events: Optional[Iterable[str]] = None,
+        compress: bool = False,
+        heartbeat: Optional[float] = None,
+        retry_ms: Optional[int] = None,
+    ):
+        """
+        Args:
+            manager: WebSocketManager whose event log and flushes feed the stream.
+            task_id: Task to stream.
+            since: Last seq the client already has (from Last-Event-ID).
+            events: Event types to send, None for all.
+            compress: gzip the stream (only if the client accepts it; see `accepts_gzip`).
+            heartbeat: Seconds between keep-alive comments on an idle stream (env SSE_HEARTBEAT_SECONDS).
+            retry_ms: Reconnect delay suggested to the client (env SSE_RETRY_MS).
+        """
+        self.manager = manager
+        self.task_id = task_id
+        self.since = since
+        self.events: Optional[FrozenSet[str]] = frozenset(events) if events else None
+        self.compress = compress
+        self.heartbeat = heartbeat or float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+        self.retry_ms = retry_ms or int(os.getenv("SSE_RETRY_MS", 3000))
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            # no-transform: proxies must not buffer or re-encode the stream
+            "Cache-Control": "no-cache, no-transform",
+            "X-Accel-Buffering": "no",  # nginx: disable proxy buffering for this response
+            "Vary": "Accept-Encoding",
+        }
+        if self.compress:
+            headers["Content-Encoding"] = "gzip"
+        return headers
+
+    def _drain(self) -> str:
+        """Returns every logged event after `self.since` as SSE text, advancing `self.since`."""
+        log = self.manager.event_log
+        chunks = []
+        while True:
+            events, first = log.read_since(self.task_id, self.since, limit=REPLAY_CHUNK_SIZE)
+            if first > self.since + 1:
+                gap = {"type": "gap", "task_id": self.task_id, "from_seq": self.since + 1, "to_seq": first - 1}
+                chunks.append(format_event(json.dumps(gap)))
+                self.since = first - 1
+            if not events:
+                break
+            for event in events:
+                if self.events is None or event.get("type") in self.events:
+                    chunks.append(format_event(json.dumps(event), event["seq"]))
+                    SSE_EVENTS_SENT.inc()
+            self.since = events[-1]["seq"]
+        return "".join(chunks)
+
+    def _finished(self) -> bool:
+        return self.manager.event_log.is_sealed(self.task_id) and self.since >= self.manager.event_log.last_seq(self.task_id)
+
+    async def _text(self) -> AsyncIterator[str]:
+        yield f"retry: {self.retry_ms}\n\n"
+        while True:
+            text = self._drain()
+            if text:
+                yield text
+            if self._finished():
+                yield format_event(json.dumps({"type": "end", "task_id": self.task_id}))
+                return
+            if self.manager.event_log.last_seq(self.task_id) > self.since:
+                continue  # Flushed while the last text was being written: its wakeup is already gone
+            if not await self.manager.wait_for_task_events(self.task_id, self.heartbeat):
+                yield ": keepalive\n\n"
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        TaskEventStream.open_streams += 1
+        try:
+            if not self.compress:
+                async for text in self._text():
+                    yield text.encode("utf-8")
+                return
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + GZIP_WINDOW_BITS, GZIP_MEM_LEVEL)
+            async for text in self._text():
+                # Sync flush after every write so events aren't held in the compressor
+                yield compressor.compress(text.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
+        finally:
+            TaskEventStream.open_streams -= 1
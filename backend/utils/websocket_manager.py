@@ -1,51 +1,509 @@
 # backend/utils/websocket_manager.py
 from fastapi import WebSocket
-from typing import List, Dict, Any
+from collections import deque
+from typing import Callable, Deque, Dict, Any, FrozenSet, Iterable, List, Optional, Tuple, Union
 import json
 import asyncio
+import os
+import time
+from backend.utils.event_bus import EventBus, create_event_bus
+from backend.utils.event_log import EventLog
+from backend.utils.metrics import WS_FRAMES_DROPPED, WS_FRAMES_SENT, WS_SEND_LATENCY
+from backend.utils.logger import get_logger
+
+try:
+    import msgpack  # Optional: enables the binary `msgpack` frame encoding
+except ImportError:
+    msgpack = None
+
+logger = get_logger("websocket")
+
+# Maximum number of events per replay frame sent to a resuming client
+REPLAY_CHUNK_SIZE = 500
+# task_status values after which a task's event log is sealed
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# Frame encodings a client can ask for with `/ws?encoding=...`
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return (ENCODING_JSON, ENCODING_MSGPACK) if msgpack is not None else (ENCODING_JSON,)
+
+
+def encode_frame(payload: Any, encoding: str = ENCODING_JSON) -> Union[str, bytes]:
+    """Serializes a frame: JSON text, or msgpack bytes for binary clients."""
+    if encoding == ENCODING_MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload)
+
+
+class PendingBatch:
+    """Task events waiting to be flushed as one frame, with their JSON kept for reuse."""
 
-class WebSocketManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.events: List[Dict[str, Any]] = []
+        self.texts: List[str] = []
+        self.size = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class TaskReaders:
+    """Streaming readers (e.g. SSE) waiting for one task's next events; they all share one future."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.waiter: asyncio.Future = loop.create_future()
+        self.count = 0
+
+
+class OverflowPolicy:
+    """What a connection does when its outbound queue is full."""
+    DROP_OLDEST = "drop_oldest"  # Discard the oldest queued message
+    # Replace the queued message of the same type and task (latest wins), else drop oldest.
+    # Batch frames count as one type per combination of event types they carry.
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"  # Close the slow connection
+
+    ALL = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+
+class ClientConnection:
+    """
+    A WebSocket plus its bounded outbound queue and the writer task draining it.
+
+    Producers only ever append to the queue, so a stalled client never delays
+    delivery to anyone else; it only fills its own queue, at which point the
+    overflow policy applies. When messages are dropped the client is sent a
+    `dropped` notice with the count before the next message.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue_size: int,
+        overflow_policy: str,
+        send_timeout: float,
+        on_dead: Callable[["ClientConnection"], None],
+        encoding: str = ENCODING_JSON,
+    ):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.on_dead = on_dead
+        self.queue: Deque[Tuple[Optional[str], Union[str, bytes]]] = deque()  # (coalesce key, encoded frame)
+        self.dropped = 0
+        self.closed = False
+        # Channel (task ID or "*") -> event types wanted, None meaning all types
+        self.subscriptions: Dict[str, Optional[FrozenSet[str]]] = {}
+        self._wakeup = asyncio.Event()
+        self.writer = asyncio.create_task(self._writer())
+
+    def enqueue(self, frame: Union[str, bytes], key: Optional[str] = None):
+        """Queues an encoded frame without blocking, applying the overflow policy if full."""
+        if self.closed:
+            return
+        if len(self.queue) >= self.max_queue_size:
+            if self.overflow_policy == OverflowPolicy.DISCONNECT:
+                logger.warning("ws_slow_client_disconnected", client=self.websocket.client, queued=len(self.queue))
+                self.close(code=1013)  # Try again later
+                return
+            self.dropped += 1
+            WS_FRAMES_DROPPED.inc()
+            if not self._coalesce(key):
+                self.queue.popleft()
+        self.queue.append((key, frame))
+        self._wakeup.set()
+
+    def _coalesce(self, key: Optional[str]) -> bool:
+        """Removes the queued message superseded by a new one with the same key."""
+        if self.overflow_policy != OverflowPolicy.COALESCE or key is None:
+            return False
+        for index in range(len(self.queue) - 1, -1, -1):
+            if self.queue[index][0] == key:
+                del self.queue[index]
+                return True
+        return False
+
+    async def _writer(self):
+        try:
+            while True:
+                while not self.queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                if self.dropped:
+                    dropped, self.dropped = self.dropped, 0
+                    await self._send(encode_frame({"type": "dropped", "count": dropped}, self.encoding))
+                _, frame = self.queue.popleft()
+                await self._send(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("ws_send_failed", client=self.websocket.client, error=repr(e))
+            self.close(code=1011)
+
+    async def _send(self, frame: Union[str, bytes]):
+        send = self.websocket.send_bytes(frame) if isinstance(frame, bytes) else self.websocket.send_text(frame)
+        started = time.perf_counter()
+        await asyncio.wait_for(send, timeout=self.send_timeout)
+        WS_SEND_LATENCY.observe(time.perf_counter() - started)
+        WS_FRAMES_SENT.inc()
+
+    def close(self, code: int = 1000):
+        """Stops the writer, closes the socket and removes the connection from its manager."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if asyncio.current_task() is not self.writer:
+            self.writer.cancel()
+        self.on_dead(self)
+        asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass  # Already closed by the peer
+
+
+# Channel matching every task's events
+ALL_TASKS = "*"
 
-    async def connect(self, websocket: WebSocket):
-        """Accepts a new WebSocket connection."""
+
+class WebSocketManager:
+    """
+    Fans server events out to WebSocket clients.
+
+    Events carrying a `task_id` are only delivered to clients subscribed to that
+    task (or to "*"), optionally filtered by event type; events without a task
+    ID go to every client. Clients manage subscriptions by sending JSON control
+    messages on the socket:
+
+        {"action": "subscribe", "task_id": "<id or *>", "events": ["aider_log", ...], "since": 42}
+        {"action": "unsubscribe", "task_id": "<id or *>"}
+
+    `events` is optional and defaults to all event types. Task events are
+    recorded in an EventLog and carry a per-task `seq`; a client that
+    reconnects (or was sent a `dropped` notice) subscribes with `since` set to
+    the last seq it saw and first receives the missed events as `replay`
+    frames, followed by live events with no gap or duplicate.
+
+    Task events are batched: events for the same task arriving within
+    `batch_window` seconds (or up to `batch_max_bytes`) are sent as a single
+    `{"type": "batch", "task_id": ..., "events": [...]}` frame. Each event is
+    serialized once, and each batch frame is built once per distinct event
+    filter/encoding and shared by all clients that need it. A batch holding a
+    single event is sent as the bare event.
+
+    Broadcasts go through an EventBus (backend/utils/event_bus.py): in-process
+    by default, or shared between processes so that every front-end sees every
+    task's events. Each process records what the bus delivers in its own event
+    log; the bus delivers in the same order everywhere, so `seq` numbers agree
+    between front-ends that were up for the whole task.
+
+    Streaming HTTP readers (see backend/utils/sse.py) read the same event log:
+    they call `wait_for_task_events` and are woken when a task's batch is
+    flushed, then fetch what they missed from the log themselves.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: Optional[int] = None,
+        overflow_policy: Optional[str] = None,
+        send_timeout: Optional[float] = None,
+        event_log: Optional[EventLog] = None,
+        batch_window: Optional[float] = None,
+        batch_max_bytes: Optional[int] = None,
+        event_bus: Optional[EventBus] = None,
+    ):
+        """
+        Args:
+            max_queue_size: Outbound messages buffered per client (env WS_SEND_QUEUE_SIZE).
+            overflow_policy: One of OverflowPolicy.ALL (env WS_OVERFLOW_POLICY).
+            send_timeout: Seconds a single send may take before the client is considered dead (env WS_SEND_TIMEOUT).
+            event_log: Replayable per-task event log (defaults to one configured from the environment).
+            batch_window: Seconds task events are held to be batched, 0 to disable (env WS_BATCH_WINDOW_MS, in ms).
+            batch_max_bytes: Serialized size at which a batch is flushed early (env WS_BATCH_MAX_BYTES).
+            event_bus: Bus broadcasts travel through (defaults to the one selected by EVENT_BUS_URL).
+        """
+        self.max_queue_size = max_queue_size or int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+        self.overflow_policy = overflow_policy or os.getenv("WS_OVERFLOW_POLICY", OverflowPolicy.DROP_OLDEST)
+        if self.overflow_policy not in OverflowPolicy.ALL:
+            raise ValueError(f"Unknown WebSocket overflow policy: {self.overflow_policy}")
+        self.send_timeout = send_timeout or float(os.getenv("WS_SEND_TIMEOUT", 30))
+        self.event_log = event_log or EventLog()
+        self.batch_window = batch_window if batch_window is not None else float(os.getenv("WS_BATCH_WINDOW_MS", 20)) / 1000
+        self.batch_max_bytes = batch_max_bytes or int(os.getenv("WS_BATCH_MAX_BYTES", 64 * 1024))
+        self._pending: Dict[str, PendingBatch] = {}
+        self._readers: Dict[str, TaskReaders] = {}
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # Channel -> subscribed connections and their event filter (None = all)
+        self.subscribers: Dict[str, Dict[ClientConnection, Optional[FrozenSet[str]]]] = {}
+        # Event loop that owns the connections; set on startup so crews running
+        # in worker threads can schedule broadcasts onto it.
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.event_bus = event_bus or create_event_bus()
+        self.event_bus.bind(self._dispatch)
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Records the server event loop used by `broadcast_threadsafe`."""
+        self.loop = loop
+
+    async def start(self):
+        """Binds the running loop and connects the event bus. Call once on startup."""
+        self.bind_loop(asyncio.get_running_loop())
+        await self.event_bus.start()
+
+    async def stop(self):
+        await self.event_bus.stop()
+
+    async def connect(self, websocket: WebSocket, encoding: str = ENCODING_JSON):
+        """
+        Accepts a new WebSocket connection.
+        Args:
+            encoding: Frame encoding for this client, one of `available_encodings()`.
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"New WebSocket connection: {websocket.client}")
+        self.active_connections[websocket] = ClientConnection(
+            websocket,
+            max_queue_size=self.max_queue_size,
+            overflow_policy=self.overflow_policy,
+            send_timeout=self.send_timeout,
+            on_dead=self._prune,
+            encoding=encoding,
+        )
+        logger.info("ws_connected", client=websocket.client, encoding=encoding)
         # Optionally send a welcome message or initial state
         # await websocket.send_json({"type": "status", "message": "Connected"})
 
     def disconnect(self, websocket: WebSocket):
         """Removes a WebSocket connection."""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            print(f"WebSocket connection closed: {websocket.client}")
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None:
+            connection.closed = True
+            connection.writer.cancel()
+            self._unsubscribe_all(connection)
+            logger.info("ws_disconnected", client=websocket.client)
+
+    def _prune(self, connection: ClientConnection):
+        """Drops a connection whose writer failed or that overflowed under the disconnect policy."""
+        if self.active_connections.get(connection.websocket) is connection:
+            del self.active_connections[connection.websocket]
+            self._unsubscribe_all(connection)
+            logger.info("ws_pruned", client=connection.websocket.client)
+
+    def subscribe(self, websocket: WebSocket, task_id: str, events: Optional[Iterable[str]] = None):
+        """Subscribes a connection to a task's events (or every task's with "*"), optionally only some event types."""
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return
+        event_filter = frozenset(events) if events else None
+        connection.subscriptions[task_id] = event_filter
+        self.subscribers.setdefault(task_id, {})[connection] = event_filter
+
+    def unsubscribe(self, websocket: WebSocket, task_id: str):
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return
+        connection.subscriptions.pop(task_id, None)
+        self._remove_subscriber(task_id, connection)
+
+    def _remove_subscriber(self, task_id: str, connection: ClientConnection):
+        channel = self.subscribers.get(task_id)
+        if channel is not None:
+            channel.pop(connection, None)
+            if not channel:
+                del self.subscribers[task_id]
+
+    def _unsubscribe_all(self, connection: ClientConnection):
+        for task_id in connection.subscriptions:
+            self._remove_subscriber(task_id, connection)
+        connection.subscriptions.clear()
+
+    async def handle_client_message(self, websocket: WebSocket, data: str) -> bool:
+        """
+        Handles a subscription control message from a client.
+        Returns False if `data` is not a control message so the caller can treat it otherwise.
+        """
+        try:
+            request = json.loads(data)
+        except ValueError:
+            return False
+        if not isinstance(request, dict) or request.get("action") not in ("subscribe", "unsubscribe"):
+            return False
+        task_id = request.get("task_id")
+        if not isinstance(task_id, str) or not task_id:
+            await self.send_personal_message({"type": "error", "message": "task_id is required"}, websocket)
+            return True
+        if request["action"] == "subscribe":
+            events = request.get("events")
+            self.subscribe(websocket, task_id, events)
+            await self.send_personal_message({"type": "subscribed", "task_id": task_id, "events": events}, websocket)
+            since = request.get("since")
+            if isinstance(since, int) and task_id != ALL_TASKS:
+                # No await between subscribing and queueing the replay, so no
+                # live event can slip in between or be delivered twice.
+                self._replay(websocket, task_id, since, events)
+        else:
+            self.unsubscribe(websocket, task_id)
+            await self.send_personal_message({"type": "unsubscribed", "task_id": task_id}, websocket)
+        return True
+
+    def _replay(self, websocket: WebSocket, task_id: str, since: int, events: Optional[Iterable[str]] = None):
+        """Queues a task's events after `since` for one connection, as chunked `replay` frames."""
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return
+        missed, first = self.event_log.read_since(task_id, since)
+        # Events still waiting in an unflushed batch are delivered by the flush
+        pending = self._pending.get(task_id)
+        if pending is not None:
+            pending_from = pending.events[0]["seq"]
+            missed = [event for event in missed if event["seq"] < pending_from]
+        if first > since + 1:
+            gap = {"type": "gap", "task_id": task_id, "from_seq": since + 1, "to_seq": first - 1}
+            connection.enqueue(encode_frame(gap, connection.encoding))
+        if events:
+            missed = [event for event in missed if event.get("type") in events]
+        for start in range(0, len(missed), REPLAY_CHUNK_SIZE):
+            chunk = missed[start:start + REPLAY_CHUNK_SIZE]
+            connection.enqueue(encode_frame({"type": "replay", "task_id": task_id, "events": chunk}, connection.encoding))
+
+    def _task_recipients(self, task_id: str) -> Dict[ClientConnection, Optional[FrozenSet[str]]]:
+        """
+        Connections subscribed to a task (directly or via "*") and their combined
+        event filter; cost scales with subscribers, not total connections.
+        """
+        recipients: Dict[ClientConnection, Optional[FrozenSet[str]]] = {}
+        for channel in (task_id, ALL_TASKS):
+            for connection, event_filter in self.subscribers.get(channel, {}).items():
+                if connection in recipients:
+                    previous = recipients[connection]
+                    event_filter = None if previous is None or event_filter is None else previous | event_filter
+                recipients[connection] = event_filter
+        return recipients
+
+    @staticmethod
+    def _coalesce_key(message: Dict[str, Any]) -> str:
+        return f"{message.get('type')}:{message.get('task_id')}"
 
     async def broadcast_message(self, message: Dict[str, Any]):
-        """Sends a JSON message to all active connections."""
-        print(f"Broadcasting message: {message}")
-        message_json = json.dumps(message)
-        # Create a list of tasks for sending messages concurrently
-        send_tasks = [conn.send_text(message_json) for conn in self.active_connections]
-        # Wait for all messages to be sent (or handle exceptions)
-        results = await asyncio.gather(*send_tasks, return_exceptions=True)
-        for result, conn in zip(results, self.active_connections):
-            if isinstance(result, Exception):
-                print(f"Error sending message to {conn.client}: {result}")
-                # Optionally remove problematic connections
-                # self.disconnect(conn) # Be careful with modifying list during iteration
+        """
+        Publishes a message on the event bus, which delivers it to this and
+        (with a shared bus) every other process's manager.
+        """
+        await self.event_bus.publish(message)
+
+    async def _dispatch(self, message: Dict[str, Any]):
+        """
+        Queues a message delivered by the bus for every interested connection.
+        Task events are recorded in the event log and batched (see class
+        docstring); other messages go to every connection right away. Nothing
+        is awaited on a client, so slow clients can't hold up the rest.
+        """
+        logger.debug("broadcast", sample=message.get("type"), type=message.get("type"), task_id=message.get("task_id"), payload=message)
+        task_id = message.get("task_id")
+        if task_id is None:
+            frames: Dict[str, Union[str, bytes]] = {}
+            for connection in list(self.active_connections.values()):
+                if connection.encoding not in frames:
+                    frames[connection.encoding] = encode_frame(message, connection.encoding)
+                connection.enqueue(frames[connection.encoding], self._coalesce_key(message))
+            return
+        message = self.event_log.append(task_id, message)
+        if message.get("type") == "task_status" and message.get("status") in FINISHED_STATUSES:
+            self.event_log.seal(task_id)
+        self._add_to_batch(task_id, message)
+
+    def _add_to_batch(self, task_id: str, message: Dict[str, Any]):
+        batch = self._pending.get(task_id)
+        if batch is None:
+            batch = self._pending[task_id] = PendingBatch()
+        text = json.dumps(message)
+        batch.events.append(message)
+        batch.texts.append(text)
+        batch.size += len(text)
+        if self.batch_window <= 0 or batch.size >= self.batch_max_bytes:
+            self._flush_batch(task_id)
+        elif batch.timer is None:
+            batch.timer = asyncio.get_running_loop().call_later(self.batch_window, self._flush_batch, task_id)
+
+    def _flush_batch(self, task_id: str):
+        """Sends a task's pending events, building each distinct frame only once."""
+        batch = self._pending.pop(task_id, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        frames: Dict[Tuple[Optional[FrozenSet[str]], str], Optional[Tuple[Optional[str], Union[str, bytes]]]] = {}
+        for connection, event_filter in self._task_recipients(task_id).items():
+            cache_key = (event_filter, connection.encoding)
+            if cache_key not in frames:
+                frames[cache_key] = self._build_frame(task_id, batch, event_filter, connection.encoding)
+            frame = frames[cache_key]
+            if frame is not None:
+                connection.enqueue(frame[1], frame[0])
+        readers = self._readers.pop(task_id, None)
+        if readers is not None:
+            readers.waiter.set_result(None)
+
+    async def wait_for_task_events(self, task_id: str, timeout: float) -> bool:
+        """
+        Waits until events for `task_id` are flushed or `timeout` seconds pass;
+        returns False on timeout. Nothing is queued per reader: all readers of a
+        task await one shared future and then read `event_log` from their own seq.
+        """
+        readers = self._readers.get(task_id)
+        if readers is None:
+            readers = self._readers[task_id] = TaskReaders(asyncio.get_running_loop())
+        readers.count += 1
+        try:
+            done, _ = await asyncio.wait((readers.waiter,), timeout=timeout)
+            return bool(done)
+        finally:
+            readers.count -= 1
+            if readers.count == 0 and self._readers.get(task_id) is readers:
+                del self._readers[task_id]
+
+    def _build_frame(
+        self, task_id: str, batch: PendingBatch, event_filter: Optional[FrozenSet[str]], encoding: str
+    ) -> Optional[Tuple[Optional[str], Union[str, bytes]]]:
+        """Returns (coalesce key, encoded frame) for the events passing `event_filter`, or None if none do."""
+        indexes = [i for i, event in enumerate(batch.events) if event_filter is None or event.get("type") in event_filter]
+        if not indexes:
+            return None
+        if len(indexes) == 1:
+            event = batch.events[indexes[0]]
+            frame = batch.texts[indexes[0]] if encoding == ENCODING_JSON else encode_frame(event, encoding)
+            return self._coalesce_key(event), frame
+        events = [batch.events[i] for i in indexes]
+        # A newer batch of the same task and event types supersedes a queued one
+        types = ",".join(sorted({str(event.get("type")) for event in events}))
+        key = f"batch[{types}]:{task_id}"
+        if encoding == ENCODING_JSON:
+            # Splice the already-serialized events instead of re-encoding them
+            body = ",".join(batch.texts[i] for i in indexes)
+            return key, f'{{"type": "batch", "task_id": {json.dumps(task_id)}, "events": [{body}]}}'
+        return key, encode_frame({"type": "batch", "task_id": task_id, "events": events}, encoding)
+
+    def broadcast_threadsafe(self, message: Dict[str, Any]):
+        """
+        Schedules `broadcast_message` on the server loop from a worker thread.
+        Returns a concurrent.futures.Future, or None if no loop is bound.
+        """
+        if self.loop is None or self.loop.is_closed():
+            return None
+        return asyncio.run_coroutine_threadsafe(self.broadcast_message(message), self.loop)
 
     async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket):
-        """Sends a JSON message to a specific WebSocket connection."""
-        if websocket in self.active_connections:
-            print(f"Sending personal message to {websocket.client}: {message}")
-            try:
-                await websocket.send_json(message)
-            except Exception as e:
-                print(f"Error sending personal message to {websocket.client}: {e}")
-                # Optionally disconnect on error
-                # self.disconnect(websocket)
+        """Queues a JSON message for a specific WebSocket connection."""
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            logger.debug("personal_message", client=websocket.client, type=message.get("type"), payload=message)
+            connection.enqueue(encode_frame(message, connection.encoding), self._coalesce_key(message))
 
 # --- Example Usage (Conceptual) ---
 # This manager would typically be instantiated once in your FastAPI app
@@ -0,0 +1,229 @@
+# backend/utils/workspace_manager.py
+import os
+import subprocess
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class WorkspaceError(Exception):
+    """Raised when a git command needed to manage a workspace fails."""
+
+
+class MergeConflictError(WorkspaceError):
+    """Raised when a workspace's commits can't be rebased onto the target branch."""
+
+    def __init__(self, message: str, files: Optional[List[str]] = None):
+        super().__init__(message)
+        self.files = files or []
+
+
+class TargetCheckoutError(WorkspaceError):
+    """
+    Raised when the main checkout can't take a workspace's commits: it has
+    uncommitted changes, or its branch moved on outside the manager. Unlike a
+    conflict, redoing the job's work does not help until the checkout is fixed.
+    """
+
+
+def run_git(cwd: str, *args: str, check: bool = True) -> subprocess.CompletedProcess:
+    process = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    if check and process.returncode != 0:
+        raise WorkspaceError(f"git {' '.join(args)} failed: {process.stderr.strip() or process.stdout.strip()}")
+    return process
+
+
+class Workspace:
+    """A git worktree slot checked out for one job."""
+
+    def __init__(self, slot: int, path: str, branch: str):
+        self.slot = slot
+        self.path = path
+        self.branch = branch
+        self.job_id: Optional[str] = None
+        self.target_branch: Optional[str] = None
+        self.base_commit: Optional[str] = None
+
+
+class WorkspaceManager:
+    """
+    Gives each concurrent Aider job its own git worktree of the project repo.
+
+    Worktrees share the repository's object store, so creating one is cheap.
+    They are kept as a fixed set of reusable slots under `worktrees_dir`, each
+    on its own `codingorg/slot-N` branch, so their paths stay stable and the
+    warm Aider worker pool (keyed by project root) keeps serving them. A slot is
+    reset to the tip of the target branch when acquired, and cleaned when
+    released. `merge_back` rebases a job's commits onto the target branch and
+    fast-forwards it, reporting conflicting files instead of merging them.
+    """
+
+    def __init__(self, repo_root: str, worktrees_dir: Optional[str] = None, max_slots: Optional[int] = None):
+        """
+        Args:
+            repo_root: The main checkout jobs branch from and merge back into.
+            worktrees_dir: Where slots live (env WORKTREES_DIR, default <repo_root>/.codingorg/worktrees).
+            max_slots: Maximum concurrent workspaces (env WORKTREE_SLOTS).
+        """
+        self.repo_root = os.path.abspath(repo_root)
+        self.worktrees_dir = os.path.abspath(
+            worktrees_dir or os.getenv("WORKTREES_DIR") or os.path.join(self.repo_root, ".codingorg", "worktrees")
+        )
+        self.max_slots = max_slots or int(os.getenv("WORKTREE_SLOTS", 8))
+        self.slots: Dict[int, Workspace] = {}
+        self._free: List[int] = []
+        self._cond = threading.Condition()
+        self._merge_lock = threading.Lock()
+        run_git(self.repo_root, "worktree", "prune", check=False)
+        self._exclude_worktrees_dir()
+
+    def _exclude_worktrees_dir(self):
+        """Keeps slots inside the repo from showing up as untracked files in the main checkout."""
+        relative = os.path.relpath(self.worktrees_dir, self.repo_root)
+        if relative.startswith(".."):
+            return
+        git_dir = run_git(self.repo_root, "rev-parse", "--git-common-dir").stdout.strip()
+        exclude_path = os.path.join(self.repo_root, git_dir, "info", "exclude")
+        pattern = "/" + relative.split(os.sep)[0] + "/"
+        existing = open(exclude_path).read().splitlines() if os.path.exists(exclude_path) else []
+        if pattern not in existing:
+            os.makedirs(os.path.dirname(exclude_path), exist_ok=True)
+            with open(exclude_path, "a") as exclude:
+                exclude.write(f"\n{pattern}\n")
+
+    @staticmethod
+    def is_git_repo(path: str) -> bool:
+        return run_git(path, "rev-parse", "--is-inside-work-tree", check=False).returncode == 0
+
+    def current_branch(self) -> str:
+        branch = run_git(self.repo_root, "symbolic-ref", "--quiet", "--short", "HEAD", check=False).stdout.strip()
+        if not branch:
+            raise WorkspaceError(f"{self.repo_root} has a detached HEAD; no branch to merge workspaces into")
+        return branch
+
+    def acquire(self, job_id: str, timeout: Optional[float] = None) -> Workspace:
+        """Checks out a free slot at the tip of the current branch, creating one if below `max_slots`."""
+        with self._cond:
+            while not self._free and len(self.slots) >= self.max_slots:
+                if not self._cond.wait(timeout):
+                    raise WorkspaceError(f"No free workspace within {timeout}s")
+            if self._free:
+                workspace = self.slots[self._free.pop()]
+            else:
+                slot = len(self.slots)
+                workspace = self.slots[slot] = Workspace(
+                    slot, os.path.join(self.worktrees_dir, f"slot-{slot}"), f"codingorg/slot-{slot}"
+                )
+        try:
+            self._prepare(workspace)
+        except Exception:
+            self._release_slot(workspace)
+            raise
+        workspace.job_id = job_id
+        return workspace
+
+    def _prepare(self, workspace: Workspace):
+        workspace.target_branch = self.current_branch()
+        workspace.base_commit = run_git(self.repo_root, "rev-parse", workspace.target_branch).stdout.strip()
+        if not os.path.isdir(workspace.path):
+            os.makedirs(self.worktrees_dir, exist_ok=True)
+            run_git(self.repo_root, "worktree", "add", "--force", "-B", workspace.branch, workspace.path, workspace.base_commit)
+        else:
+            run_git(workspace.path, "checkout", "--force", "-B", workspace.branch, workspace.base_commit)
+            run_git(workspace.path, "clean", "-fdq")
+
+    def merge_back(self, workspace: Workspace, message: Optional[str] = None) -> Optional[str]:
+        """
+        Commits any uncommitted changes in the workspace, rebases them onto the
+        current tip of the target branch and fast-forwards the target branch.
+        Returns the new target commit, or None if the job changed nothing.
+        Raises:
+            MergeConflictError: If the rebase conflicts; the target branch is left untouched.
+            TargetCheckoutError: If the target branch is checked out in the main checkout
+                and that has uncommitted changes or can't be fast-forwarded.
+        """
+        path = workspace.path
+        if run_git(path, "status", "--porcelain").stdout.strip():
+            run_git(path, "add", "-A")
+            run_git(path, "commit", "-q", "-m", message or f"codingorg: changes for {workspace.job_id}")
+        if run_git(path, "rev-parse", "HEAD").stdout.strip() == workspace.base_commit:
+            return None
+
+        with self._merge_lock:  # Serialize rebase + fast-forward against other jobs
+            target = workspace.target_branch
+            checked_out = run_git(self.repo_root, "symbolic-ref", "--quiet", "--short", "HEAD", check=False).stdout.strip()
+            if checked_out == target:
+                dirty = run_git(self.repo_root, "status", "--porcelain", "--untracked-files=no").stdout.split("\n")
+                files = [line[3:] for line in dirty if line.strip()]
+                if files:
+                    raise TargetCheckoutError(
+                        f"{self.repo_root} has uncommitted changes; commit or stash them to merge {workspace.job_id}: "
+                        + ", ".join(files)
+                    )
+            rebase = run_git(path, "rebase", target, check=False)
+            if rebase.returncode != 0:
+                files = run_git(path, "diff", "--name-only", "--diff-filter=U", check=False).stdout.split()
+                run_git(path, "rebase", "--abort", check=False)
+                raise MergeConflictError(f"Changes from {workspace.job_id} conflict with {target}", files)
+            new_commit = run_git(path, "rev-parse", "HEAD").stdout.strip()
+            if checked_out == target:
+                merge = run_git(self.repo_root, "merge", "--ff-only", "-q", workspace.branch, check=False)
+                if merge.returncode != 0:
+                    moved = run_git(self.repo_root, "merge-base", "--is-ancestor", target, new_commit, check=False).returncode != 0
+                    reason = f"{target} moved on during the merge" if moved else merge.stderr.strip()
+                    raise TargetCheckoutError(f"Could not fast-forward {target} in {self.repo_root}: {reason}")
+            else:
+                old_commit = run_git(self.repo_root, "rev-parse", target).stdout.strip()
+                run_git(self.repo_root, "update-ref", f"refs/heads/{target}", new_commit, old_commit)
+        return new_commit
+
+    def release(self, workspace: Workspace):
+        """Discards anything left in the workspace and returns the slot to the pool."""
+        try:
+            run_git(workspace.path, "reset", "--hard", "-q", check=False)
+            run_git(workspace.path, "clean", "-fdq", check=False)
+        finally:
+            workspace.job_id = None
+            self._release_slot(workspace)
+
+    def _release_slot(self, workspace: Workspace):
+        with self._cond:
+            self._free.append(workspace.slot)
+            self._cond.notify()
+
+    @contextmanager
+    def workspace(self, job_id: str, timeout: Optional[float] = None):
+        """Acquires a workspace for the duration of a block and releases it afterwards."""
+        workspace = self.acquire(job_id, timeout)
+        try:
+            yield workspace
+        finally:
+            self.release(workspace)
+
+    def remove_all(self):
+        """Deletes every idle slot's worktree and branch (e.g. on shutdown)."""
+        with self._cond:
+            for slot in list(self._free):
+                workspace = self.slots.pop(slot)
+                run_git(self.repo_root, "worktree", "remove", "--force", workspace.path, check=False)
+                run_git(self.repo_root, "branch", "-D", workspace.branch, check=False)
+            self._free.clear()
+
+
+# Shared managers, one per repository (None for non-git roots), created on first use
+workspace_managers: Dict[str, Optional[WorkspaceManager]] = {}
+_managers_lock = threading.Lock()
+
+def get_workspace_manager(repo_root: str) -> Optional[WorkspaceManager]:
+    """
+    Returns the WorkspaceManager for a repository, or None when worktree isolation
+    is disabled (env WORKTREES_ENABLED=0) or `repo_root` is not a git repository.
+    """
+    if os.getenv("WORKTREES_ENABLED", "1") != "1":
+        return None
+    repo_root = os.path.abspath(repo_root)
+    with _managers_lock:
+        if repo_root not in workspace_managers:
+            is_repo = WorkspaceManager.is_git_repo(repo_root)
+            workspace_managers[repo_root] = WorkspaceManager(repo_root) if is_repo else None
+        return workspace_managers[repo_root]
@@ -0,0 +1,107 @@
+# backend/worker.py
+"""
+Crew executor without the HTTP/WebSocket API, for scaling crews separately
+from front-ends. Claims jobs from the shared queue (JOB_QUEUE_URL, defaulting
+to EVENT_BUS_URL) and publishes their events on the shared event bus:
+
+    EVENT_BUS_URL=redis://localhost:6379/0 python -m backend.worker
+
+Front-ends started with NODE_ROLE=api accept tasks and serve events without
+running crews themselves.
+"""
+import asyncio
+import os
+import signal
+import time
+
+from dotenv import load_dotenv
+
+from backend.utils.checkpoint_store import get_checkpoint_store
+from backend.utils.event_bus import InProcessEventBus, create_event_bus
+from backend.utils.job_manager import Job, JobManager, create_job_manager
+from backend.utils.logger import get_logger, setup_logging, shutdown_logging
+from backend.utils.websocket_manager import WebSocketManager
+
+logger = get_logger("worker")
+
+
+def prewarm_crew():
+    """
+    Imports CrewAI and builds the shared LLM clients. Crew modules are imported
+    on first use so the API starts without them; calling this ahead of time
+    (in a thread) takes that cost off the first task.
+    """
+    started = time.perf_counter()
+    try:
+        from backend.agents.registry import get_agent_registry
+        import backend.crew.task_orchestrator  # noqa: F401
+
+        get_agent_registry().warm_up()
+    except Exception as e:
+        # The first crew run retries and reports the error on its task
+        logger.warning("crew_prewarm_failed", error=repr(e))
+        return
+    logger.info("crew_prewarmed", seconds=round(time.perf_counter() - started, 3))
+
+
+def make_job_runner(websocket_manager: WebSocketManager):
+    """Returns the JobManager runner executing a job's crew, streaming its events to `websocket_manager`."""
+
+    def run_job(job: Job):
+        """Runs a queued job's crew. Executed in a JobManager worker thread."""
+        from backend.crew.task_orchestrator import TaskOrchestrator  # Loads CrewAI on first run
+
+        orchestrator = TaskOrchestrator(websocket_manager=websocket_manager)
+        try:
+            # Raises CrewExecutionError on failure, which the JobManager records as failed
+            return orchestrator.run_crew(job.prompt, task_id=job.job_id, cancel_event=job.cancel_event, priority=job.priority)
+        finally:
+            store = get_checkpoint_store()
+            if job.interrupted and store is not None:
+                store.mark_interrupted(job.job_id)  # Stopped by shutdown, not by the user: resume on next start
+
+    return run_job
+
+
+async def resume_interrupted_runs(job_manager: JobManager):
+    """Requeues checkpointed runs that were still running when the server last stopped."""
+    store = await asyncio.to_thread(get_checkpoint_store)
+    if store is None or os.getenv("CHECKPOINT_RESUME_ON_START", "1") != "1":
+        return
+    for run in await asyncio.to_thread(store.interrupted_runs):
+        try:
+            await job_manager.submit(run["prompt"], priority=run["priority"], job_id=run["task_id"])
+        except ValueError:
+            continue  # Still queued or running under another process
+        except asyncio.QueueFull:
+            logger.warning("task_resume_skipped", task_id=run["task_id"], reason="queue full")
+            break
+        logger.info("task_resumed", task_id=run["task_id"], reason="restart")
+
+
+async def main():
+    load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+    setup_logging()
+    # Nothing connects to a worker, so it publishes events without subscribing
+    manager = WebSocketManager(event_bus=create_event_bus(subscribe=False))
+    job_manager = create_job_manager(make_job_runner(manager), websocket_manager=manager)
+    if isinstance(manager.event_bus, InProcessEventBus) or type(job_manager) is JobManager:
+        raise SystemExit("backend.worker needs a shared queue and bus: set EVENT_BUS_URL (or JOB_QUEUE_URL) to a redis:// URL")
+    await manager.start()
+    await asyncio.to_thread(prewarm_crew)  # Nothing to serve until crews can run: load them first
+    await job_manager.start()
+    await asyncio.to_thread(get_checkpoint_store)
+    await resume_interrupted_runs(job_manager)
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    logger.info("worker_started", node=getattr(job_manager, "node_id", None))
+    await stopped.wait()
+    await job_manager.stop()
+    await manager.stop()
+    shutdown_logging()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
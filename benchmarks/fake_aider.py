@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Stand-in for the `aider` CLI used by offline benchmarks (set AIDER_PATH to this
+file and AIDER_POOL_ENABLED=0).
+
+Accepts the arguments AiderTool passes (`--message ... --no-pretty --yes-always
+[files]`), changes nothing on disk, and writes output shaped like a real Aider
+session: file additions, SEARCH/REPLACE blocks, a commit line and a test summary.
+Volume and pacing come from the environment:
+
+    FAKE_AIDER_LINES          total stdout lines (default 200)
+    FAKE_AIDER_LINE_BYTES     approximate length of each line (default 80)
+    FAKE_AIDER_LINES_PER_SEC  output rate, 0 for as fast as possible (default 0)
+    FAKE_AIDER_STDERR_EVERY   write every Nth line to stderr, 0 for never (default 0)
+    FAKE_AIDER_EXIT_CODE      exit status (default 0)
+
+Code lines end with a `# ... ts=<unix time>` comment so a benchmark client can
+measure the delay between Aider printing a line and the client receiving it.
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def session_lines(message: str, files: list, count: int, width: int):
+    """Yields `count` lines cycling through the phases of an Aider session."""
+    target = files[0] if files else "bench/part.py"
+    header = [
+        "Aider v0.0.0-bench",
+        "Model: fake-model with diff edit format",
+        f"Added {target} to the chat.",
+        f"> {message[:width]}",
+    ]
+    body = [
+        f"{target}",
+        "<<<<<<< SEARCH",
+        "def handler(request):",
+        "    return None",
+        "=======",
+        "def handler(request):",
+        "    return process(request)",
+        ">>>>>>> REPLACE",
+    ]
+    footer = [
+        f"Applied edit to {target}",
+        "Commit 1a2b3c4 feat: benchmark change",
+        "============================= 12 passed in 0.42s =============================",
+    ]
+    lines = header + body * max(1, (count - len(header) - len(footer)) // len(body) + 1)
+    lines = lines[:max(count - len(footer), 0)] + footer[:count]
+    for index, line in enumerate(lines[:count]):
+        if line.startswith(("    ", "def ")):
+            # Code lines carry the padding and timestamp in a trailing comment
+            pad = max(width - len(line) - 24, 0)
+            line = f"{line}  # {'x' * pad} ts={time.time():.6f}"
+        yield index, line
+
+
+def main():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--message", default="")
+    parser.add_argument("files", nargs="*")
+    args, _ = parser.parse_known_args()
+
+    count = int(os.getenv("FAKE_AIDER_LINES", 200))
+    width = int(os.getenv("FAKE_AIDER_LINE_BYTES", 80))
+    rate = float(os.getenv("FAKE_AIDER_LINES_PER_SEC", 0))
+    stderr_every = int(os.getenv("FAKE_AIDER_STDERR_EVERY", 0))
+    interval = 1.0 / rate if rate > 0 else 0.0
+
+    start = time.monotonic()
+    for index, line in session_lines(args.message, args.files, count, width):
+        stream = sys.stderr if stderr_every and index % stderr_every == stderr_every - 1 else sys.stdout
+        stream.write(line + "\n")
+        stream.flush()
+        if interval:
+            # Pace against the start time so slow writes don't lower the overall rate
+            delay = start + (index + 1) * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    sys.exit(int(os.getenv("FAKE_AIDER_EXIT_CODE", 0)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""
+Stub OpenAI-compatible chat completions server for offline benchmarks.
+
+Point the backend at it with, for example:
+
+    MODEL=openai/fake-model OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=bench
+
+Every reply waits `--latency` seconds (time to first token) and then produces
+`--completion-tokens` tokens at `--tokens-per-second`, streamed as SSE chunks
+when the client asks for `stream`. The content depends on the request:
+
+* planning prompts (asking for a JSON array of steps) get a plan with
+  `--plan-steps` independent steps, each touching its own file;
+* requests offering tools get one call to the first tool, then a final answer
+  once the conversation contains the tool result;
+* anything else gets a final answer padded to the configured token count.
+
+Only the standard library is used so the server can run without the backend's
+dependencies.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER_WORDS = "the change was implemented and verified with unit tests covering edge cases".split()
+
+
+class FakeLLMConfig:
+    def __init__(self, latency: float, tokens_per_second: float, completion_tokens: int, plan_steps: int):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.plan_steps = plan_steps
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count_request(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+
+def _filler(tokens: int) -> str:
+    return " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(max(tokens, 1)))
+
+
+def _prompt_text(messages: list) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):  # Content parts
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def build_reply(body: dict, config: FakeLLMConfig) -> dict:
+    """Returns the assistant message (content and/or tool_calls) for a request."""
+    messages = body.get("messages") or []
+    text = _prompt_text(messages)
+    tools = body.get("tools") or []
+    if tools and not any(message.get("role") == "tool" for message in messages):
+        function = tools[0].get("function", {})
+        properties = function.get("parameters", {}).get("properties", {})
+        arguments = {name: f"Benchmark step: {_filler(12)}" for name in properties} or {"input": "benchmark"}
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": function.get("name", "tool"), "arguments": json.dumps(arguments)},
+            }],
+        }
+    if "JSON array" in text and '"depends_on"' in text:
+        steps = [
+            {"id": f"s{i + 1}", "description": f"Implement part {i + 1}. {_filler(8)}",
+             "files": [f"bench/part_{i + 1}.py"], "depends_on": []}
+            for i in range(config.plan_steps)
+        ]
+        content = f"Thought: I now know the final answer\nFinal Answer: ```json\n{json.dumps(steps)}\n```"
+    else:
+        content = f"Thought: I now know the final answer\nFinal Answer: {_filler(config.completion_tokens)}"
+    return {"role": "assistant", "content": content}
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: FakeLLMConfig  # Set on the handler subclass by `make_server`
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.config.count_request()
+        reply = build_reply(body, self.config)
+        prompt_tokens = len(_prompt_text(body.get("messages") or []).split())
+        completion_tokens = len((reply.get("content") or "").split()) or 20
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        time.sleep(self.config.latency)
+        if body.get("stream"):
+            self._stream(body, reply, completion_id, usage)
+            return
+        if self.config.tokens_per_second > 0:
+            time.sleep(completion_tokens / self.config.tokens_per_second)
+        finish_reason = "tool_calls" if reply.get("tool_calls") else "stop"
+        self._send_json(200, {
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "fake-model"),
+            "choices": [{"index": 0, "message": reply, "finish_reason": finish_reason}],
+            "usage": usage,
+        })
+
+    def _stream(self, body: dict, reply: dict, completion_id: str, usage: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def chunk(delta: dict, finish_reason=None, **extra):
+            payload = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "fake-model"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra,
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0
+        if reply.get("tool_calls"):
+            call = reply["tool_calls"][0]
+            chunk({"role": "assistant", "tool_calls": [{"index": 0, **call}]})
+            chunk({}, "tool_calls")
+        else:
+            chunk({"role": "assistant", "content": ""})
+            for word in reply["content"].split(" "):
+                chunk({"content": word + " "})
+                if delay:
+                    time.sleep(delay)
+            chunk({}, "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self.wfile.write(f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host: str, port: int, config: FakeLLMConfig) -> ThreadingHTTPServer:
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Generation rate (0 = instant).")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="Length of final answers.")
+    parser.add_argument("--plan-steps", type=int, default=2, help="Independent steps in generated plans.")
+    args = parser.parse_args()
+    config = FakeLLMConfig(args.latency, args.tokens_per_second, args.completion_tokens, args.plan_steps)
+    server = make_server(args.host, args.port, config)
+    print(f"Fake LLM server listening on http://{args.host}:{server.server_address[1]}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+Minimal in-memory Redis stand-in for testing the multi-process setup offline.
+
+Point front-ends and workers at it with, for example:
+
+    EVENT_BUS_URL=redis://127.0.0.1:6399/0 NODE_ROLE=api uvicorn backend.main:app
+    EVENT_BUS_URL=redis://127.0.0.1:6399/0 python -m backend.worker
+
+or serve a local socket with `--unix /tmp/codingorg-redis.sock` and use
+unix:///tmp/codingorg-redis.sock. Implements only what the event bus and
+RedisJobManager use: GET, SET (with EX), DEL, INCR/INCRBY, ZADD, ZCARD,
+ZREM, BZPOPMIN, PUBLISH, SUBSCRIBE and UNSUBSCRIBE, plus the connection
+handshake commands (HELLO switches to RESP3, as recent redis-py clients ask
+for). Keys never expire.
+
+Only the standard library is used so the server can run without the backend's
+dependencies.
+"""
+import argparse
+import asyncio
+import itertools
+from typing import Dict, List, Optional, Set
+
+
+class Error(Exception):
+    pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.strings: Dict[str, str] = {}
+        self.zsets: Dict[str, Dict[str, float]] = {}
+        self.channels: Dict[str, Set["Connection"]] = {}
+        self.zset_changed = asyncio.Condition()
+
+    async def serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await Connection(self, reader, writer).run()
+
+    def pop_min(self, keys: List[str]) -> Optional[list]:
+        for key in keys:
+            zset = self.zsets.get(key)
+            if zset:
+                member = min(zset, key=lambda m: (zset[m], m))
+                score = zset.pop(member)
+                return [key, member, Double(score)]
+        return None
+
+
+class Connection:
+    _ids = itertools.count(1)
+
+    def __init__(self, server: FakeRedis, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.id = next(self._ids)
+        self.subscriptions: Set[str] = set()
+        self.protocol = 2
+
+    async def run(self):
+        try:
+            while True:
+                command = await self._read_command()
+                if command is None:
+                    break
+                try:
+                    reply = await self.execute(command[0].upper(), command[1:])
+                except Error as e:
+                    self.writer.write(f"-{e}\r\n".encode())
+                else:
+                    if reply is not NotImplemented:  # Pub/sub commands write their own replies
+                        self.writer.write(encode(reply, self.protocol))
+                await self.writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in self.subscriptions:
+                self.server.channels.get(channel, set()).discard(self)
+            self.writer.close()
+
+    async def _read_command(self) -> Optional[List[str]]:
+        line = await self.reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.decode().split()  # Inline command, e.g. from telnet
+        args = []
+        for _ in range(int(line[1:])):
+            length = int((await self.reader.readline())[1:])
+            args.append((await self.reader.readexactly(length + 2))[:-2].decode())
+        return args
+
+    async def execute(self, name: str, args: List[str]):
+        server = self.server
+        if name == "PING":
+            return Status("PONG")
+        if name == "HELLO":
+            if args and args[0] not in ("2", "3"):
+                raise Error("NOPROTO unsupported protocol version")
+            self.protocol = int(args[0]) if args else self.protocol
+            return {"server": "fake-redis", "version": "7.0.0", "proto": self.protocol, "id": self.id, "mode": "standalone"}
+        if name in ("CLIENT", "SELECT"):
+            return self.id if args and args[0].upper() == "ID" else Status("OK")
+        if name == "GET":
+            return server.strings.get(args[0])
+        if name == "SET":
+            server.strings[args[0]] = args[1]
+            return Status("OK")
+        if name == "DEL":
+            return sum(server.strings.pop(key, None) is not None for key in args)
+        if name in ("INCR", "INCRBY"):
+            value = int(server.strings.get(args[0], 0)) + (int(args[1]) if name == "INCRBY" else 1)
+            server.strings[args[0]] = str(value)
+            return value
+        if name == "ZADD":
+            zset = server.zsets.setdefault(args[0], {})
+            pairs = [(float(args[i]), args[i + 1]) for i in range(1, len(args), 2)]
+            added = sum(member not in zset for _, member in pairs)
+            zset.update((member, score) for score, member in pairs)
+            async with server.zset_changed:
+                server.zset_changed.notify_all()
+            return added
+        if name == "ZCARD":
+            return len(server.zsets.get(args[0], {}))
+        if name == "ZREM":
+            zset = server.zsets.get(args[0], {})
+            return sum(zset.pop(member, None) is not None for member in args[1:])
+        if name == "BZPOPMIN":
+            keys, timeout = args[:-1], float(args[-1])
+            async with server.zset_changed:
+                try:
+                    return await asyncio.wait_for(
+                        server.zset_changed.wait_for(lambda: server.pop_min(keys) or None), timeout or None
+                    )
+                except asyncio.TimeoutError:
+                    return None
+        if name == "PUBLISH":
+            subscribers = list(server.channels.get(args[0], ()))
+            for connection in subscribers:
+                connection.writer.write(encode(Push(["message", args[0], args[1]]), connection.protocol))
+            return len(subscribers)
+        if name in ("SUBSCRIBE", "UNSUBSCRIBE"):
+            channels = args or sorted(self.subscriptions)
+            for channel in channels:
+                if name == "SUBSCRIBE":
+                    self.subscriptions.add(channel)
+                    server.channels.setdefault(channel, set()).add(self)
+                else:
+                    self.subscriptions.discard(channel)
+                    server.channels.get(channel, set()).discard(self)
+                self.writer.write(encode(Push([name.lower(), channel, len(self.subscriptions)]), self.protocol))
+            return NotImplemented
+        raise Error(f"ERR unknown command '{name}'")
+
+
+class Status(str):
+    pass
+
+
+class Double(float):
+    pass
+
+
+class Push(list):
+    """Out-of-band pub/sub message: a push in RESP3, a plain array in RESP2."""
+
+
+def encode(value, protocol: int = 2) -> bytes:
+    resp3 = protocol == 3
+    if value is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(value, Status):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, Double) and resp3:
+        return f",{value!r}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, dict):
+        items = [item for pair in value.items() for item in pair]
+        prefix = f"%{len(value)}" if resp3 else f"*{len(items)}"
+        return f"{prefix}\r\n".encode() + b"".join(encode(item, protocol) for item in items)
+    if isinstance(value, list):
+        prefix = ">" if resp3 and isinstance(value, Push) else "*"
+        return f"{prefix}{len(value)}\r\n".encode() + b"".join(encode(item, protocol) for item in value)
+    data = str(value).encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 6399, unix: Optional[str] = None) -> asyncio.AbstractServer:
+    server = FakeRedis()
+    if unix:
+        return await asyncio.start_unix_server(server.serve, path=unix)
+    return await asyncio.start_server(server.serve, host, port)
+
+
+async def serve(args):
+    server = await start_server(args.host, args.port, args.unix)
+    where = f"unix://{args.unix}" if args.unix else f"redis://{args.host}:{server.sockets[0].getsockname()[1]}/0"
+    print(f"Fake Redis listening on {where}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP.")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+#!/usr/bin/env python
+"""
+Offline benchmark harness for the backend.
+
+Starts the fake LLM server (benchmarks/fake_llm_server.py) in-process and the
+real FastAPI app under uvicorn in a subprocess, configured to use the fake LLM
+and the fake `aider` executable (benchmarks/fake_aider.py), then drives one or
+more scenarios against it:
+
+    start_task  concurrent POST /start_task load; request and end-to-end task latency
+    fanout      one task streaming Aider logs to N WebSocket clients
+    log_stream  one very long Aider log streamed to a single client
+    startup     cold import of backend.main, server start until it answers
+                HTTP, and the first task after it (which may load CrewAI)
+
+Each scenario reports p50/p95/p99 latencies, events per second and the
+server's current and peak RSS. Results can be written as JSON (--output) and
+compared against an earlier run (--baseline) to flag regressions.
+
+Usage (from the repository root):
+
+    python benchmarks/run.py                       # all scenarios, default sizes
+    python benchmarks/run.py fanout --clients 200
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --baseline bench.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from websockets.asyncio.client import connect
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_llm_server import FakeLLMConfig, make_server  # noqa: E402
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FAKE_AIDER = os.path.join(REPO_ROOT, "benchmarks", "fake_aider.py")
+SCENARIOS = ("start_task", "fanout", "log_stream", "startup")
+_TIMESTAMP = re.compile(r"ts=(\d+\.\d+)")
+
+# Run in a fresh interpreter by the startup scenario: import cost of the app alone
+IMPORT_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import backend.main
+print(json.dumps({
+    "import_s": time.perf_counter() - started,
+    "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "crewai_loaded": "crewai" in sys.modules,
+}))
+"""
+
+# Metrics where a higher value is better; every other metric regresses upwards
+HIGHER_IS_BETTER = {"events_per_sec", "tasks_per_sec"}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def latency_summary(prefix: str, seconds: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max of a latency sample, in milliseconds."""
+    as_ms = [s * 1000.0 for s in seconds]
+    return {
+        f"{prefix}_p50_ms": percentile(as_ms, 50),
+        f"{prefix}_p95_ms": percentile(as_ms, 95),
+        f"{prefix}_p99_ms": percentile(as_ms, 99),
+        f"{prefix}_max_ms": max(as_ms) if as_ms else None,
+    }
+
+
+def process_memory(pid: int) -> Dict[str, Optional[float]]:
+    """Current (VmRSS) and peak (VmHWM) resident set size of a process in MiB (Linux /proc)."""
+    memory = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    memory["rss_mb"] = int(line.split()[1]) / 1024.0
+                elif line.startswith("VmHWM:"):
+                    memory["peak_rss_mb"] = int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return memory
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def unpack_frame(data) -> List[dict]:
+    """Flattens a /ws frame (single event, `batch` or `replay`) into events."""
+    frame = json.loads(data)
+    if frame.get("type") in ("batch", "replay") and isinstance(frame.get("events"), list):
+        return frame["events"]
+    return [frame]
+
+
+class BackendServer:
+    """The FastAPI app under uvicorn in a subprocess, wired to the fake LLM and fake Aider."""
+
+    def __init__(self, llm_url: str, env: Dict[str, str], log_path: str):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.ws_url = f"ws://127.0.0.1:{self.port}/ws"
+        self.env = {
+            **os.environ,
+            "PYTHONPATH": REPO_ROOT,
+            "MODEL": "openai/gpt-4o-mini",  # Any model id the OpenAI provider accepts
+            "OPENAI_BASE_URL": llm_url,
+            "OPENAI_API_KEY": "benchmark",
+            "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "benchmark"),
+            "AIDER_PATH": FAKE_AIDER,
+            "AIDER_POOL_ENABLED": "0",
+            "WORKTREES_ENABLED": "0",
+            "RESULT_CACHE_ENABLED": "0",
+            "CHECKPOINTS_ENABLED": "0",
+            "CREWAI_TRACING_ENABLED": "false",
+            "CREWAI_DISABLE_TELEMETRY": "true",
+            "OTEL_SDK_DISABLED": "true",
+            **env,
+        }
+        self.log_path = log_path
+        self.process: Optional[subprocess.Popen] = None
+        self.ready_s: Optional[float] = None  # Process start until the first HTTP answer
+
+    def start(self, timeout: float = 60.0):
+        self._log = open(self.log_path, "ab")
+        started = time.monotonic()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=REPO_ROOT, env=self.env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Backend exited with {self.process.returncode}; see {self.log_path}")
+            try:
+                # Any HTTP answer means the app finished its startup
+                httpx.get(f"{self.base_url}/tasks/startup-probe", timeout=1.0)
+                self.ready_s = time.monotonic() - started
+                return
+            except httpx.HTTPError:
+                time.sleep(0.05)
+        raise RuntimeError(f"Backend did not start within {timeout}s; see {self.log_path}")
+
+    def memory(self) -> Dict[str, Optional[float]]:
+        return process_memory(self.process.pid) if self.process else {}
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self._log.close()
+
+
+class RssSampler:
+    """Samples a server's RSS in a background thread to catch peaks between scenario steps."""
+
+    def __init__(self, server: BackendServer, interval: float = 0.1):
+        self.server = server
+        self.interval = interval
+        self.samples: List[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self.server.memory().get("rss_mb")
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        memory = self.server.memory()
+        return {
+            "rss_mb": memory.get("rss_mb"),
+            "rss_sampled_max_mb": max(self.samples) if self.samples else None,
+            "peak_rss_mb": memory.get("peak_rss_mb"),
+        }
+
+
+class EventClient:
+    """A /ws client subscribed to every task, recording event counts and delivery delays."""
+
+    def __init__(self, ws_url: str):
+        self.ws_url = ws_url
+        self.events = 0
+        self.log_events = 0
+        self.frames = 0
+        self.bytes = 0
+        self.delays: List[float] = []       # Aider printed the line -> client received it
+        self.finished: Dict[str, float] = {}  # task_id -> time its final status arrived
+        self.connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        async with connect(self.ws_url, max_size=None, ping_interval=None) as ws:
+            await ws.send(json.dumps({"action": "subscribe", "task_id": "*"}))
+            async for data in ws:
+                received = time.time()
+                self.frames += 1
+                self.bytes += len(data)
+                for event in unpack_frame(data):
+                    if event.get("type") == "subscribed":
+                        self.connected.set()
+                        continue
+                    self.events += 1
+                    if event.get("type") == "aider_log":
+                        self.log_events += 1
+                        match = _TIMESTAMP.search(event.get("content", ""))
+                        if match:
+                            self.delays.append(received - float(match.group(1)))
+                    elif event.get("type") == "task_status" and event.get("status") in ("completed", "failed", "cancelled"):
+                        self.finished[event["task_id"]] = received
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        connected = asyncio.create_task(self.connected.wait())
+        await asyncio.wait([self._task, connected], return_when=asyncio.FIRST_COMPLETED)
+        if self._task.done():
+            self._task.result()  # Raise the connection error
+        await connected
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+async def submit(client: httpx.AsyncClient, prompt: str) -> tuple:
+    """POSTs /start_task; returns (task_id, submitted_at, request latency)."""
+    started = time.time()
+    response = await client.post("/start_task", json={"prompt": prompt})
+    response.raise_for_status()
+    return response.json()["task_id"], started, time.time() - started
+
+
+async def wait_for_tasks(watcher: EventClient, task_ids: List[str], timeout: float):
+    deadline = time.monotonic() + timeout
+    while not all(task_id in watcher.finished for task_id in task_ids):
+        if time.monotonic() > deadline:
+            missing = [task_id for task_id in task_ids if task_id not in watcher.finished]
+            raise TimeoutError(f"{len(missing)} task(s) did not finish within {timeout}s")
+        await asyncio.sleep(0.05)
+
+
+async def scenario_start_task(server: BackendServer, args) -> dict:
+    """Concurrent /start_task load: request latency and submit-to-finish latency per task."""
+    watcher = EventClient(server.ws_url)
+    await watcher.start()
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=server.base_url, limits=limits, timeout=60.0) as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(index: int):
+            async with semaphore:
+                return await submit(client, f"Benchmark task {index}")
+
+        with RssSampler(server) as sampler:
+            started = time.time()
+            submitted = await asyncio.gather(*(one(i) for i in range(args.tasks)))
+            await wait_for_tasks(watcher, [task_id for task_id, _, _ in submitted], args.timeout)
+            elapsed = time.time() - started
+    await watcher.stop()
+    return {
+        "tasks": args.tasks,
+        "tasks_per_sec": args.tasks / elapsed,
+        **latency_summary("request", [latency for _, _, latency in submitted]),
+        **latency_summary("task", [watcher.finished[task_id] - at for task_id, at, _ in submitted]),
+        "events_per_sec": watcher.events / elapsed,
+        **sampler.summary(),
+    }
+
+
+async def stream_to_clients(server: BackendServer, clients: int, timeout: float) -> dict:
+    """Runs one task while `clients` WebSocket clients receive its events."""
+    watchers = [EventClient(server.ws_url) for _ in range(clients)]
+    for start in range(0, clients, 50):  # Connect in waves to avoid a SYN backlog
+        await asyncio.gather(*(watcher.start() for watcher in watchers[start:start + 50]))
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=60.0) as client:
+        with RssSampler(server) as sampler:
+            task_id, started, _ = await submit(client, "Benchmark streaming task")
+            await wait_for_tasks(watchers[0], [task_id], timeout)
+            # Give the other clients a moment to drain their queues
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and any(task_id not in w.finished for w in watchers):
+                await asyncio.sleep(0.05)
+            elapsed = max(max(w.finished.get(task_id, time.time()) for w in watchers) - started, 1e-9)
+    await asyncio.gather(*(watcher.stop() for watcher in watchers))
+    delays = [delay for watcher in watchers for delay in watcher.delays]
+    total_events = sum(watcher.events for watcher in watchers)
+    return {
+        "clients": clients,
+        "clients_completed": sum(task_id in w.finished for w in watchers),
+        "log_events_per_client": min(w.log_events for w in watchers),
+        "events_delivered": total_events,
+        "events_per_sec": total_events / elapsed,
+        "frames_per_client": sum(w.frames for w in watchers) / clients,
+        "mb_per_client": sum(w.bytes for w in watchers) / clients / (1024 * 1024),
+        **latency_summary("delivery", delays),
+        "elapsed_s": elapsed,
+        **sampler.summary(),
+    }
+
+
+async def scenario_fanout(server: BackendServer, args) -> dict:
+    return await stream_to_clients(server, args.clients, args.timeout)
+
+
+async def scenario_log_stream(server: BackendServer, args) -> dict:
+    return await stream_to_clients(server, 1, args.timeout)
+
+
+def measure_import(env: Dict[str, str]) -> dict:
+    """Imports backend.main in a fresh interpreter; returns IMPORT_PROBE's measurements."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+async def first_task_latency(server: BackendServer, timeout: float) -> float:
+    """Submit-to-finish time of a single task."""
+    watcher = EventClient(server.ws_url)
+    await watcher.start()
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=60.0) as client:
+        task_id, started, _ = await submit(client, "Benchmark startup task")
+        await wait_for_tasks(watcher, [task_id], timeout)
+    await watcher.stop()
+    return watcher.finished[task_id] - started
+
+
+def scenario_startup(llm_url: str, args) -> dict:
+    """
+    Cold start, repeated --startup-runs times: importing backend.main, starting
+    the server until it answers HTTP, and the first task on the fresh server.
+    """
+    imports, ready, first_task, ready_rss = [], [], [], []
+    for _ in range(args.startup_runs):
+        server = BackendServer(llm_url, scenario_env("startup", args), args.server_log)
+        imports.append(measure_import(server.env))
+        server.start()
+        try:
+            ready.append(server.ready_s)
+            ready_rss.append(server.memory().get("rss_mb"))
+            first_task.append(asyncio.run(first_task_latency(server, args.timeout)))
+            memory = server.memory()
+        finally:
+            server.stop()
+    return {
+        "runs": args.startup_runs,
+        "crewai_loaded_on_import": any(probe["crewai_loaded"] for probe in imports),
+        **latency_summary("import", [probe["import_s"] for probe in imports]),
+        "import_peak_rss_mb": max(probe["peak_rss_kb"] for probe in imports) / 1024.0,
+        **latency_summary("ready", ready),
+        "ready_rss_mb": max(ready_rss),
+        **latency_summary("first_task", first_task),
+        **memory,
+    }
+
+
+def scenario_env(name: str, args) -> Dict[str, str]:
+    """Backend environment per scenario: Aider output volume and crew concurrency."""
+    if name == "start_task":
+        return {
+            "FAKE_AIDER_LINES": str(args.aider_lines),
+            "MAX_CONCURRENT_CREWS": str(args.crews),
+            "JOB_QUEUE_SIZE": str(max(args.tasks, 100)),
+        }
+    if name == "fanout":
+        return {"FAKE_AIDER_LINES": str(args.fanout_lines), "FAKE_AIDER_LINES_PER_SEC": str(args.fanout_rate)}
+    if name == "startup":
+        return {"FAKE_AIDER_LINES": "10", "CREW_PREWARM": "1" if args.prewarm else "0"}
+    return {"FAKE_AIDER_LINES": str(args.stream_lines), "FAKE_AIDER_LINES_PER_SEC": "0"}
+
+
+SCENARIO_RUNNERS = {
+    "start_task": scenario_start_task,
+    "fanout": scenario_fanout,
+    "log_stream": scenario_log_stream,
+}
+
+
+def run_scenario(name: str, llm_url: str, args) -> dict:
+    if name == "startup":
+        return scenario_startup(llm_url, args)  # Starts its own servers
+    server = BackendServer(llm_url, scenario_env(name, args), args.server_log)
+    server.start()
+    try:
+        result = asyncio.run(SCENARIO_RUNNERS[name](server, args))
+    finally:
+        server.stop()
+    return result
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Lists metrics that are worse than the baseline by more than `threshold` (a fraction)."""
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(scenario, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or not before:
+                continue
+            if not (metric in HIGHER_IS_BETTER or metric.endswith(("_ms", "_mb"))):
+                continue  # Counts and sizes describe the run rather than its performance
+            change = (value - before) / before
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            if worse > threshold:
+                regressions.append(f"{scenario}.{metric}: {before:.2f} -> {value:.2f} ({change:+.0%})")
+    return regressions
+
+
+def print_results(results: dict):
+    for scenario, metrics in results.items():
+        print(f"\n== {scenario} ==")
+        for metric, value in metrics.items():
+            shown = "n/a" if value is None else f"{value:.2f}" if isinstance(value, float) else value
+            print(f"  {metric:<24} {shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline backend benchmarks with a fake LLM and fake Aider.")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all).")
+    parser.add_argument("--tasks", type=int, default=20, help="start_task: tasks to submit.")
+    parser.add_argument("--concurrency", type=int, default=10, help="start_task: concurrent HTTP requests.")
+    parser.add_argument("--crews", type=int, default=4, help="start_task: MAX_CONCURRENT_CREWS on the server.")
+    parser.add_argument("--aider-lines", type=int, default=200, help="start_task: Aider output lines per run.")
+    parser.add_argument("--clients", type=int, default=100, help="fanout: WebSocket clients.")
+    parser.add_argument("--fanout-lines", type=int, default=2000, help="fanout: Aider output lines.")
+    parser.add_argument("--fanout-rate", type=float, default=1000, help="fanout: Aider lines per second.")
+    parser.add_argument("--stream-lines", type=int, default=50000, help="log_stream: Aider output lines.")
+    parser.add_argument("--startup-runs", type=int, default=3, help="startup: cold starts to measure.")
+    parser.add_argument("--no-prewarm", dest="prewarm", action="store_false",
+                        help="startup: set CREW_PREWARM=0, so the first task loads CrewAI itself.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM time to first token (s).")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0, help="Fake LLM generation rate (0 = instant).")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-scenario timeout (s).")
+    parser.add_argument("--server-log", default=os.path.join(REPO_ROOT, ".codingorg", "benchmark-server.log"))
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression vs. the baseline.")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    os.makedirs(os.path.dirname(args.server_log), exist_ok=True)
+    config = FakeLLMConfig(args.llm_latency, args.llm_tokens_per_second, completion_tokens=150, plan_steps=1)
+    llm_server = make_server("127.0.0.1", 0, config)
+    threading.Thread(target=llm_server.serve_forever, daemon=True).start()
+    llm_url = f"http://127.0.0.1:{llm_server.server_address[1]}/v1"
+
+    results = {}
+    try:
+        for name in args.scenarios or SCENARIOS:
+            print(f"Running {name}...", flush=True)
+            results[name] = run_scenario(name, llm_url, args)
+            results[name]["llm_requests"] = config.requests
+            config.requests = 0
+    finally:
+        llm_server.shutdown()
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,114 @@
-import { useState } from 'react'
-import reactLogo from './assets/react.svg'
-import viteLogo from '/vite.svg'
+import { type FormEvent, useEffect, useRef, useState } from 'react'
+import { isGap, type ServerEvent } from './events'
+import { type ConnectionState, TaskSocket } from './taskSocket'
 import './App.css'
 
+// Served through the Vite dev server, which proxies the API (see vite.config.ts)
+const WS_URL = `${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.host}/ws`
+
+interface TaskView {
+  id: string
+  status: string
+  lines: string[]
+}
+
+// Most recent lines kept per task; older ones are still on the server (GET /tasks/{id}/events)
+const MAX_LINES = 500
+
+function describe(event: ServerEvent): string | null {
+  if (isGap(event)) return `… events ${event.from_seq}-${event.to_seq} are no longer available`
+  switch (event.type) {
+    case 'aider_log':
+      return String(event.content ?? '').trimEnd()
+    case 'aider_file':
+      return `${event.action} ${event.file}`
+    case 'aider_commit':
+      return `commit ${event.hash}: ${event.message}`
+    case 'aider_test':
+      return `tests (${event.runner}): ${event.summary}`
+    case 'aider_error':
+    case 'error':
+      return `error: ${event.message}`
+    case 'subtask_status':
+      return `step ${event.id}: ${event.status}`
+    case 'final_result':
+      return `result: ${event.data}`
+    case 'task_status':
+      return null
+    default:
+      return `[${event.type}]`
+  }
+}
+
 function App() {
-  const [count, setCount] = useState(0)
+  const [prompt, setPrompt] = useState('')
+  const [tasks, setTasks] = useState<TaskView[]>([])
+  const [connection, setConnection] = useState<ConnectionState>('connecting')
+  const [error, setError] = useState<string | null>(null)
+  const socket = useRef<TaskSocket | null>(null)
+
+  useEffect(() => {
+    const onEvent = (event: ServerEvent) => {
+      const taskId = event.task_id
+      if (!taskId) return
+      setTasks((current) =>
+        current.map((task) => {
+          if (task.id !== taskId) return task
+          const status = event.type === 'task_status' ? String(event.status) : task.status
+          const line = describe(event)
+          const lines = line === null ? task.lines : [...task.lines, line].slice(-MAX_LINES)
+          return { ...task, status, lines }
+        }),
+      )
+    }
+    const client = new TaskSocket(WS_URL, onEvent, setConnection)
+    socket.current = client
+    return () => client.close()
+  }, [])
+
+  async function submit(event: FormEvent) {
+    event.preventDefault()
+    setError(null)
+    let response: Response
+    try {
+      response = await fetch('/start_task', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ prompt }),
+      })
+    } catch {
+      setError('Could not reach the backend')
+      return
+    }
+    if (!response.ok) {
+      setError(`Could not start the task (${response.status})`)
+      return
+    }
+    const { task_id: taskId, status } = (await response.json()) as { task_id: string; status: string }
+    setTasks((current) => [{ id: taskId, status, lines: [] }, ...current])
+    socket.current?.follow(taskId)
+    setPrompt('')
+  }
 
   return (
     <>
-      <div>
-        <a href="https://vite.dev" target="_blank">
-          <img src={viteLogo} className="logo" alt="Vite logo" />
-        </a>
-        <a href="https://react.dev" target="_blank">
-          <img src={reactLogo} className="logo react" alt="React logo" />
-        </a>
-      </div>
-      <h1>Vite + React</h1>
-      <div className="card">
-        <button onClick={() => setCount((count) => count + 1)}>
-          count is {count}
+      <h1>codingorg</h1>
+      <p className="connection">Connection: {connection}</p>
+      <form onSubmit={submit}>
+        <textarea value={prompt} onChange={(event) => setPrompt(event.target.value)} rows={3} />
+        <button type="submit" disabled={!prompt.trim()}>
+          Start task
         </button>
-        <p>
-          Edit <code>src/App.tsx</code> and save to test HMR
-        </p>
-      </div>
-      <p className="read-the-docs">
-        Click on the Vite and React logos to learn more
-      </p>
+      </form>
+      {error && <p className="error">{error}</p>}
+      {tasks.map((task) => (
+        <section key={task.id} className="task">
+          <h2>
+            {task.id} <span className="status">{task.status}</span>
+          </h2>
+          <pre>{task.lines.join('\n')}</pre>
+        </section>
+      ))}
     </>
   )
 }
@@ -0,0 +1,82 @@
+// Decoding of frames received from the backend `/ws` endpoint.
+//
+// Task events may arrive individually, grouped in a `batch` frame (several
+// events coalesced by the server within a short time window), or in a
+// `replay` frame (events missed while disconnected, sent after subscribing
+// with `since`). `unpackFrame` flattens all of these into a list of events;
+// TaskSocket (taskSocket.ts) uses it for the app's connection.
+
+export interface ServerEvent {
+  type: string
+  task_id?: string
+  seq?: number
+  [key: string]: unknown
+}
+
+interface EventListFrame extends ServerEvent {
+  type: 'batch' | 'replay'
+  events: ServerEvent[]
+}
+
+function isEventList(frame: ServerEvent): frame is EventListFrame {
+  return (frame.type === 'batch' || frame.type === 'replay') && Array.isArray(frame.events)
+}
+
+// Parses one WebSocket text frame into the events it carries, in order.
+// Binary (msgpack) frames are only sent to clients that connect with
+// `?encoding=msgpack`, so the default JSON text path is all this needs.
+export function unpackFrame(data: string): ServerEvent[] {
+  const frame = JSON.parse(data) as ServerEvent
+  return isEventList(frame) ? frame.events : [frame]
+}
+
+// A `gap` frame: events `from_seq`..`to_seq` of a task were evicted from the
+// server's log before this client could replay them.
+export interface GapEvent extends ServerEvent {
+  type: 'gap'
+  task_id: string
+  from_seq: number
+  to_seq: number
+}
+
+export function isGap(event: ServerEvent): event is GapEvent {
+  return event.type === 'gap' && typeof event.to_seq === 'number'
+}
+
+// Tracks the highest `seq` seen per task so a reconnecting client can
+// resubscribe with `since` and receive only what it missed.
+export class SeqTracker {
+  private lastSeq = new Map<string, number>()
+
+  observe(event: ServerEvent): void {
+    if (event.task_id && typeof event.seq === 'number') {
+      const previous = this.lastSeq.get(event.task_id) ?? 0
+      if (event.seq > previous) this.lastSeq.set(event.task_id, event.seq)
+    }
+  }
+
+  // Records the event and returns false if it was already seen: after a
+  // resubscribe, a live event can repeat one the replay delivered. A gap
+  // moves past the lost events so they aren't asked for again.
+  accept(event: ServerEvent): boolean {
+    if (isGap(event)) {
+      const previous = this.lastSeq.get(event.task_id) ?? 0
+      if (event.to_seq > previous) this.lastSeq.set(event.task_id, event.to_seq)
+      return true
+    }
+    if (event.task_id && typeof event.seq === 'number' && event.seq <= (this.lastSeq.get(event.task_id) ?? 0)) {
+      return false
+    }
+    this.observe(event)
+    return true
+  }
+
+  subscribeMessage(taskId: string, events?: string[]): string {
+    return JSON.stringify({
+      action: 'subscribe',
+      task_id: taskId,
+      events,
+      since: this.lastSeq.get(taskId) ?? 0,
+    })
+  }
+}
@@ -0,0 +1,89 @@
+// WebSocket client for the backend `/ws` endpoint.
+//
+// Subscribes to the tasks it is asked to follow and hands every task event to
+// a listener exactly once, in order: batch and replay frames are unpacked,
+// events repeated across a resubscribe are skipped, and `gap` frames are
+// passed on so the UI can say that some events were lost. When the server
+// reports `dropped` frames (this client fell behind) or the connection
+// drops, it resubscribes with `since` and the server replays what was missed.
+//
+// Frames are JSON: the client connects without `?encoding=msgpack`, so no
+// binary decoder is needed.
+
+import { SeqTracker, type ServerEvent, unpackFrame } from './events'
+
+export type ConnectionState = 'connecting' | 'open' | 'closed'
+
+const RECONNECT_MIN_MS = 500
+const RECONNECT_MAX_MS = 10_000
+
+export class TaskSocket {
+  private socket: WebSocket | null = null
+  private tracker = new SeqTracker()
+  private tasks = new Set<string>()
+  private retryMs = RECONNECT_MIN_MS
+  private retryTimer: number | undefined
+  private stopped = false
+  private url: string
+  private onEvent: (event: ServerEvent) => void
+  private onState: (state: ConnectionState) => void
+
+  constructor(url: string, onEvent: (event: ServerEvent) => void, onState: (state: ConnectionState) => void = () => {}) {
+    this.url = url
+    this.onEvent = onEvent
+    this.onState = onState
+    this.connect()
+  }
+
+  follow(taskId: string): void {
+    this.tasks.add(taskId)
+    this.subscribe(taskId)
+  }
+
+  close(): void {
+    this.stopped = true
+    window.clearTimeout(this.retryTimer)
+    this.socket?.close()
+  }
+
+  private connect(): void {
+    this.onState('connecting')
+    const socket = new WebSocket(this.url)
+    this.socket = socket
+    socket.onopen = () => {
+      this.retryMs = RECONNECT_MIN_MS
+      this.onState('open')
+      this.tasks.forEach((taskId) => this.subscribe(taskId))
+    }
+    socket.onmessage = (message: MessageEvent) => {
+      if (typeof message.data === 'string') this.handleFrame(message.data)
+    }
+    socket.onclose = () => {
+      if (this.socket !== socket) return
+      this.socket = null
+      this.onState('closed')
+      if (this.stopped) return
+      this.retryTimer = window.setTimeout(() => this.connect(), this.retryMs)
+      this.retryMs = Math.min(this.retryMs * 2, RECONNECT_MAX_MS)
+    }
+  }
+
+  private subscribe(taskId: string): void {
+    if (this.socket?.readyState === WebSocket.OPEN) {
+      this.socket.send(this.tracker.subscribeMessage(taskId))
+    }
+  }
+
+  private handleFrame(data: string): void {
+    for (const event of unpackFrame(data)) {
+      if (event.type === 'dropped') {
+        // Frames were discarded while this client was slow: replay them
+        this.tasks.forEach((taskId) => this.subscribe(taskId))
+      } else if (event.type === 'subscribed' || event.type === 'unsubscribed' || event.type === 'ack') {
+        continue
+      } else if (this.tracker.accept(event)) {
+        this.onEvent(event)
+      }
+    }
+  }
+}
@@ -1,7 +1,17 @@
 import { defineConfig } from 'vite'
 import react from '@vitejs/plugin-react-swc'
 
+// Backend started with `python backend/main.py` (or uvicorn backend.main:app)
+const backend = 'http://localhost:8000'
+
 // https://vite.dev/config/
 export default defineConfig({
   plugins: [react()],
+  server: {
+    proxy: {
+      '/start_task': backend,
+      '/tasks': backend,
+      '/ws': { target: backend, ws: true },
+    },
+  },
 })